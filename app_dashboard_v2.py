@@ -4,15 +4,80 @@ Versão com filtros de período, validador e análise de faixas horárias
 """
 
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import os
+import time
+import uuid
 from scipy import stats
 import numpy as np
 from scipy import stats
 import html
+from functools import lru_cache, partial, wraps
+
+import carregamento
+import chat_ia
+import consultas
+import exportacao
+import ferramentas_chat
+import graficos
+import instrumentacao
+import motor_duckdb
+import regras_jornada
+from regras_jornada import classificar_por_faixa
+
+# Copy-on-Write: recortes e colunas novas não copiam o conjunto carregado
+# (comportamento padrão a partir do pandas 3.0)
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# Fragmentos (Streamlit >= 1.37): partes da página que reexecutam sem rodar o script inteiro
+FRAGMENTO = getattr(st, "fragment", None)
+# Download com data sob demanda (callable): o arquivo só é lido para a memória quando clicado
+try:
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    DOWNLOAD_SOB_DEMANDA = hasattr(MediaFileManager, "add_deferred")
+except ImportError:
+    DOWNLOAD_SOB_DEMANDA = False
+INTERVALO_CHAT = 0.5  # Segundos entre atualizações das respostas em andamento
+
+# Medição do rerun: trechos e caches para o painel Diagnóstico e o log de desempenho
+instrumentacao.iniciar()
+for nome_trecho, segundos in st.session_state.pop("diagnostico_pendentes", []):
+    instrumentacao.registrar(nome_trecho, segundos)
+
+def fragmento(nome):
+    """st.fragment com medição: o rerun parcial vira um registro próprio no log de desempenho
+
+    Sem st.fragment (Streamlit < 1.37) a função roda normalmente a cada rerun do script.
+    """
+    def decorador(funcao):
+        if FRAGMENTO is None:
+            return funcao
+
+        @wraps(funcao)
+        def medida(*args, **kwargs):
+            if instrumentacao.atual() is not None:  # Dentro de outro rerun (completo ou de fragmento): já medido
+                return funcao(*args, **kwargs)
+            instrumentacao.iniciar()
+            try:
+                with instrumentacao.trecho(nome):
+                    return funcao(*args, **kwargs)
+            finally:
+                instrumentacao.gravar_log(instrumentacao.finalizar(
+                    evento='fragmento', fragmento=nome, sessao=id_sessao_chat()))
+        return FRAGMENTO(medida)
+    return decorador
+
+def reexecutar_fragmento():
+    """Reexecuta só o fragmento atual; no rerun completo (ou sem st.fragment), o script inteiro"""
+    if FRAGMENTO is not None:
+        try:
+            st.rerun(scope="fragment")
+        except StreamlitAPIException:
+            pass
+    st.rerun()
 
 # Verificar OpenAI
 try:
@@ -108,159 +173,75 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Função para carregar dados
-@st.cache_data(ttl=300)  # Cache por 5 minutos apenas
-def carregar_dados():
-    import glob
-    arquivos = glob.glob("resultados/dados_com_duracao_*.csv")
-    if arquivos:
-        arquivo_mais_recente = max(arquivos)
-        # Tentar múltiplos encodings
-        for encoding in ['utf-8-sig', 'utf-8', 'latin-1', 'cp1252']:
-            try:
-                df = pd.read_csv(arquivo_mais_recente, encoding=encoding)
-                
-                # Converter colunas de data
-                df['data'] = pd.to_datetime(df['d_dt_data'], errors='coerce')
-                df['dt_inicio'] = pd.to_datetime(df['d_dt_inicio_apontamento'], errors='coerce')
-                df['dt_fim'] = pd.to_datetime(df['d_dt_fim_apontamento'], errors='coerce')
-                
-                # IMPORTANTE: Garantir que duracao_horas seja numérica
-                df['duracao_horas'] = pd.to_numeric(df['duracao_horas'], errors='coerce')
-                
-                # Remover registros sem duração válida
-                df = df.dropna(subset=['duracao_horas'])
-                
-                # ========== NOVA LÓGICA: AGRUPAR POR DIA + FUNCIONÁRIO ==========
-                # Manter dados originais para referência
-                df_original = df.copy()
-                
-                # Agrupar por funcionário + dia e somar as horas
-                df_agrupado = df.groupby(['s_nm_recurso', 'data', 's_nm_usuario_valida']).agg({
-                    'duracao_horas': 'sum',  # SOMAR as horas do dia
-                    'd_dt_inicio_apontamento': 'min',  # Primeiro apontamento do dia
-                    'd_dt_fim_apontamento': 'max',     # Último apontamento do dia
-                    's_ds_operacao': lambda x: f"{len(x)} apontamentos: " + "; ".join(x.astype(str).head(3)) + ("..." if len(x) > 3 else ""),  # Concatenar operações
-                    'd_dt_data': 'first'  # Manter a data
-                }).reset_index()
-                
-                # Renomear colunas para manter compatibilidade
-                df_agrupado.columns = ['s_nm_recurso', 'data', 's_nm_usuario_valida', 'duracao_horas', 
-                                     'd_dt_inicio_apontamento', 'd_dt_fim_apontamento', 's_ds_operacao', 'd_dt_data']
-                
-                # Corrigir strings com encoding
-                for col in df_agrupado.columns:
-                    if df_agrupado[col].dtype == 'object':
-                        try:
-                            df_agrupado[col] = df_agrupado[col].str.encode('latin-1').str.decode('utf-8')
-                        except:
-                            pass
-                
-                # Adicionar metadados sobre a agregação
-                df_agrupado['total_apontamentos_dia'] = df.groupby(['s_nm_recurso', 'data']).size().values
-                df_agrupado['tipo_analise'] = 'AGRUPADO_POR_DIA'
-                
-                # ========== AJUSTES SOLICITADOS PELO CLIENTE ==========
-                
-                # AJUSTE 1: IDENTIFICAR DIA ÚTIL vs NÃO ÚTIL
-                # Seg-Sex = Dia Útil (0-4), Sáb-Dom = Não Útil (5-6)
-                df_agrupado['dia_semana_num'] = df_agrupado['data'].dt.dayofweek
-                df_agrupado['tipo_dia'] = df_agrupado['dia_semana_num'].apply(
-                    lambda x: '📅 Dia Útil' if x < 5 else '🏖️ Fim de Semana'
-                )
-                df_agrupado['nome_dia'] = df_agrupado['data'].dt.day_name()
-                df_agrupado['eh_dia_util'] = df_agrupado['dia_semana_num'] < 5
-                
-                # AJUSTE 2: DESCONTO DE 1H DE ALMOÇO
-                # Descontar 1h de almoço das horas trabalhadas
-                df_agrupado['duracao_bruta'] = df_agrupado['duracao_horas']  # Salvar original
-                df_agrupado['horas_almoco'] = 1.0  # 1h de almoço
-                df_agrupado['duracao_liquida'] = (df_agrupado['duracao_horas'] - df_agrupado['horas_almoco']).clip(lower=0)
-                
-                # AJUSTE 3: RECALCULAR HORAS EXTRAS (após desconto de almoço)
-                # Horas extras = tudo acima de 8h APÓS descontar 1h de almoço
-                df_agrupado['horas_extras'] = df_agrupado['duracao_liquida'].apply(
-                    lambda x: max(0, x - 8) if x > 8 else 0
-                )
-                
-                # Calcular horas normais (até 8h)
-                df_agrupado['horas_normais'] = df_agrupado['duracao_liquida'].apply(
-                    lambda x: min(8, x)
-                )
-                
-                # Calcular horas pagas (horas normais + extras com adicional 50%)
-                df_agrupado['horas_pagas'] = df_agrupado['horas_normais'] + (df_agrupado['horas_extras'] * 1.5)
-                
-                # Indicadores visuais
-                df_agrupado['possui_hora_extra'] = df_agrupado['horas_extras'] > 0
-                df_agrupado['classificacao_jornada'] = df_agrupado['duracao_liquida'].apply(
-                    lambda x: '✅ Jornada Completa' if 7.5 <= x <= 8.5 
-                             else '⚠️ Jornada Reduzida' if x < 7.5
-                             else '🔴 Hora Extra'
-                )
-                
-                return df_agrupado
-            except (UnicodeDecodeError, KeyError):
-                continue
-        
-        # Se nenhum encoding funcionou, usar o último tentado
-        df = pd.read_csv(arquivo_mais_recente, encoding='utf-8-sig', errors='ignore')
-        df['data'] = pd.to_datetime(df['d_dt_data'], errors='coerce')
-        df['duracao_horas'] = pd.to_numeric(df['duracao_horas'], errors='coerce')
-        df = df.dropna(subset=['duracao_horas'])
-        return df
-    return None
+@st.cache_resource(max_entries=2)  # Um conjunto por versão dos snapshots, compartilhado entre sessões (somente leitura)
+def carregar_dados(versao, motor='pandas'):
+    instrumentacao.contar('cache.conjunto.faltas')
+    if motor == 'duckdb':
+        return motor_duckdb.abrir_conjunto(versao=versao, regras=REGRAS)
+    df = carregamento.carregar_dados()
+    return None if df is None else consultas.ConjuntoApontamentos(df, versao, REGRAS)
 
-# Carregar dados
-df_original = carregar_dados()
+@st.cache_resource  # Figuras por recorte, compartilhadas entre sessões (somente leitura)
+def obter_cache_figuras():
+    return graficos.CacheFiguras()
 
-if df_original is None:
-    st.error("❌ Nenhum dado encontrado! Execute: python analise_duracao_trabalho.py")
-    st.stop()
+@st.cache_resource  # Respostas compartilhadas entre sessões (mesma pergunta + mesmo contexto)
+def obter_cache_respostas():
+    return chat_ia.CacheRespostas()
 
-def classificar_por_faixa(duracao, faixa_referencia):
-    """Classifica apontamento em relação a uma faixa de referência"""
-    tolerancia = 0.5  # 30 minutos de tolerância
-    
-    if duracao < (faixa_referencia - tolerancia):
-        return 'Abaixo'
-    elif duracao > (faixa_referencia + tolerancia):
-        return 'Acima'
-    else:
-        return 'Normal'
+@st.cache_resource  # Um cliente por configuração de backend, reutilizado por todas as sessões
+def obter_pool_backends():
+    return chat_ia.PoolBackends()
 
-def render_chat_lateral(df_filtrado, data_inicio, data_fim, validador_selecionado, faixa_referencia):
-    """Renderiza o componente de chat lateral"""
-    st.markdown('<div class="chat-header">🤖 Chat IA - Análise Inteligente</div>', unsafe_allow_html=True)
+@st.cache_resource  # Pool de threads do chat; cada sessão recolhe suas respostas numa fila própria
+def obter_executor_chat():
+    return chat_ia.ExecutorChat(cache=obter_cache_respostas())
+
+def id_sessao_chat():
+    return st.session_state.setdefault("chat_sessao", uuid.uuid4().hex)
+
+def obter_openai_key():
+    """API Key da OpenAI: secrets (produção) > variável de ambiente (local) > input manual"""
+    openai_key = None
     
-    if OPENAI_DISPONIVEL:
-        # Tentar carregador API Key nesta ordem de prioridade:
-        # 1. Streamlit Cloud secrets (produção)
-        # 2. Variáveis de ambiente (local)
-        # 3. Input manual (fallback)
-        
-        openai_key = None
-        
+    try:
+        # Streamlit Cloud secrets (produção)
+        openai_key = st.secrets["OPENAI_API_KEY"]
+    except:
         try:
-            # Streamlit Cloud secrets (produção)
-            openai_key = st.secrets["OPENAI_API_KEY"]
+            # Variáveis de ambiente (local)
+            openai_key = os.getenv("OPENAI_API_KEY")
         except:
-            try:
-                # Variáveis de ambiente (local)
-                openai_key = os.getenv("OPENAI_API_KEY")
-            except:
-                pass
-        
-        if not openai_key:
-            # Campo para API Key manual (fallback para desenvolvimento local)
-            openai_key = st.text_input(
-                "🔑 OpenAI API Key:",
-                type="password",
-                help="Cole sua API key da OpenAI aqui",
-                key="chat_api_key"
-            )
+            pass
+    
+    if not openai_key:
+        # Campo para API Key manual (fallback para desenvolvimento local)
+        openai_key = st.text_input(
+            "🔑 OpenAI API Key:",
+            type="password",
+            help="Cole sua API key da OpenAI aqui",
+            key="chat_api_key"
+        )
+    return openai_key
+
+@fragmento('chat')
+def render_chat_lateral(resumo, data_inicio, data_fim, validador_selecionado, faixa_referencia, motor):
+    """Renderiza o componente de chat lateral
+
+    Fragmento: enviar, perguntas rápidas, limpar e o toggle de streaming reexecutam
+    só a coluna do chat (filtros, abas e gráficos ficam como estão).
+    """
+    st.markdown('<div class="chat-header">🤖 Chat IA - Análise Inteligente</div>', unsafe_allow_html=True)
+    
+    # Backend local (DASHBOARD_CHAT_BACKEND=local) dispensa OpenAI e API key
+    precisa_openai = chat_ia.BACKEND == 'openai'
+    
+    if OPENAI_DISPONIVEL or not precisa_openai:
+        openai_key = obter_openai_key() if precisa_openai else None
         
-        if openai_key:
-            os.environ["OPENAI_API_KEY"] = openai_key
+        if openai_key or not precisa_openai:
+            if openai_key:
+                os.environ["OPENAI_API_KEY"] = openai_key
             
             # Histórico de chat em área scrollável
             st.subheader("💬 Histórico")
@@ -306,11 +287,21 @@ def render_chat_lateral(df_filtrado, data_inicio, data_fim, validador_selecionad
                             </div>
                             """, unsafe_allow_html=True)
                             st.markdown(content)
+                            if msg.get("latencia"):
+                                latencia = msg["latencia"]
+                                primeiro = f"1º token {latencia['primeiro_token']:.2f}s · " if latencia.get('primeiro_token') is not None else ""
+                                st.caption(f"⏱️ {primeiro}total {latencia['total']:.2f}s")
                         
                         st.markdown("---")
             else:
                 st.info("💭 Nenhuma conversa ainda. Faça uma pergunta ou use as sugestões abaixo!")
             
+            # Perguntas em andamento (executadas em segundo plano)
+            if acompanhar_chat_periodico and obter_executor_chat().em_andamento(id_sessao_chat()):
+                acompanhar_chat_periodico()
+            else:
+                acompanhar_chat()
+            
             st.markdown("---")
             
             # Input personalizado com formulário
@@ -321,15 +312,16 @@ def render_chat_lateral(df_filtrado, data_inicio, data_fim, validador_selecionad
                 with col_button:
                     submitted = st.form_submit_button("📤 Enviar", use_container_width=True)
                 
-                if submitted and pergunta_input and not ("processing_chat" in st.session_state and st.session_state.processing_chat):
-                    processar_pergunta_chat(pergunta_input, df_filtrado, data_inicio, data_fim, validador_selecionado, faixa_referencia, openai_key)
+                if submitted and pergunta_input:
+                    processar_pergunta_chat(pergunta_input, resumo, data_inicio, data_fim, validador_selecionado, faixa_referencia, openai_key, motor)
             
             # Botão limpar logo abaixo do input
             if st.button("🗑️ Limpar Chat", use_container_width=True):
                 st.session_state.chat_messages = []
-                if "processing_chat" in st.session_state:
-                    del st.session_state.processing_chat
-                st.rerun()
+                reexecutar_fragmento()
+            
+            st.toggle("⚡ Resposta em streaming", value=True, key="chat_streaming",
+                      help="Mostra o texto à medida que chega, em vez de esperar a resposta completa")
             
             st.markdown("---")
             
@@ -349,160 +341,647 @@ def render_chat_lateral(df_filtrado, data_inicio, data_fim, validador_selecionad
                 col = col1 if idx % 2 == 0 else col2
                 with col:
                     if st.button(f"💬 {pergunta}", key=f"btn_{pergunta.replace(' ', '_').replace('?', '')}", use_container_width=True):
-                        if not ("processing_chat" in st.session_state and st.session_state.processing_chat):
-                            processar_pergunta_chat(pergunta, df_filtrado, data_inicio, data_fim, validador_selecionado, faixa_referencia, openai_key)
+                        processar_pergunta_chat(pergunta, resumo, data_inicio, data_fim, validador_selecionado, faixa_referencia, openai_key, motor)
         else:
             st.info("👆 Cole sua API Key acima")
     else:
         st.error("❌ OpenAI não instalada!")
 
-def processar_pergunta_chat(pergunta, df_filtrado, data_inicio, data_fim, validador_selecionado, faixa_referencia, openai_key):
-    """Processa pergunta do chat e gera resposta"""
+def processar_pergunta_chat(pergunta, resumo, data_inicio, data_fim, validador_selecionado, faixa_referencia, openai_key, motor):
+    """Responde do cache ou envia a pergunta ao executor em segundo plano"""
     if "chat_messages" not in st.session_state:
         st.session_state.chat_messages = []
     
-    # Evitar processamento duplicado
-    if "processing_chat" in st.session_state and st.session_state.processing_chat:
-        return
-    
-    # Marcar como processando
-    st.session_state.processing_chat = True
-    
     try:
-        # Feedback visual de processamento
-        with st.spinner("🤖 Processando sua pergunta..."):
-            client = OpenAI(api_key=openai_key)
-            
-            # Preparar contexto com dados filtrados
-            total_horas_brutas = df_filtrado['duracao_bruta'].sum() if 'duracao_bruta' in df_filtrado.columns else df_filtrado['duracao_horas'].sum()
-            total_horas_liquidas = df_filtrado['duracao_liquida'].sum() if 'duracao_liquida' in df_filtrado.columns else 0
-            total_horas_extras = df_filtrado['horas_extras'].sum() if 'horas_extras' in df_filtrado.columns else 0
-            total_horas_pagas = df_filtrado['horas_pagas'].sum() if 'horas_pagas' in df_filtrado.columns else 0
-            
-            # Estatísticas de dias úteis vs não úteis
-            dias_uteis = len(df_filtrado[df_filtrado['eh_dia_util'] == True]) if 'eh_dia_util' in df_filtrado.columns else 0
-            dias_nao_uteis = len(df_filtrado[df_filtrado['eh_dia_util'] == False]) if 'eh_dia_util' in df_filtrado.columns else 0
-            
-            stats = {
-                'total_registros': len(df_filtrado),
-                'periodo': f"{data_inicio} a {data_fim}",
-                'validador': validador_selecionado,
-                'faixa_referencia': faixa_referencia,
-                'total_horas_brutas': total_horas_brutas,
-                'total_horas_liquidas': total_horas_liquidas,
-                'total_horas_extras': total_horas_extras,
-                'total_horas_pagas': total_horas_pagas,
-                'media_horas': df_filtrado['duracao_horas'].mean(),
-                'abaixo': len(df_filtrado[df_filtrado['classificacao'] == 'Abaixo']),
-                'normal': len(df_filtrado[df_filtrado['classificacao'] == 'Normal']),
-                'acima': len(df_filtrado[df_filtrado['classificacao'] == 'Acima']),
-                'funcionarios': df_filtrado['s_nm_recurso'].nunique(),
-                'dias_uteis': dias_uteis,
-                'dias_nao_uteis': dias_nao_uteis,
-                'top_3_func': df_filtrado.groupby('s_nm_recurso')['duracao_horas'].sum().nlargest(3).to_dict()
-            }
-            
-            contexto = f"""
-Você é um assistente especializado em análise de dados de apontamentos de trabalho.
-Forneça respostas detalhadas e estruturadas baseadas nos dados apresentados.
-
-REGRAS DE CÁLCULO APLICADAS:
-✅ Desconto de 1h de almoço por dia (já aplicado nos dados)
-✅ Classificação de dia útil (seg-sex) vs final de semana (sáb-dom)
-✅ Horas extras = tudo acima de 8h APÓS desconto do almoço
-✅ Horas pagas = horas normais + (horas extras × 1.5)
-
-DADOS ATUAIS FILTRADOS:
-- Período: {stats['periodo']}
-- Validador: {stats['validador']}
-- Faixa de referência: {stats['faixa_referencia']}h
-- Total de jornadas: {stats['total_registros']}
-- Dias úteis: {stats['dias_uteis']} | Fins de semana: {stats['dias_nao_uteis']}
-- Funcionários únicos: {stats['funcionarios']}
-
-HORAS TRABALHADAS:
-- Horas brutas (com almoço): {stats['total_horas_brutas']:.2f}h
-- Horas líquidas (sem almoço): {stats['total_horas_liquidas']:.2f}h  
-- Horas extras (>8h/dia): {stats['total_horas_extras']:.2f}h
-- Horas pagas (com 50% extras): {stats['total_horas_pagas']:.2f}h
-- Média por jornada: {stats['media_horas']:.2f}h
-
-DISTRIBUIÇÃO:
-- Abaixo da faixa: {stats['abaixo']} ({stats['abaixo']/stats['total_registros']*100:.1f}%)
-- Normal: {stats['normal']} ({stats['normal']/stats['total_registros']*100:.1f}%)
-- Acima da faixa: {stats['acima']} ({stats['acima']/stats['total_registros']*100:.1f}%)
-
-TOP 3 FUNCIONÁRIOS (horas brutas):
-{chr(10).join([f"- {nome}: {horas:.2f}h" for nome, horas in stats['top_3_func'].items()])}
-
-IMPORTANTE: Ao responder sobre horas extras, sempre considere que:
-- Horas extras são calculadas APÓS desconto de 1h de almoço
-- Exemplo: 10h trabalhadas = 9h líquidas = 1h extra (9h - 8h)
-- Dias úteis vs fins de semana podem ter padrões diferentes
-
-Responda de forma clara, use dados específicos e foque em insights práticos sobre produtividade e custos.
-"""
-            
-            completion = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": contexto},
-                    {"role": "user", "content": pergunta}
-                ],
-                temperature=0.3,  # Reduzir temperatura para respostas mais focadas
-                max_tokens=400,   # Aumentar tokens para respostas mais completas
-                timeout=30  # Timeout de 30 segundos
+        # Contexto com dados filtrados e chave do cache de respostas
+        with instrumentacao.trecho('chat.contexto'):
+            stats = chat_ia.calcular_estatisticas(
+                resumo, data_inicio, data_fim, validador_selecionado, faixa_referencia,
+                motor.cubo.top_funcionarios(motor.chave, 3).to_dict()
             )
-            
-            resposta = completion.choices[0].message.content
-            
-            # Salvar no histórico
+            ferramentas = motor if chat_ia.FERRAMENTAS_ATIVAS else None
+            contexto = chat_ia.montar_contexto(stats, REGRAS, ferramentas is not None)
+            chave = chat_ia.chave_resposta(pergunta, contexto, (motor.chave, motor.faixa_referencia, motor.tolerancia))
+        
+        resposta = obter_cache_respostas().obter(chave)
+        instrumentacao.contar_cache('chat', resposta is not None)
+        if resposta is not None:
+            # Resposta já conhecida: vai direto para o histórico
             st.session_state.chat_messages.append({"role": "user", "content": pergunta})
             st.session_state.chat_messages.append({"role": "assistant", "content": resposta})
-        
-        # Limpar flag de processamento
-        st.session_state.processing_chat = False
-        
-        # Forçar rerun para atualizar o histórico
-        st.rerun()
-        
+        else:
+            # Pergunta repetida enquanto a anterior está em andamento é ignorada pelo executor
+            with instrumentacao.trecho('chat.envio'):
+                obter_executor_chat().enviar(
+                    id_sessao_chat(),
+                    chat_ia.TarefaChat(pergunta, chave),
+                    obter_pool_backends().obter(api_key=openai_key),
+                    contexto,
+                    streaming=st.session_state.get("chat_streaming", True),
+                    ferramentas=ferramentas
+                )
+            if FRAGMENTO is None:
+                with instrumentacao.trecho('chat.aguardar'):
+                    aguardar_respostas_chat()
     except Exception as e:
-        st.session_state.processing_chat = False
         error_msg = f"❌ Erro no chat: {str(e)}"
         st.error(error_msg)
         st.session_state.chat_messages.append({
             "role": "assistant",
             "content": error_msg
         })
+        return
+    
+    # Reexecutar o chat para atualizar o histórico / acompanhamento
+    reexecutar_fragmento()
 
-# Carregar dados
-df_original = carregar_dados()
+def acompanhar_chat(periodico=False):
+    """Leva as respostas concluídas da fila da sessão para o histórico e mostra as em andamento"""
+    executor = obter_executor_chat()
+    sessao = id_sessao_chat()
+    
+    concluidas = executor.coletar(sessao)
+    mensagens = st.session_state.setdefault("chat_messages", [])
+    for tarefa in concluidas:
+        registrar_chat(tarefa, sessao)
+        mensagens.append({"role": "user", "content": tarefa.pergunta})
+        if tarefa.erro:
+            mensagens.append({"role": "assistant", "content": f"❌ Erro no chat: {tarefa.erro}"})
+        else:
+            mensagens.append({"role": "assistant", "content": tarefa.texto, "latencia": tarefa.latencia})
+    
+    for tarefa in executor.em_andamento(sessao):
+        st.markdown(f"**{tarefa.pergunta}**")
+        if tarefa.texto:
+            st.markdown(tarefa.texto + "▌")
+        else:
+            st.caption("🤖 Processando sua pergunta...")
+    
+    if concluidas:
+        # O acompanhamento periódico só para com um rerun do script (e o histórico
+        # fica no fragmento do chat, acima dele); fora dele basta reexecutar o chat
+        if periodico:
+            st.rerun()
+        reexecutar_fragmento()
+
+def registrar_chat(tarefa, sessao):
+    """Tempo da chamada ao modelo (feita na thread do chat) no rerun atual e no log"""
+    latencia = tarefa.latencia or {}
+    if instrumentacao.atual() is not None:
+        instrumentacao.registrar('chat.modelo', latencia.get('total'))
+    elif latencia.get('total') is not None:
+        # Recolhida num rerun do fragmento (sem medição): entra no próximo rerun completo
+        st.session_state.setdefault("diagnostico_pendentes", []).append(('chat.modelo', latencia['total']))
+    instrumentacao.gravar_log({
+        'evento': 'chat',
+        'instante': datetime.now().isoformat(timespec='milliseconds'),
+        'sessao': sessao,
+        'backend': chat_ia.BACKEND,
+        'streaming': st.session_state.get("chat_streaming", True),
+        'primeiro_token_s': latencia.get('primeiro_token'),
+        'total_s': latencia.get('total'),
+        'erro': tarefa.erro is not None
+    })
+
+# Com st.fragment, só o acompanhamento reexecuta enquanto há perguntas em andamento
+def _acompanhar_chat_periodico():
+    acompanhar_chat(periodico=True)
+
+acompanhar_chat_periodico = FRAGMENTO(run_every=INTERVALO_CHAT)(_acompanhar_chat_periodico) if FRAGMENTO else None
+
+def aguardar_respostas_chat():
+    """Sem st.fragment: acompanha no próprio script até as perguntas da sessão terminarem"""
+    executor = obter_executor_chat()
+    sessao = id_sessao_chat()
+    area_resposta = st.empty()
+    while True:
+        andamento = executor.em_andamento(sessao)
+        if not andamento:
+            break
+        texto = andamento[0].texto
+        if texto:
+            area_resposta.markdown(texto + "▌")
+        else:
+            area_resposta.caption("🤖 Processando sua pergunta...")
+        time.sleep(INTERVALO_CHAT / 5)
+
+# ==================== ABA: ALERTAS ====================
+TAMANHOS_PAGINA_ALERTAS = [20, 50, 100]
+ORDENACOES_ALERTAS = {
+    "⏱️ Duração": 'duracao_horas',
+    "📅 Data": 'data',
+    "👤 Funcionário": 's_nm_recurso'
+}
+
+def _formatar_horas_minutos(horas):
+    """Vetor de horas -> '7h30min' (truncado, como o cartão original)"""
+    inteiras = np.trunc(horas).astype(int)
+    minutos = ((horas - inteiras) * 60).astype(int)
+    return np.char.add(np.char.add(inteiras.astype(str), 'h'), np.char.zfill(minutos.astype(str), 2)) + 'min'
 
-if df_original is None:
-    st.error("❌ Nenhum dado encontrado! Execute: python analise_duracao_trabalho.py")
+def montar_cards_alerta(df_alertas, tipo, faixa_referencia):
+    """Monta todos os cartões da página em um único bloco HTML, sem laço por linha"""
+    bruta = df_alertas['duracao_bruta'].to_numpy(dtype='float64')
+    liquida = df_alertas['duracao_liquida'].to_numpy(dtype='float64')
+    textos = lambda serie: serie.astype(object).where(serie.notna(), 'N/A').astype(str)
+    nomes = textos(df_alertas['s_nm_recurso']).map(html.escape)
+    operacoes = textos(df_alertas['s_ds_operacao']).str[:50].map(html.escape)
+
+    if tipo == 'abaixo':
+        classe = 'alert-low'
+        detalhe = ("⚠️ Falta: " + np.char.mod('%.2f', faixa_referencia - liquida)
+                   + f"h para atingir {faixa_referencia:g}h líquidas")
+    else:
+        classe = 'alert-high'
+        detalhe = ("🔴 Horas Extras: " + np.char.mod('%.2f', df_alertas['horas_extras'].to_numpy(dtype='float64'))
+                   + f"h acima de {LIMITE_DIARIO:g}h")
+
+    cards = (
+        f'<div class="alert-box {classe}"><strong>📅 '
+        + df_alertas['data'].dt.strftime('%d/%m/%Y').to_numpy(dtype=object)
+        + '</strong> ' + df_alertas['tipo_dia'].astype(str).to_numpy(dtype=object) + ' - <strong>'
+        + nomes.to_numpy(dtype=object) + '</strong><br>'
+        + '⏱️ Apontado: ' + _formatar_horas_minutos(bruta).astype(object)
+        + ' (' + np.char.mod('%.2f', bruta).astype(object) + 'h)<br>'
+        + '🍽️ Líquido (após almoço): ' + _formatar_horas_minutos(liquida).astype(object)
+        + ' (' + np.char.mod('%.2f', liquida).astype(object) + 'h)<br>'
+        + detalhe.astype(object) + '<br>'
+        + '📝 Operação: ' + operacoes.to_numpy(dtype=object) + '...</div>'
+    )
+    return '\n'.join(cards)
+
+@fragmento('alertas')
+def render_alertas_paginados(df_alertas, tipo, faixa_referencia):
+    """Ordenação e paginação no servidor; só a página visível é formatada e enviada
+
+    Fragmento: trocar ordem, tamanho ou página reexecuta só esta lista.
+    """
+    col_ordem, col_tamanho, col_pagina = st.columns(3)
+    with col_ordem:
+        ordem = st.selectbox("Ordenar por:", list(ORDENACOES_ALERTAS), key=f"alertas_{tipo}_ordem")
+    with col_tamanho:
+        tamanho = st.selectbox("Por página:", TAMANHOS_PAGINA_ALERTAS, key=f"alertas_{tipo}_tamanho")
+    n_paginas = max(1, -(-len(df_alertas) // tamanho))
+    with col_pagina:
+        pagina = st.number_input("Página:", min_value=1, max_value=n_paginas, value=1, step=1,
+                                 key=f"alertas_{tipo}_pagina")
+    pagina = min(int(pagina), n_paginas)
+
+    # Duração: menores primeiro nos alertas abaixo, maiores primeiro nos acima
+    coluna = ORDENACOES_ALERTAS[ordem]
+    crescente = {'duracao_horas': tipo == 'abaixo', 'data': False, 's_nm_recurso': True}[coluna]
+    inicio = (pagina - 1) * tamanho
+    pagina_df = df_alertas.sort_values(coluna, ascending=crescente, kind='stable').iloc[inicio:inicio + tamanho]
+
+    st.caption(f"Mostrando {inicio + 1}–{inicio + len(pagina_df)} de {len(df_alertas):,} (página {pagina}/{n_paginas})")
+    with instrumentacao.trecho(f'alertas.cards_{tipo}'):
+        cards = montar_cards_alerta(pagina_df, tipo, faixa_referencia)
+    st.markdown(cards, unsafe_allow_html=True)
+
+def render_aba_alertas(df_filtrado, faixa_referencia):
+    """Apontamentos abaixo e acima da faixa"""
+    st.header("🚨 Apontamentos Fora do Padrão")
+
+    st.info(f"ℹ️ **Nota:** Alertas consideram horas líquidas (após desconto de {ALMOCO:g}h de almoço)")
+
+    # Apontamentos ABAIXO da faixa
+    st.subheader(f"⬇️ Apontamentos Abaixo de {faixa_referencia:g}h (líquidas)")
+    df_abaixo = df_filtrado[df_filtrado['classificacao'] == 'Abaixo']
+
+    if len(df_abaixo) > 0:
+        render_alertas_paginados(df_abaixo, 'abaixo', faixa_referencia)
+    else:
+        st.success("✅ Nenhum apontamento abaixo da faixa!")
+
+    st.markdown("---")
+
+    # Apontamentos ACIMA da faixa
+    st.subheader(f"⬆️ Apontamentos Acima de {faixa_referencia:g}h (com horas extras)")
+    df_acima = df_filtrado[df_filtrado['classificacao'] == 'Acima']
+
+    if len(df_acima) > 0:
+        render_alertas_paginados(df_acima, 'acima', faixa_referencia)
+    else:
+        st.success("✅ Nenhum apontamento acima da faixa!")
+
+# ==================== ABA: ANÁLISE DETALHADA ====================
+def render_aba_analise(cubo, chave_filtro, faixa_referencia, tolerancia_faixa):
+    """Tabelas por funcionário e por dia"""
+    st.header("📊 Análise Detalhada por Funcionário")
+
+    # Análise por funcionário
+    analise_func = cubo.por_funcionario(chave_filtro, faixa_referencia, tolerancia_faixa).round(2)
+
+    st.dataframe(analise_func, use_container_width=True)
+
+    st.markdown("---")
+
+    # Análise por dia
+    st.subheader("📅 Análise Diária")
+    analise_diaria = cubo.por_dia(chave_filtro, faixa_referencia, tolerancia_faixa).round(2)
+
+    st.dataframe(analise_diaria, use_container_width=True)
+
+# ==================== ABA: ANÁLISE POR PESSOA ====================
+def render_aba_pessoa(obter_recorte, resumo, cubo, chave_filtro, faixa_referencia, tolerancia_faixa, chave_recorte):
+    """Métricas, tabela diária e evolução do funcionário selecionado (linhas só com funcionário escolhido)"""
+    funcionario_selecionado = chave_filtro[3]
+
+    st.header("👤 Análise Detalhada por Pessoa")
+
+    if funcionario_selecionado != 'Todos':
+        # Análise do funcionário selecionado
+        st.subheader(f"📊 Apontamentos de: {funcionario_selecionado}")
+
+        # Métricas do funcionário
+        col1, col2, col3, col4 = st.columns(4)
+
+        # Resumo do recorte, já filtrado pelo funcionário selecionado
+        total_apontamentos = resumo['total_registros']
+
+        with col1:
+            st.metric("Total de Apontamentos", total_apontamentos)
+
+        with col2:
+            st.metric("Total de Horas", f"{resumo['total_horas']:.1f}h")
+
+        with col3:
+            st.metric("Média Diária", f"{resumo['media_horas']:.2f}h")
+
+        with col4:
+            dias_criticos = resumo['abaixo']
+            st.metric("Dias Críticos", dias_criticos, 
+                     delta=f"{dias_criticos/total_apontamentos*100:.0f}%" if total_apontamentos > 0 else "0%",
+                     delta_color="inverse")
+
+        st.markdown("---")
+
+        # Tabela por dia com status
+        st.subheader("📅 Apontamentos por Dia com Status")
+
+        # Agrupar por dia - IMPORTANTE: não usar média, usar TOTAL do dia
+        analise_diaria_pessoa = cubo.por_dia(chave_filtro, faixa_referencia, tolerancia_faixa)[['Qtd', 'Total_h']].reset_index()
+
+        analise_diaria_pessoa.columns = ['Data', 'Qtd_Apt', 'Total_h']
+
+        # Classificar cada dia pelo TOTAL de horas do dia (não por apontamento)
+        analise_diaria_pessoa['Status_Dia'] = classificar_por_faixa(
+            analise_diaria_pessoa['Total_h'], faixa_referencia, tolerancia_faixa
+        )
+
+        # Calcular diferença vs meta
+        analise_diaria_pessoa['Diferença'] = analise_diaria_pessoa['Total_h'] - faixa_referencia
+        analise_diaria_pessoa['Diferença_fmt'] = analise_diaria_pessoa['Diferença'].apply(
+            lambda x: f"+{x:.1f}h" if x > 0 else f"{x:.1f}h"
+        )
+
+        # Adicionar emoji de status
+        def get_status_emoji(status):
+            if status == 'Abaixo':
+                return '🔴 Crítico'
+            elif status == 'Acima':
+                return '🟡 Atenção'
+            else:
+                return '🟢 OK'
+
+        analise_diaria_pessoa['Status'] = analise_diaria_pessoa['Status_Dia'].apply(get_status_emoji)
+
+        # Mostrar tabela
+        st.dataframe(
+            analise_diaria_pessoa[['Data', 'Qtd_Apt', 'Total_h', 'Diferença_fmt', 'Status']].sort_values('Data', ascending=False),
+            use_container_width=True,
+            height=400,
+            column_config={
+                'Data': 'Data',
+                'Qtd_Apt': 'Nº Apontamentos',
+                'Total_h': st.column_config.NumberColumn('Total Dia', format="%.2f h"),
+                'Diferença_fmt': f'vs Meta {faixa_referencia:g}h',
+                'Status': 'Status'
+            }
+        )
+
+        st.markdown("---")
+
+        # Gráfico de evolução da pessoa
+        st.subheader("📈 Evolução de Horas")
+
+        exibir_grafico('evolucao_pessoa', chave_recorte, lambda: graficos.evolucao_pessoa(
+            analise_diaria_pessoa, faixa_referencia, funcionario_selecionado))
+
+        # Detalhes de cada apontamento
+        st.subheader("📋 Todos os Apontamentos Detalhados")
+
+        # Adicionar coluna de status individual
+        pessoa_dados_display = obter_recorte().copy()  # Já filtrado pelo funcionário selecionado
+        pessoa_dados_display['Status'] = pessoa_dados_display['classificacao'].apply(get_status_emoji)
+
+        st.dataframe(
+            pessoa_dados_display[[
+                'data', 'd_dt_inicio_apontamento', 'd_dt_fim_apontamento',
+                'duracao_horas', 'Status', 's_ds_operacao'
+            ]].sort_values('data', ascending=False),
+            use_container_width=True,
+            column_config={
+                'data': 'Data',
+                'd_dt_inicio_apontamento': 'Início',
+                'd_dt_fim_apontamento': 'Fim',
+                'duracao_horas': 'Duração (h)',
+                'Status': 'Status',
+                's_ds_operacao': 'Operação'
+            },
+            height=400
+        )
+    else:
+        st.info("👈 Selecione um funcionário na sidebar para ver análise detalhada")
+
+# ==================== ABA: GRÁFICOS ====================
+def exibir_grafico(nome, chave_recorte, construir):
+    """Figura do cache compartilhado (mesmo recorte = mesma figura) ou construída agora"""
+    with instrumentacao.trecho(f'grafico.{nome}'):
+        figura, acerto = obter_cache_figuras().obter((chave_recorte, nome), construir)
+        instrumentacao.contar_cache('figuras', acerto)
+        if figura is None:
+            st.info("📭 Sem dados para este gráfico no recorte selecionado")
+        else:
+            st.plotly_chart(figura, use_container_width=True)
+
+def _mapa_semanal(cubo, chave_filtro):
+    # Top 10 funcionários para heatmap
+    heatmap_data = cubo.media_dia_semana(chave_filtro)
+    top_10_func = cubo.top_funcionarios(chave_filtro, 10).index
+    heatmap_data_filtered = heatmap_data[heatmap_data['s_nm_recurso'].isin(top_10_func)]
+    return graficos.padrao_semanal(
+        heatmap_data_filtered.pivot(index='s_nm_recurso', columns='dia_semana', values='duracao_horas')
+    )
+
+def render_aba_graficos(cubo, chave_filtro, faixa_referencia, tolerancia_faixa, chave_recorte):
+    """Distribuição, ranking, evolução temporal e padrão semanal"""
+    st.header("📈 Visualizações")
+
+    # Gráfico de pizza - Distribuição
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("Distribuição por Classificação")
+        exibir_grafico('distribuicao', chave_recorte, lambda: graficos.distribuicao(
+            cubo.distribuicao(chave_filtro, faixa_referencia, tolerancia_faixa), faixa_referencia))
+
+    with col2:
+        st.subheader("Total de Horas por Funcionário")
+        exibir_grafico('top_funcionarios', chave_recorte, lambda: graficos.top_funcionarios(
+            cubo.top_funcionarios(chave_filtro, 10)))
+
+    # Gráfico temporal
+    st.subheader("📅 Evolução Temporal")
+    exibir_grafico('evolucao_temporal', chave_recorte, lambda: graficos.evolucao_temporal(
+        cubo.por_dia_classificacao(chave_filtro, faixa_referencia, tolerancia_faixa)))
+
+    # Heatmap de horas por dia da semana
+    st.subheader("🗓️ Padrão Semanal")
+    exibir_grafico('padrao_semanal', chave_recorte, lambda: _mapa_semanal(cubo, chave_filtro))
+
+# ==================== ABA: HORAS EXTRAS ====================
+def render_aba_horas_extras(resumo, cubo, chave_filtro, chave_recorte):
+    """Métricas, ranking e evolução das horas extras"""
+    st.header("🕒 Análise de Horas Extras")
+
+    # Estatísticas gerais de horas extras (resumo memorizado do recorte)
+    total_funcionarios = resumo['funcionarios']
+    funcionarios_com_extras = resumo['funcionarios_com_extras']
+    total_horas_extras = resumo['total_horas_extras']
+    total_horas_pagas = resumo['total_horas_pagas']
+    total_horas_normais = resumo['total_horas']
+
+    # Métricas principais
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.metric(
+            label="👥 Funcionários com Hora Extra",
+            value=f"{funcionarios_com_extras}/{total_funcionarios}",
+            delta=f"{funcionarios_com_extras/total_funcionarios*100:.1f}%" if total_funcionarios > 0 else "0%"
+        )
+
+    with col2:
+        st.metric(
+            label="⏱️ Total Horas Extras",
+            value=f"{total_horas_extras:.1f}h",
+            delta=f"{total_horas_extras/total_horas_normais*100:.1f}% do total" if total_horas_normais > 0 else "0%"
+        )
+
+    with col3:
+        st.metric(
+            label="💰 Total Horas Pagas",
+            value=f"{total_horas_pagas:.1f}h",
+            delta=f"+{total_horas_pagas-total_horas_normais:.1f}h extras"
+        )
+
+    with col4:
+        custo_extra = (total_horas_pagas - total_horas_normais) * ADICIONAL_EXTRA
+        st.metric(
+            label="📈 Custo Adicional",
+            value=f"+{custo_extra:.1f}h",
+            delta=f"{ADICIONAL_EXTRA:.0%} sobre extras"
+        )
+
+    # Gráfico de distribuição de horas extras
+    st.subheader("📊 Distribuição de Horas Extras por Funcionário")
+
+    funcionarios_extras = cubo.extras_por_funcionario(chave_filtro)
+
+    if len(funcionarios_extras) > 0:
+        exibir_grafico('horas_extras', chave_recorte, lambda: graficos.extras_por_funcionario(funcionarios_extras))
+
+        # Tabela detalhada
+        st.subheader("📋 Detalhamento por Funcionário")
+        funcionarios_extras_display = funcionarios_extras.copy()
+        funcionarios_extras_display['custo_adicional'] = (funcionarios_extras_display['horas_pagas'] - funcionarios_extras_display['duracao_horas']) * ADICIONAL_EXTRA
+        funcionarios_extras_display = funcionarios_extras_display.round(2)
+        funcionarios_extras_display.columns = ['Horas Extras', 'Horas Pagas', 'Horas Trabalhadas', f'Custo Adicional ({ADICIONAL_EXTRA:.0%})']
+        st.dataframe(funcionarios_extras_display, use_container_width=True)
+    else:
+        st.info("✅ Nenhuma hora extra registrada no período selecionado!")
+
+    # Análise temporal de horas extras
+    if resumo['jornadas_com_extras'] > 0:
+        st.subheader("📅 Evolução das Horas Extras")
+
+        exibir_grafico('evolucao_extras', chave_recorte, lambda: graficos.evolucao_extras(
+            cubo.extras_por_data(chave_filtro)))
+
+# ==================== ABA: DADOS BRUTOS ====================
+@fragmento('dados')
+def render_aba_dados(df_filtrado, chave_filtro, chave_recorte):
+    """Tabela filtrada e download em CSV
+
+    Fragmento: o filtro de classificação, o formato e a geração do arquivo
+    reexecutam só esta aba.
+    """
+    data_inicio, data_fim = chave_filtro[:2]
+
+    st.header("📋 Dados Filtrados")
+
+    # Opções de visualização
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        mostrar_classificacao = st.multiselect(
+            "Filtrar por classificação:",
+            ['Abaixo', 'Normal', 'Acima'],
+            default=['Abaixo', 'Acima']
+        )
+
+    # Filtrar
+    if mostrar_classificacao:
+        df_exibir = df_filtrado[df_filtrado['classificacao'].isin(mostrar_classificacao)]
+    else:
+        df_exibir = df_filtrado
+
+    # Selecionar colunas para exibir
+    colunas_exibir = [
+        'data', 's_nm_recurso', 's_nm_usuario_valida',
+        'duracao_horas', 'classificacao', 's_ds_operacao'
+    ]
+
+    st.dataframe(
+        df_exibir[colunas_exibir].sort_values('data', ascending=False),
+        use_container_width=True,
+        height=400
+    )
+
+    # Export sob demanda: o arquivo só é gerado ao clicar e fica em cache por recorte exibido
+    st.subheader("📥 Exportar")
+    chave_exportacao = (chave_recorte, tuple(mostrar_classificacao))
+    col_formato, col_acao = st.columns([2, 1])
+    with col_formato:
+        formato = st.selectbox(
+            "Formato:",
+            exportacao.formatos_disponiveis(),
+            format_func=lambda f: exportacao.FORMATOS[f]['rotulo'],
+            key="formato_exportacao"
+        )
+
+    # Aberto já aqui: se outra sessão removeu o arquivo da pasta, volta a oferecer "Gerar arquivo"
+    aberto = exportacao.abrir(exportacao.localizar(chave_exportacao, formato))
+    if aberto is not None:
+        instrumentacao.contar_cache('exportacao', True)
+    with col_acao:
+        if aberto is None and st.button("⚙️ Gerar arquivo", key="gerar_exportacao"):
+            instrumentacao.contar_cache('exportacao', False)
+            try:
+                with st.spinner(f"Gerando {len(df_exibir):,} registros..."), instrumentacao.trecho(f'exportacao.{formato}'):
+                    aberto = exportacao.abrir(exportacao.exportar(df_exibir, chave_exportacao, formato))
+            except ValueError as e:
+                st.error(f"❌ {e}")
+            else:
+                if aberto is None:
+                    st.warning("⚠️ O arquivo foi removido antes do download. Gere novamente.")
+
+    if aberto is not None:
+        arquivo, tamanho = aberto
+        with arquivo:
+            # Sem data sob demanda o Streamlit copia o arquivo inteiro para a memória a cada rerun
+            dados = (lambda: exportacao.conteudo(df_exibir, chave_exportacao, formato)) if DOWNLOAD_SOB_DEMANDA else arquivo
+            st.download_button(
+                label=f"📥 Baixar {exportacao.FORMATOS[formato]['rotulo']} ({tamanho / 1024:,.0f} KB)",
+                data=dados,
+                file_name=f"apontamentos_{data_inicio}_{data_fim}{exportacao.FORMATOS[formato]['extensao']}",
+                mime=exportacao.FORMATOS[formato]['mime']
+            )
+
+# ==================== DIAGNÓSTICO ====================
+def render_diagnostico(registro, historico):
+    """Trechos do rerun (aninhados), contadores de cache e totais dos últimos reruns"""
+    total = registro['total_ms']
+    anterior = historico[-2] if len(historico) > 1 else None
+    st.metric("⏱️ Rerun", f"{total:,.0f} ms",
+              delta=f"{total - anterior:+,.0f} ms" if anterior is not None else None, delta_color="inverse")
+
+    trechos = pd.DataFrame(registro['trechos'])
+    if len(trechos):
+        trechos['trecho'] = ['· ' * nivel + nome for nome, nivel in zip(trechos['nome'], trechos['nivel'])]
+        trechos['%'] = trechos['duracao_ms'] / total * 100 if total else 0.0
+        st.dataframe(
+            trechos[['trecho', 'duracao_ms', '%']],
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                'trecho': 'Trecho',
+                'duracao_ms': st.column_config.NumberColumn('ms', format="%.1f"),
+                '%': st.column_config.NumberColumn('% do rerun', format="%.0f%%")
+            }
+        )
+
+    if registro['contadores']:
+        st.caption(" · ".join(f"{nome}: {valor:,}" for nome, valor in registro['contadores'].items()))
+    if len(historico) > 1:
+        st.caption(f"Últimos {len(historico)} reruns (ms)")
+        st.bar_chart(pd.Series(historico, name='ms'), height=120)
+    if instrumentacao.ARQUIVO_LOG:
+        st.caption(f"📄 Log: {instrumentacao.ARQUIVO_LOG}")
+
+def parar_rerun(detalhe, **contexto):
+    """st.stop() com a medição fechada: o rerun vai para o log como parado, não como interrompido"""
+    instrumentacao.gravar_log(instrumentacao.finalizar(
+        sessao=id_sessao_chat(), motivo='parado', detalhe=detalhe, **contexto))
     st.stop()
 
+# Regras de jornada (almoço, limite diário, adicional de horas extras)
+REGRAS = regras_jornada.carregar_regras()
+ALMOCO = REGRAS['horas_almoco']
+LIMITE_DIARIO = REGRAS['limite_diario']
+MULTIPLICADOR_EXTRA = REGRAS['multiplicador_extra']
+ADICIONAL_EXTRA = MULTIPLICADOR_EXTRA - 1
+
+# Carregar dados
+try:
+    with instrumentacao.trecho('carregar_dados'):
+        instrumentacao.contar('cache.conjunto.chamadas')
+        conjunto = carregar_dados(carregamento.versao_dados(), motor_duckdb.motor_ativo())
+except ValueError as e:
+    st.error(f"❌ Erro ao carregar os dados: {e}")
+    parar_rerun('erro_carga')
+
+if conjunto is None:
+    st.error("❌ Nenhum dado encontrado! Execute: python ingestao_sql.py (ou coloque um dados_com_duracao_*.csv em resultados/)")
+    parar_rerun('sem_dados')
+
+if motor_duckdb.MOTOR == 'duckdb' and not motor_duckdb.DUCKDB_DISPONIVEL:
+    st.warning("⚠️ DASHBOARD_MOTOR=duckdb requer o pacote duckdb: usando o motor em memória")
+
+# Cubo compartilhado (em memória ou DuckDB): nunca alterar no script, só recortar
+cubo = conjunto.cubo
+memos_inicio = instrumentacao.estatisticas_memos(cubo, conjunto)
+
+# Limites do período: o motor em memória analisa até 30 dias dentro dos últimos 90;
+# o DuckDB consulta os Parquet direto e aceita qualquer intervalo do histórico
+if conjunto.motor == 'duckdb':
+    max_dias_periodo = horizonte_dias = None
+else:
+    max_dias_periodo, horizonte_dias = 30, 90
+
 # ==================== SIDEBAR COM FILTROS ====================
 with st.sidebar:
     st.header("🔍 Filtros de Análise")
     
     # Filtro de Período
     st.subheader("📅 Período")
-    data_min = df_original['data'].min().date()
-    data_max = df_original['data'].max().date()
-    
-    # Calcular limite de 90 dias atrás
-    data_limite_90_dias = data_max - timedelta(days=90)
+    data_min = conjunto.data_min
+    data_max = conjunto.data_max
     
-    # Ajustar data mínima para não ultrapassar 90 dias
-    data_min_permitida = max(data_min, data_limite_90_dias)
+    # Ajustar data mínima para não ultrapassar o horizonte (últimos 90 dias no motor em memória)
+    if horizonte_dias:
+        data_min_permitida = max(data_min, data_max - timedelta(days=horizonte_dias))
+        descricao_horizonte = f"últimos {horizonte_dias} dias"
+    else:
+        data_min_permitida = data_min
+        descricao_horizonte = "histórico completo"
     
     # ✅ PADRÃO: Carregar automaticamente os últimos 30 dias
     data_inicio_padrao = data_max - timedelta(days=29)  # 29 + hoje = 30 dias
     data_inicio_padrao = max(data_inicio_padrao, data_min_permitida)  # Não ultrapassar limites
     
     # Mostrar informação sobre o período disponível
-    st.info(f"📅 **Período disponível**: {data_min_permitida.strftime('%d/%m/%Y')} a {data_max.strftime('%d/%m/%Y')} (últimos 90 dias)")
+    st.info(f"📅 **Período disponível**: {data_min_permitida.strftime('%d/%m/%Y')} a {data_max.strftime('%d/%m/%Y')} ({descricao_horizonte})")
     st.success(f"🎯 **Carregado automaticamente**: Últimos 30 dias ({data_inicio_padrao.strftime('%d/%m/%Y')} a {data_max.strftime('%d/%m/%Y')})")
     
     # Períodos pré-definidos
@@ -542,7 +1021,7 @@ with st.sidebar:
             value=st.session_state['periodo_inicio'],
             min_value=data_min_permitida,
             max_value=data_max,
-            help="Período limitado aos últimos 90 dias",
+            help=f"Período limitado a: {descricao_horizonte}",
             key='date_inicio_input'
         )
         # Atualizar session_state quando usuário muda manualmente
@@ -555,72 +1034,89 @@ with st.sidebar:
             value=st.session_state['periodo_fim'],
             min_value=data_min_permitida,
             max_value=data_max,
-            help="Período limitado aos últimos 90 dias",
+            help=f"Período limitado a: {descricao_horizonte}",
             key='date_fim_input'
         )
         # Atualizar session_state quando usuário muda manualmente
         if data_fim != st.session_state['periodo_fim']:
             st.session_state['periodo_fim'] = data_fim
     
-    # Validação: máximo 30 dias de intervalo
+    # Validação: máximo 30 dias de intervalo (sem limite no DuckDB)
     if data_inicio and data_fim:
         dias_selecionados = (data_fim - data_inicio).days + 1
         
-        if dias_selecionados > 30:
-            st.error(f"⚠️ **Intervalo muito grande!** Selecionados: {dias_selecionados} dias. Máximo permitido: 30 dias.")
-            st.info("💡 **Ajuste**: Selecione um período de até 30 dias para análise.")
+        if max_dias_periodo and dias_selecionados > max_dias_periodo:
+            st.error(f"⚠️ **Intervalo muito grande!** Selecionados: {dias_selecionados} dias. Máximo permitido: {max_dias_periodo} dias.")
+            st.info(f"💡 **Ajuste**: Selecione um período de até {max_dias_periodo} dias para análise.")
             
-            # Ajustar automaticamente para 30 dias a partir da data início
-            data_fim_sugerida = data_inicio + timedelta(days=29)  # 29 + data_início = 30 dias
+            # Ajustar automaticamente para o máximo a partir da data início
+            data_fim_sugerida = data_inicio + timedelta(days=max_dias_periodo - 1)
             if data_fim_sugerida <= data_max:
-                st.warning(f"🔧 **Sugestão automática**: Período ajustado para {data_inicio.strftime('%d/%m/%Y')} a {data_fim_sugerida.strftime('%d/%m/%Y')} (30 dias)")
+                st.warning(f"🔧 **Sugestão automática**: Período ajustado para {data_inicio.strftime('%d/%m/%Y')} a {data_fim_sugerida.strftime('%d/%m/%Y')} ({max_dias_periodo} dias)")
                 data_fim = data_fim_sugerida
             else:
                 # Se não puder ajustar para frente, ajustar para trás
-                data_inicio_sugerida = data_fim - timedelta(days=29)
-                st.warning(f"🔧 **Sugestão automática**: Período ajustado para {data_inicio_sugerida.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')} (30 dias)")
+                data_inicio_sugerida = data_fim - timedelta(days=max_dias_periodo - 1)
+                st.warning(f"🔧 **Sugestão automática**: Período ajustado para {data_inicio_sugerida.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')} ({max_dias_periodo} dias)")
                 data_inicio = data_inicio_sugerida
+        elif max_dias_periodo:
+            st.success(f"✅ **Período válido**: {dias_selecionados} dias selecionados (máximo: {max_dias_periodo} dias)")
         else:
-            st.success(f"✅ **Período válido**: {dias_selecionados} dias selecionados (máximo: 30 dias)")
+            st.success(f"✅ **Período válido**: {dias_selecionados} dias selecionados")
+    
+    # Totais do período (jornadas e funcionários não dependem da faixa)
+    with instrumentacao.trecho('filtros.periodo'):
+        periodo_info = cubo.resumo((data_inicio, data_fim, 'Todos', 'Todos'), LIMITE_DIARIO, REGRAS['tolerancia_faixa'])
     
     # Mostrar estatísticas do período selecionado
     with st.expander("📊 Informações do Período Selecionado"):
         if data_inicio and data_fim:
-            periodo_info = df_original[
-                (df_original['data'].dt.date >= data_inicio) &
-                (df_original['data'].dt.date <= data_fim)
-            ]
-            
             col_info1, col_info2, col_info3 = st.columns(3)
             with col_info1:
                 st.metric("📅 Dias", f"{dias_selecionados}")
             with col_info2:
-                st.metric("📊 Apontamentos", f"{len(periodo_info):,}")
+                st.metric("📊 Apontamentos", f"{periodo_info['total_registros']:,}")
             with col_info3:
-                st.metric("👥 Funcionários", f"{periodo_info['s_nm_recurso'].nunique()}")
+                st.metric("👥 Funcionários", f"{periodo_info['funcionarios']}")
             
-            if len(periodo_info) == 0:
+            if periodo_info['total_registros'] == 0:
                 st.warning("⚠️ Nenhum dado encontrado para o período selecionado!")
             else:
-                st.success(f"✅ Dados carregados: {len(periodo_info):,} registros para análise")
+                st.success(f"✅ Dados carregados: {periodo_info['total_registros']:,} registros para análise")
     
     # Filtro de Validador
     st.subheader("👤 Validador (s_nm_usuario_valida)")
-    validadores = ['Todos'] + sorted(df_original['s_nm_usuario_valida'].dropna().unique().tolist())
+    validadores = ['Todos'] + conjunto.validadores
     validador_selecionado = st.selectbox("Selecione o validador:", validadores)
     
     # Filtro de Funcionário
     st.subheader("👨‍💼 Funcionário (s_nm_recurso)")
-    funcionarios = ['Todos'] + sorted(df_original['s_nm_recurso'].dropna().unique().tolist())
+    funcionarios = ['Todos'] + conjunto.funcionarios
     funcionario_selecionado = st.selectbox("Selecione o funcionário:", funcionarios)
     
     # Faixa de Referência
     st.subheader("⏱️ Faixa de Análise")
+    faixas = REGRAS['faixas_referencia']
     faixa_referencia = st.selectbox(
         "Referência de horas:",
-        [4.0, 6.0, 8.0],
-        index=2,
-        format_func=lambda x: f"{int(x)}h00min"
+        faixas + ['Personalizada'],
+        index=faixas.index(LIMITE_DIARIO) if LIMITE_DIARIO in faixas else 0,
+        format_func=lambda x: x if isinstance(x, str) else f"{int(x)}h{round(x % 1 * 60):02d}min"
+    )
+    tolerancia_faixa = REGRAS['tolerancia_faixa']
+    if faixa_referencia == 'Personalizada':
+        col_faixa, col_tolerancia = st.columns(2)
+        with col_faixa:
+            faixa_referencia = st.number_input("Faixa (h)", min_value=0.5, max_value=24.0, value=LIMITE_DIARIO, step=0.5)
+        with col_tolerancia:
+            tolerancia_faixa = st.number_input("Tolerância (h)", min_value=0.0, max_value=4.0, value=tolerancia_faixa, step=0.25)
+    
+    # Exibição das abas
+    st.subheader("🗂️ Abas")
+    abas_sob_demanda = st.toggle(
+        "⚡ Calcular só a aba aberta",
+        value=True,
+        help="Desative para usar as abas clássicas (todas calculadas a cada interação)"
     )
     
     st.markdown("---")
@@ -648,57 +1144,60 @@ with st.sidebar:
     
     # Informações do sistema
     with st.expander("ℹ️ Informações do Sistema"):
+        if conjunto.motor == 'duckdb':
+            motor = f"DuckDB sobre {conjunto.particoes} partição(ões) mensal(is) em Parquet (dados em disco)"
+        else:
+            motor = (f"em memória, {conjunto.bytes_memoria / 1024**2:.1f} MB "
+                     f"({conjunto.bytes_memoria / max(conjunto.n_jornadas, 1):.0f} bytes/jornada)")
         st.markdown(f"""
         **Dados carregados:**
-        - Total de registros: {len(df_original):,}
-        - Período completo: {df_original['data'].min().strftime('%d/%m/%Y')} a {df_original['data'].max().strftime('%d/%m/%Y')}
-        - Funcionários únicos: {df_original['s_nm_recurso'].nunique()}
+        - Total de registros: {conjunto.n_jornadas:,}
+        - Período completo: {data_min.strftime('%d/%m/%Y')} a {data_max.strftime('%d/%m/%Y')}
+        - Funcionários únicos: {len(conjunto.funcionarios)}
+        - Motor de consultas: {motor}
         - Última atualização: {datetime.now().strftime('%d/%m/%Y %H:%M')}
         """)
+    
+    # Tempos do rerun (preenchido no fim do script, quando todos os trechos fecharam)
+    diagnostico = st.toggle(
+        "🩺 Diagnóstico",
+        value=instrumentacao.DIAGNOSTICO_PADRAO,
+        key="diagnostico",
+        help="Mostra onde o tempo de cada interação foi gasto (carga, filtros, abas, gráficos, chat)"
+    )
+    painel_diagnostico = st.empty()
 
 # ==================== APLICAR FILTROS ====================
 # Validação final antes de processar
 if data_inicio and data_fim:
     dias_periodo = (data_fim - data_inicio).days + 1
     
-    if dias_periodo > 30:
-        st.error("❌ **Não é possível processar**: Período maior que 30 dias. Ajuste as datas na sidebar.")
-        st.stop()
+    if max_dias_periodo and dias_periodo > max_dias_periodo:
+        st.error(f"❌ **Não é possível processar**: Período maior que {max_dias_periodo} dias. Ajuste as datas na sidebar.")
+        parar_rerun('periodo_longo', motor=conjunto.motor, periodo=[str(data_inicio), str(data_fim)])
     
     # Verificar se está dentro dos últimos 90 dias
-    data_limite_90_dias = data_max - timedelta(days=90)
-    if data_inicio < data_limite_90_dias:
-        st.error(f"❌ **Período muito antigo**: Selecione datas a partir de {data_limite_90_dias.strftime('%d/%m/%Y')} (últimos 90 dias).")
-        st.stop()
-
-# Filtrar por período
-df_filtrado = df_original[
-    (df_original['data'].dt.date >= data_inicio) &
-    (df_original['data'].dt.date <= data_fim)
-].copy()
-
-# Filtrar por validador
-if validador_selecionado != 'Todos':
-    df_filtrado = df_filtrado[
-        df_filtrado['s_nm_usuario_valida'] == validador_selecionado
-    ]
+    if horizonte_dias and data_inicio < data_max - timedelta(days=horizonte_dias):
+        st.error(f"❌ **Período muito antigo**: Selecione datas a partir de {data_min_permitida.strftime('%d/%m/%Y')} ({descricao_horizonte}).")
+        parar_rerun('periodo_antigo', motor=conjunto.motor, periodo=[str(data_inicio), str(data_fim)])
 
-# Filtrar por funcionário
-if funcionario_selecionado != 'Todos':
-    df_filtrado = df_filtrado[
-        df_filtrado['s_nm_recurso'] == funcionario_selecionado
-    ]
+# Filtrar por período, validador e funcionário: a sessão guarda só a chave; as
+# posições e a classificação da faixa vêm memorizadas do conjunto compartilhado
+chave_filtro = (data_inicio, data_fim, validador_selecionado, funcionario_selecionado)
 
-# Classificar por faixa
-df_filtrado['classificacao'] = df_filtrado['duracao_horas'].apply(
-    lambda x: classificar_por_faixa(x, faixa_referencia)
-)
+# Linhas do recorte materializadas só quando uma aba precisa delas (alertas, pessoa, dados brutos)
+recorte_atual = lru_cache(maxsize=None)(instrumentacao.medido('filtros.recorte')(
+    partial(conjunto.recorte, chave_filtro, faixa_referencia, tolerancia_faixa)))
+
+# Totais do recorte em uma passada (cabeçalho, chat e horas extras)
+with instrumentacao.trecho('filtros.resumo'):
+    resumo = cubo.resumo(chave_filtro, faixa_referencia, tolerancia_faixa)
 
 # ==================== MÉTRICAS PRINCIPAIS ====================
 st.header("📊 Resumo do Período")
 
 # Informações básicas do período
-if len(df_filtrado) > 0:
+if resumo['total_registros'] > 0:
     dias_periodo = (data_fim - data_inicio).days + 1
     
     col_info1, col_info2 = st.columns(2)
@@ -713,28 +1212,28 @@ if len(df_filtrado) > 0:
     with col_info2:
         st.metric(
             "📊 Jornadas Analisadas",
-            f"{len(df_filtrado):,}",
+            f"{resumo['total_registros']:,}",
             help="Total de jornadas diárias no período (dados agregados por funcionário/dia)"
         )
 
 # Estatísticas compactas em uma linha
-abaixo = len(df_filtrado[df_filtrado['classificacao'] == 'Abaixo'])
-normal = len(df_filtrado[df_filtrado['classificacao'] == 'Normal'])
-acima = len(df_filtrado[df_filtrado['classificacao'] == 'Acima'])
-total_horas = df_filtrado['duracao_horas'].sum()
-
-if len(df_filtrado) > 0:
-    perc_abaixo = abaixo/len(df_filtrado)*100
-    perc_normal = normal/len(df_filtrado)*100
-    perc_acima = acima/len(df_filtrado)*100
+abaixo = resumo['abaixo']
+normal = resumo['normal']
+acima = resumo['acima']
+total_horas = resumo['total_horas']
+
+if resumo['total_registros'] > 0:
+    perc_abaixo = abaixo/resumo['total_registros']*100
+    perc_normal = normal/resumo['total_registros']*100
+    perc_acima = acima/resumo['total_registros']*100
 else:
     perc_abaixo = perc_normal = perc_acima = 0
 
 st.markdown(f"""
 <div style="background-color: #f0f2f6; padding: 8px; border-radius: 5px; font-size: 12px; line-height: 1.2;">
-    <b>⬇️ Abaixo {int(faixa_referencia)}h:</b> {abaixo} ({perc_abaixo:.1f}%) &nbsp;&nbsp;|&nbsp;&nbsp;
-    <b>✅ Normal (~{int(faixa_referencia)}h):</b> {normal} ({perc_normal:.1f}%) &nbsp;&nbsp;|&nbsp;&nbsp;
-    <b>⬆️ Acima {int(faixa_referencia)}h:</b> {acima} ({perc_acima:.1f}%) &nbsp;&nbsp;|&nbsp;&nbsp;
+    <b>⬇️ Abaixo {faixa_referencia:g}h:</b> {abaixo} ({perc_abaixo:.1f}%) &nbsp;&nbsp;|&nbsp;&nbsp;
+    <b>✅ Normal (~{faixa_referencia:g}h):</b> {normal} ({perc_normal:.1f}%) &nbsp;&nbsp;|&nbsp;&nbsp;
+    <b>⬆️ Acima {faixa_referencia:g}h:</b> {acima} ({perc_acima:.1f}%) &nbsp;&nbsp;|&nbsp;&nbsp;
     <b>⏱️ Total:</b> {total_horas:.1f}h
 </div>
 """, unsafe_allow_html=True)
@@ -747,488 +1246,72 @@ col_main, col_chat = st.columns([3, 1])
 
 with col_chat:
     # Chat lateral sempre visível
-    render_chat_lateral(df_filtrado, data_inicio, data_fim, validador_selecionado, faixa_referencia)
+    # Consultas sob demanda do chat, presas ao recorte atual
+    motor_chat = ferramentas_chat.MotorConsultas(cubo, chave_filtro, faixa_referencia, tolerancia_faixa)
+    with instrumentacao.trecho('chat'):
+        render_chat_lateral(resumo, data_inicio, data_fim, validador_selecionado, faixa_referencia, motor_chat)
 
-with col_main:
-    # ==================== TABS ====================
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-        "🚨 Alertas",
-        "📊 Análise Detalhada", 
-        "👤 Por Pessoa",
-        "📈 Gráficos",
-        "🕒 Horas Extras",
-        "📋 Dados Brutos"
-    ])
-
-    # ==================== TAB 1: ALERTAS ====================
-    with tab1:
-        st.header("🚨 Apontamentos Fora do Padrão")
-        
-        st.info("ℹ️ **Nota:** Alertas consideram horas líquidas (após desconto de 1h de almoço)")
-        
-        # Apontamentos ABAIXO da faixa
-        st.subheader(f"⬇️ Apontamentos Abaixo de {int(faixa_referencia)}h (líquidas)")
-        df_abaixo = df_filtrado[df_filtrado['classificacao'] == 'Abaixo'].sort_values('duracao_horas')
-        
-        if len(df_abaixo) > 0:
-            for idx, row in df_abaixo.head(20).iterrows():
-                # Usar horas líquidas (após desconto de almoço)
-                duracao_bruta = float(row['duracao_bruta']) if 'duracao_bruta' in row else float(row['duracao_horas'])
-                duracao_liquida = float(row['duracao_liquida']) if 'duracao_liquida' in row else duracao_bruta - 1.0
-                diferenca = faixa_referencia - duracao_liquida
-                
-                horas_bruta = int(duracao_bruta)
-                minutos_bruta = int((duracao_bruta - horas_bruta) * 60)
-                
-                horas_liquida = int(duracao_liquida)
-                minutos_liquida = int((duracao_liquida - horas_liquida) * 60)
-                
-                # Tipo de dia
-                tipo_dia = str(row['tipo_dia']) if 'tipo_dia' in row else ''
-                
-                # Pegar nome da operação com segurança
-                operacao = str(row['s_ds_operacao'])[:50] if pd.notna(row['s_ds_operacao']) else 'N/A'
-                nome = str(row['s_nm_recurso']) if pd.notna(row['s_nm_recurso']) else 'N/A'
-                
-                st.markdown(f"""
-                <div class="alert-box alert-low">
-                    <strong>📅 {row['data'].strftime('%d/%m/%Y')}</strong> {tipo_dia} - 
-                    <strong>{nome}</strong><br>
-                    ⏱️ Apontado: {horas_bruta}h{minutos_bruta:02d}min ({duracao_bruta:.2f}h)<br>
-                    🍽️ Líquido (após almoço): {horas_liquida}h{minutos_liquida:02d}min ({duracao_liquida:.2f}h)<br>
-                    ⚠️ Falta: {diferenca:.2f}h para atingir {int(faixa_referencia)}h líquidas<br>
-                    📝 Operação: {operacao}...
-                </div>
-                """, unsafe_allow_html=True)
-        else:
-            st.success("✅ Nenhum apontamento abaixo da faixa!")
-        
-        st.markdown("---")
-        
-        # Apontamentos ACIMA da faixa
-        st.subheader(f"⬆️ Apontamentos Acima de {int(faixa_referencia)}h (com horas extras)")
-        df_acima = df_filtrado[df_filtrado['classificacao'] == 'Acima'].sort_values('duracao_horas', ascending=False)
-        
-        if len(df_acima) > 0:
-            for idx, row in df_acima.head(20).iterrows():
-                # Usar horas líquidas e extras
-                duracao_bruta = float(row['duracao_bruta']) if 'duracao_bruta' in row else float(row['duracao_horas'])
-                duracao_liquida = float(row['duracao_liquida']) if 'duracao_liquida' in row else duracao_bruta - 1.0
-                horas_extras = float(row['horas_extras']) if 'horas_extras' in row else max(0, duracao_liquida - 8)
-                
-                horas_bruta = int(duracao_bruta)
-                minutos_bruta = int((duracao_bruta - horas_bruta) * 60)
-                
-                horas_liquida = int(duracao_liquida)
-                minutos_liquida = int((duracao_liquida - horas_liquida) * 60)
-                
-                # Tipo de dia
-                tipo_dia = str(row['tipo_dia']) if 'tipo_dia' in row else ''
-                
-                # Pegar nome da operação com segurança
-                operacao = str(row['s_ds_operacao'])[:50] if pd.notna(row['s_ds_operacao']) else 'N/A'
-                nome = str(row['s_nm_recurso']) if pd.notna(row['s_nm_recurso']) else 'N/A'
-                
-                st.markdown(f"""
-                <div class="alert-box alert-high">
-                    <strong>📅 {row['data'].strftime('%d/%m/%Y')}</strong> {tipo_dia} - 
-                    <strong>{nome}</strong><br>
-                    ⏱️ Apontado: {horas_bruta}h{minutos_bruta:02d}min ({duracao_bruta:.2f}h)<br>
-                    🍽️ Líquido (após almoço): {horas_liquida}h{minutos_liquida:02d}min ({duracao_liquida:.2f}h)<br>
-                    🔴 Horas Extras: {horas_extras:.2f}h acima de 8h<br>
-                    📝 Operação: {operacao}...
-                </div>
-                """, unsafe_allow_html=True)
-        else:
-            st.success("✅ Nenhum apontamento acima da faixa!")
+# Chave do recorte completo (versão dos dados + filtros + faixa) para os caches das abas
+chave_recorte = (conjunto.versao, chave_filtro, faixa_referencia, tolerancia_faixa)
 
-    # ==================== TAB 2: ANÁLISE DETALHADA ====================
-    with tab2:
-        st.header("📊 Análise Detalhada por Funcionário")
-        
-        # Análise por funcionário
-        analise_func = df_filtrado.groupby('s_nm_recurso').agg({
-            'duracao_horas': ['count', 'sum', 'mean', 'min', 'max'],
-            'classificacao': lambda x: (x == 'Abaixo').sum()
-        }).round(2)
-        
-        analise_func.columns = ['Qtd', 'Total_h', 'Média_h', 'Min_h', 'Max_h', 'Abaixo_Padrão']
-        analise_func = analise_func.sort_values('Total_h', ascending=False)
-        
-        # Adicionar classificação geral
-        analise_func['Status'] = analise_func.apply(
-            lambda row: '🔴 Crítico' if row['Abaixo_Padrão'] > row['Qtd'] * 0.3
-                        else '🟡 Atenção' if row['Abaixo_Padrão'] > 0
-                        else '🟢 OK',
-            axis=1
-        )
-        
-        st.dataframe(analise_func, use_container_width=True)
-        
-        st.markdown("---")
-        
-        # Análise por dia
-        st.subheader("📅 Análise Diária")
-        analise_diaria = df_filtrado.groupby(df_filtrado['data'].dt.date).agg({
-            'duracao_horas': ['count', 'sum', 'mean'],
-            'classificacao': [
-                lambda x: (x == 'Abaixo').sum(),
-                lambda x: (x == 'Normal').sum(),
-                lambda x: (x == 'Acima').sum()
-            ]
-        }).round(2)
-        
-        analise_diaria.columns = ['Qtd', 'Total_h', 'Média_h', 'Abaixo', 'Normal', 'Acima']
-        
-        st.dataframe(analise_diaria, use_container_width=True)
+ABAS = {
+    "🚨 Alertas": lambda: render_aba_alertas(recorte_atual(), faixa_referencia),
+    "📊 Análise Detalhada": lambda: render_aba_analise(cubo, chave_filtro, faixa_referencia, tolerancia_faixa),
+    "👤 Por Pessoa": lambda: render_aba_pessoa(recorte_atual, resumo, cubo, chave_filtro, faixa_referencia, tolerancia_faixa, chave_recorte),
+    "📈 Gráficos": lambda: render_aba_graficos(cubo, chave_filtro, faixa_referencia, tolerancia_faixa, chave_recorte),
+    "🕒 Horas Extras": lambda: render_aba_horas_extras(resumo, cubo, chave_filtro, chave_recorte),
+    "📋 Dados Brutos": lambda: render_aba_dados(recorte_atual(), chave_filtro, chave_recorte)
+}
 
-    # ==================== TAB 3: ANÁLISE POR PESSOA ====================
-    with tab3:
-        st.header("👤 Análise Detalhada por Pessoa")
-        
-        if funcionario_selecionado != 'Todos':
-            # Análise do funcionário selecionado
-            st.subheader(f"📊 Apontamentos de: {funcionario_selecionado}")
-            
-            # Métricas do funcionário
-            col1, col2, col3, col4 = st.columns(4)
-            
-            pessoa_dados = df_filtrado[df_filtrado['s_nm_recurso'] == funcionario_selecionado]
-            
-            with col1:
-                st.metric("Total de Apontamentos", len(pessoa_dados))
-            
-            with col2:
-                st.metric("Total de Horas", f"{pessoa_dados['duracao_horas'].sum():.1f}h")
-            
-            with col3:
-                st.metric("Média Diária", f"{pessoa_dados['duracao_horas'].mean():.2f}h")
-            
-            with col4:
-                dias_criticos = len(pessoa_dados[pessoa_dados['classificacao'] == 'Abaixo'])
-                st.metric("Dias Críticos", dias_criticos, 
-                         delta=f"{dias_criticos/len(pessoa_dados)*100:.0f}%" if len(pessoa_dados) > 0 else "0%",
-                         delta_color="inverse")
-            
-            st.markdown("---")
-            
-            # Tabela por dia com status
-            st.subheader("📅 Apontamentos por Dia com Status")
-            
-            # Agrupar por dia - IMPORTANTE: não usar média, usar TOTAL do dia
-            analise_diaria_pessoa = pessoa_dados.groupby(pessoa_dados['data'].dt.date).agg({
-                'duracao_horas': ['count', 'sum']
-            }).reset_index()
-            
-            analise_diaria_pessoa.columns = ['Data', 'Qtd_Apt', 'Total_h']
-            
-            # Classificar cada dia pelo TOTAL de horas do dia (não por apontamento)
-            analise_diaria_pessoa['Status_Dia'] = analise_diaria_pessoa['Total_h'].apply(
-                lambda x: classificar_por_faixa(x, faixa_referencia)
-            )
-            
-            # Calcular diferença vs meta
-            analise_diaria_pessoa['Diferença'] = analise_diaria_pessoa['Total_h'] - faixa_referencia
-            analise_diaria_pessoa['Diferença_fmt'] = analise_diaria_pessoa['Diferença'].apply(
-                lambda x: f"+{x:.1f}h" if x > 0 else f"{x:.1f}h"
-            )
-            
-            # Adicionar emoji de status
-            def get_status_emoji(status):
-                if status == 'Abaixo':
-                    return '🔴 Crítico'
-                elif status == 'Acima':
-                    return '🟡 Atenção'
-                else:
-                    return '🟢 OK'
-            
-            analise_diaria_pessoa['Status'] = analise_diaria_pessoa['Status_Dia'].apply(get_status_emoji)
-            
-            # Mostrar tabela
-            st.dataframe(
-                analise_diaria_pessoa[['Data', 'Qtd_Apt', 'Total_h', 'Diferença_fmt', 'Status']].sort_values('Data', ascending=False),
-                use_container_width=True,
-                height=400,
-                column_config={
-                    'Data': 'Data',
-                    'Qtd_Apt': 'Nº Apontamentos',
-                    'Total_h': st.column_config.NumberColumn('Total Dia', format="%.2f h"),
-                    'Diferença_fmt': f'vs Meta {int(faixa_referencia)}h',
-                    'Status': 'Status'
-                }
-            )
-            
-            st.markdown("---")
-            
-            # Gráfico de evolução da pessoa
-            st.subheader("📈 Evolução de Horas")
-            
-            fig = go.Figure()
-            
-            # Linha de horas trabalhadas
-            fig.add_trace(go.Scatter(
-                x=analise_diaria_pessoa['Data'],
-                y=analise_diaria_pessoa['Total_h'],
-                mode='lines+markers',
-                name='Horas Trabalhadas',
-                line=dict(color='#1f77b4', width=3),
-                marker=dict(size=8)
-            ))
-            
-            # Linha de referência
-            fig.add_trace(go.Scatter(
-                x=analise_diaria_pessoa['Data'],
-                y=[faixa_referencia] * len(analise_diaria_pessoa),
-                mode='lines',
-                name=f'Meta ({int(faixa_referencia)}h)',
-                line=dict(color='green', width=2, dash='dash')
-            ))
-            
-            fig.update_layout(
-                title=f"Evolução Diária - {funcionario_selecionado}",
-                xaxis_title="Data",
-                yaxis_title="Horas",
-                hovermode='x unified',
-                height=400
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Detalhes de cada apontamento
-            st.subheader("📋 Todos os Apontamentos Detalhados")
-            
-            # Adicionar coluna de status individual
-            pessoa_dados_display = pessoa_dados.copy()
-            pessoa_dados_display['Status'] = pessoa_dados_display['classificacao'].apply(get_status_emoji)
-            
-            st.dataframe(
-                pessoa_dados_display[[
-                    'data', 'd_dt_inicio_apontamento', 'd_dt_fim_apontamento',
-                    'duracao_horas', 'Status', 's_ds_operacao'
-                ]].sort_values('data', ascending=False),
-                use_container_width=True,
-                column_config={
-                    'data': 'Data',
-                    'd_dt_inicio_apontamento': 'Início',
-                    'd_dt_fim_apontamento': 'Fim',
-                    'duracao_horas': 'Duração (h)',
-                    'Status': 'Status',
-                    's_ds_operacao': 'Operação'
-                },
-                height=400
-            )
-        else:
-            st.info("👈 Selecione um funcionário na sidebar para ver análise detalhada")
+@fragmento('abas')
+def render_abas(abas_sob_demanda):
+    """Sob demanda: só a aba escolhida é calculada em cada rerun. Clássico: st.tabs
+    executa as seis abas a cada interação.
 
-    # ==================== TAB 4: GRÁFICOS ====================
-    with tab4:
-        st.header("📈 Visualizações")
-        
-        # Gráfico de pizza - Distribuição
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("Distribuição por Classificação")
-            distrib = df_filtrado['classificacao'].value_counts()
-            fig = px.pie(
-                values=distrib.values,
-                names=distrib.index,
-                title=f"Referência: {int(faixa_referencia)}h",
-                color=distrib.index,
-                color_discrete_map={
-                    'Abaixo': '#ffc107',
-                    'Normal': '#28a745',
-                    'Acima': '#dc3545'
-                }
-            )
-            st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
-            st.subheader("Total de Horas por Funcionário")
-            top_func = df_filtrado.groupby('s_nm_recurso')['duracao_horas'].sum().sort_values(ascending=False).head(10)
-            fig = px.bar(
-                x=top_func.values,
-                y=top_func.index,
-                orientation='h',
-                title="Top 10 Funcionários",
-                labels={'x': 'Horas', 'y': 'Funcionário'},
-                color=top_func.values,
-                color_continuous_scale='Blues'
-            )
-            st.plotly_chart(fig, use_container_width=True)
-        
-        # Gráfico temporal
-        st.subheader("📅 Evolução Temporal")
-        temp = df_filtrado.groupby([df_filtrado['data'].dt.date, 'classificacao']).size().reset_index(name='count')
-        fig = px.line(
-            temp,
-            x='data',
-            y='count',
-            color='classificacao',
-            title="Apontamentos por Dia e Classificação",
-            color_discrete_map={
-                'Abaixo': '#ffc107',
-                'Normal': '#28a745',
-                'Acima': '#dc3545'
-            }
+    Fragmento: trocar de aba reexecuta só esta área; resumo, filtros e chat ficam como estão.
+    """
+    if abas_sob_demanda:
+        aba_ativa = st.radio(
+            "Aba:",
+            list(ABAS),
+            horizontal=True,
+            label_visibility="collapsed",
+            key="aba_ativa"
         )
-        st.plotly_chart(fig, use_container_width=True)
-        
-        # Heatmap de horas por dia da semana
-        st.subheader("🗓️ Padrão Semanal")
-        df_filtrado['dia_semana'] = df_filtrado['data'].dt.day_name()
-        heatmap_data = df_filtrado.groupby(['dia_semana', 's_nm_recurso'])['duracao_horas'].mean().reset_index()
-        
-        # Top 10 funcionários para heatmap
-        top_10_func = df_filtrado.groupby('s_nm_recurso')['duracao_horas'].sum().nlargest(10).index
-        heatmap_data_filtered = heatmap_data[heatmap_data['s_nm_recurso'].isin(top_10_func)]
-        
-        if len(heatmap_data_filtered) > 0:
-            heatmap_pivot = heatmap_data_filtered.pivot(index='s_nm_recurso', columns='dia_semana', values='duracao_horas')
-            fig = px.imshow(
-                heatmap_pivot,
-                title="Média de Horas por Dia da Semana (Top 10)",
-                labels=dict(x="Dia da Semana", y="Funcionário", color="Horas"),
-                color_continuous_scale="RdYlGn"
-            )
-            st.plotly_chart(fig, use_container_width=True)
-
-    # ==================== TAB 5: HORAS EXTRAS ====================
-    with tab5:
-        st.header("🕒 Análise de Horas Extras")
-        
-        if 'horas_extras' not in df_filtrado.columns:
-            st.warning("⚠️ Dados de horas extras não disponíveis. Execute novamente o processamento para obter os cálculos atualizados.")
-        else:
-            # Estatísticas gerais de horas extras
-            total_funcionarios = df_filtrado['s_nm_recurso'].nunique()
-            funcionarios_com_extras = len(df_filtrado[df_filtrado['horas_extras'] > 0]['s_nm_recurso'].unique())
-            total_horas_extras = df_filtrado['horas_extras'].sum()
-            total_horas_pagas = df_filtrado['horas_pagas'].sum()
-            total_horas_normais = df_filtrado['duracao_horas'].sum()
-            
-            # Métricas principais
-            col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                st.metric(
-                    label="👥 Funcionários com Hora Extra",
-                    value=f"{funcionarios_com_extras}/{total_funcionarios}",
-                    delta=f"{funcionarios_com_extras/total_funcionarios*100:.1f}%" if total_funcionarios > 0 else "0%"
-                )
-            
-            with col2:
-                st.metric(
-                    label="⏱️ Total Horas Extras",
-                    value=f"{total_horas_extras:.1f}h",
-                    delta=f"{total_horas_extras/total_horas_normais*100:.1f}% do total" if total_horas_normais > 0 else "0%"
-                )
-            
-            with col3:
-                st.metric(
-                    label="💰 Total Horas Pagas",
-                    value=f"{total_horas_pagas:.1f}h",
-                    delta=f"+{total_horas_pagas-total_horas_normais:.1f}h extras"
-                )
-            
-            with col4:
-                custo_extra = (total_horas_pagas - total_horas_normais) * 0.5
-                st.metric(
-                    label="📈 Custo Adicional",
-                    value=f"+{custo_extra:.1f}h",
-                    delta="50% sobre extras"
-                )
-            
-            # Gráfico de distribuição de horas extras
-            st.subheader("📊 Distribuição de Horas Extras por Funcionário")
-            
-            funcionarios_extras = df_filtrado[df_filtrado['horas_extras'] > 0].groupby('s_nm_recurso').agg({
-                'horas_extras': 'sum',
-                'horas_pagas': 'sum',
-                'duracao_horas': 'sum'
-            }).sort_values('horas_extras', ascending=False)
-            
-            if len(funcionarios_extras) > 0:
-                fig_extras = px.bar(
-                    funcionarios_extras.reset_index(),
-                    x='s_nm_recurso',
-                    y='horas_extras',
-                    title="Horas Extras por Funcionário",
-                    labels={'s_nm_recurso': 'Funcionário', 'horas_extras': 'Horas Extras'},
-                    color='horas_extras',
-                    color_continuous_scale='Reds'
-                )
-                fig_extras.update_layout(xaxis_tickangle=-45)
-                st.plotly_chart(fig_extras, use_container_width=True)
-                
-                # Tabela detalhada
-                st.subheader("📋 Detalhamento por Funcionário")
-                funcionarios_extras_display = funcionarios_extras.copy()
-                funcionarios_extras_display['custo_adicional'] = (funcionarios_extras_display['horas_pagas'] - funcionarios_extras_display['duracao_horas']) * 0.5
-                funcionarios_extras_display = funcionarios_extras_display.round(2)
-                funcionarios_extras_display.columns = ['Horas Extras', 'Horas Pagas', 'Horas Trabalhadas', 'Custo Adicional (50%)']
-                st.dataframe(funcionarios_extras_display, use_container_width=True)
-            else:
-                st.info("✅ Nenhuma hora extra registrada no período selecionado!")
-            
-            # Análise temporal de horas extras
-            if len(df_filtrado[df_filtrado['horas_extras'] > 0]) > 0:
-                st.subheader("📅 Evolução das Horas Extras")
-                
-                horas_extras_tempo = df_filtrado[df_filtrado['horas_extras'] > 0].groupby('data').agg({
-                    'horas_extras': 'sum',
-                    's_nm_recurso': 'nunique'
-                }).reset_index()
-                
-                fig_tempo = px.line(
-                    horas_extras_tempo,
-                    x='data',
-                    y='horas_extras',
-                    title="Evolução das Horas Extras por Data",
-                    labels={'data': 'Data', 'horas_extras': 'Total de Horas Extras'}
-                )
-                st.plotly_chart(fig_tempo, use_container_width=True)
+        with instrumentacao.trecho(f'aba {aba_ativa}'):
+            ABAS[aba_ativa]()
+    else:
+        for aba, (nome_aba, render) in zip(st.tabs(list(ABAS)), ABAS.items()):
+            with aba, instrumentacao.trecho(f'aba {nome_aba}'):
+                render()
 
-    # ==================== TAB 6: DADOS BRUTOS ====================
-    with tab6:
-        st.header("📋 Dados Filtrados")
-        
-        # Opções de visualização
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            mostrar_classificacao = st.multiselect(
-                "Filtrar por classificação:",
-                ['Abaixo', 'Normal', 'Acima'],
-                default=['Abaixo', 'Acima']
-            )
-        
-        # Filtrar
-        if mostrar_classificacao:
-            df_exibir = df_filtrado[df_filtrado['classificacao'].isin(mostrar_classificacao)]
-        else:
-            df_exibir = df_filtrado
-        
-        # Selecionar colunas para exibir
-        colunas_exibir = [
-            'data', 's_nm_recurso', 's_nm_usuario_valida',
-            'duracao_horas', 'classificacao', 's_ds_operacao'
-        ]
-        
-        st.dataframe(
-            df_exibir[colunas_exibir].sort_values('data', ascending=False),
-            use_container_width=True,
-            height=400
-        )
-        
-        # Botão de export
-        csv = df_exibir.to_csv(index=False, encoding='utf-8-sig')
-        st.download_button(
-            label="📥 Baixar CSV",
-            data=csv,
-            file_name=f"apontamentos_{data_inicio}_{data_fim}.csv",
-            mime="text/csv"
-        )
+with col_main:
+    # ==================== ABAS ====================
+    render_abas(abas_sob_demanda)
 
 # Footer
 st.markdown("---")
-st.caption(f"📊 Dashboard V2 | Período: {data_inicio} a {data_fim} | Registros: {len(df_filtrado):,} | Validador: {validador_selecionado}")
+st.caption(f"📊 Dashboard V2 | Período: {data_inicio} a {data_fim} | Registros: {resumo['total_registros']:,} | Validador: {validador_selecionado}")
+
+# ==================== DIAGNÓSTICO DO RERUN ====================
+# Memos do cubo acertados/recalculados neste rerun, depois fecha a medição
+instrumentacao.contar_memos(memos_inicio, instrumentacao.estatisticas_memos(cubo, conjunto))
+registro_rerun = instrumentacao.finalizar(
+    sessao=id_sessao_chat(),
+    motor=conjunto.motor,
+    periodo=[str(data_inicio), str(data_fim)],
+    validador=validador_selecionado,
+    funcionario=funcionario_selecionado,
+    faixa=faixa_referencia,
+    aba=st.session_state.get("aba_ativa") if abas_sob_demanda else 'todas',
+    registros=resumo['total_registros']
+)
+instrumentacao.gravar_log(registro_rerun)
+
+historico_reruns = st.session_state.setdefault("diagnostico_historico", [])
+historico_reruns.append(registro_rerun['total_ms'])
+del historico_reruns[:-instrumentacao.HISTORICO_RERUNS]
+
+if diagnostico:
+    with painel_diagnostico.container():
+        render_diagnostico(registro_rerun, historico_reruns)
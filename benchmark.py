@@ -0,0 +1,290 @@
+"""
+⏱️ BENCHMARK - Tempos dos caminhos quentes do dashboard em dados sintéticos
+Para cada tamanho, gera um snapshot com dados_sinteticos.py numa pasta de
+trabalho temporária e mede: carregamento (CSV e cache Parquet), montagem do
+conjunto, recorte de período, classificar_por_faixa, as agregações de cada aba,
+a montagem das figuras (Plotly + JSON enviado ao navegador) e a montagem do
+contexto do chat. As agregações são medidas a frio (memos do cubo limpos antes
+de cada repetição), que é o custo de uma interação nova.
+
+Os resultados vão para resultados/benchmarks/benchmark_<carimbo>.json; com
+--comparar, cada etapa é comparada com uma execução anterior e o comando
+termina com código 1 se alguma ficar mais lenta que o limiar.
+
+Uso:
+    python benchmark.py                                   # 10 mil, 1 milhão e 10 milhões de linhas
+    python benchmark.py --tamanhos 10000 100000 --repeticoes 3
+    python benchmark.py --motores pandas duckdb --comparar resultados/benchmarks/benchmark_20251101_120000.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import carregamento
+import chat_ia
+import consultas
+import dados_sinteticos
+import graficos
+import motor_duckdb
+import regras_jornada
+from cubos import TODOS
+
+PASTA_BENCHMARKS = os.path.abspath(os.path.join(carregamento.PASTA_RESULTADOS, "benchmarks"))
+TAMANHOS_PADRAO = [10_000, 1_000_000, 10_000_000]
+REPETICOES = 5
+DIAS_RECORTE = 30          # Recorte medido: últimos 30 dias, como o padrão do dashboard
+LIMIAR_REGRESSAO = 1.2     # Mais de 20% mais lento que a referência = regressão
+MINIMO_COMPARAVEL = 0.001  # Etapas abaixo de 1 ms são ruído de medição, não entram na comparação
+
+# Agregações de cada aba: (aba, método do cubo, usa faixa/tolerância)
+AGREGACOES = [
+    ('Cabeçalho', 'resumo', True),
+    ('Análise Detalhada', 'por_funcionario', True),
+    ('Análise Detalhada', 'por_dia', True),
+    ('Gráficos', 'distribuicao', True),
+    ('Gráficos', 'top_funcionarios', False),
+    ('Gráficos', 'por_dia_classificacao', True),
+    ('Gráficos', 'media_dia_semana', False),
+    ('Horas Extras', 'extras_por_funcionario', False),
+    ('Horas Extras', 'extras_por_data', False),
+    ('Chat', 'jornadas', True),
+]
+
+
+def _limpar_memos(cubo):
+    """Esvazia os recortes memorizados (lru_cache) para medir o custo a frio"""
+    for valor in vars(cubo).values():
+        if hasattr(valor, 'cache_clear'):
+            valor.cache_clear()
+
+
+def medir(funcao, repeticoes=REPETICOES, preparar=None):
+    """Tempos (s) de cada repetição; `preparar` roda antes de cada uma, fora da medição"""
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def _medicao(linhas, motor, etapa, tempos, aba=None):
+    return {
+        'linhas': linhas, 'motor': motor, 'aba': aba, 'etapa': etapa,
+        'mediana_s': statistics.median(tempos), 'minimo_s': min(tempos), 'repeticoes': len(tempos),
+    }
+
+
+def _ambiente():
+    ambiente = {
+        'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+        'duckdb': motor_duckdb.duckdb.__version__ if motor_duckdb.DUCKDB_DISPONIVEL else None,
+        'plataforma': platform.platform(), 'processadores': os.cpu_count(),
+    }
+    try:
+        ambiente['commit'] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                            check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        ambiente['commit'] = None
+    return ambiente
+
+
+def medir_motor(conjunto, linhas, motor, regras, repeticoes, registrar):
+    """Recorte, agregações das abas e contexto do chat sobre um conjunto (pandas ou DuckDB)"""
+    cubo = conjunto.cubo
+    faixa, tolerancia = regras['limite_diario'], regras['tolerancia_faixa']
+    data_fim = conjunto.data_max
+    data_inicio = max(conjunto.data_min, data_fim - datetime.timedelta(days=DIAS_RECORTE - 1))
+    chave = (data_inicio, data_fim, TODOS, TODOS)
+    chave_pessoa = (data_inicio, data_fim, TODOS, conjunto.funcionarios[0])
+
+    def limpar():
+        _limpar_memos(cubo)
+        _limpar_memos(conjunto)  # Recortes memorizados do motor DuckDB
+
+    if motor == 'pandas':
+        registrar(_medicao(linhas, motor, 'posicoes', medir(lambda: cubo.posicoes(chave), repeticoes, limpar)))
+    registrar(_medicao(linhas, motor, 'recorte', medir(
+        lambda: conjunto.recorte(chave, faixa, tolerancia), repeticoes, limpar), aba='Alertas / Dados Brutos'))
+
+    for aba, metodo, usa_faixa in AGREGACOES:
+        argumentos = (chave, faixa, tolerancia) if usa_faixa else (chave,)
+        registrar(_medicao(linhas, motor, metodo, medir(
+            lambda: getattr(cubo, metodo)(*argumentos), repeticoes, limpar), aba=aba))
+    registrar(_medicao(linhas, motor, 'por_dia (funcionário)', medir(
+        lambda: cubo.por_dia(chave_pessoa, faixa, tolerancia), repeticoes, limpar), aba='Por Pessoa'))
+
+    def _contexto():
+        resumo = cubo.resumo(chave, faixa, tolerancia)
+        stats = chat_ia.calcular_estatisticas(resumo, data_inicio, data_fim, TODOS, faixa,
+                                              cubo.top_funcionarios(chave, 3))
+        return chat_ia.montar_contexto(stats, regras, ferramentas=True)
+
+    registrar(_medicao(linhas, motor, 'contexto_chat', medir(_contexto, repeticoes, limpar), aba='Chat'))
+
+    # Figuras sobre agregações já memorizadas: só o custo do Plotly e da serialização (cache de figuras frio)
+    figuras = [
+        ('Gráficos', 'distribuicao', lambda: graficos.distribuicao(cubo.distribuicao(chave, faixa, tolerancia), faixa)),
+        ('Gráficos', 'top_funcionarios', lambda: graficos.top_funcionarios(cubo.top_funcionarios(chave, 10))),
+        ('Gráficos', 'evolucao_temporal', lambda: graficos.evolucao_temporal(
+            cubo.por_dia_classificacao(chave, faixa, tolerancia))),
+        ('Horas Extras', 'horas_extras', lambda: graficos.extras_por_funcionario(cubo.extras_por_funcionario(chave))),
+        ('Horas Extras', 'evolucao_extras', lambda: graficos.evolucao_extras(cubo.extras_por_data(chave))),
+    ]
+    for aba, nome, construir in figuras:
+        construir()  # Aquece os memos das agregações
+        registrar(_medicao(linhas, motor, f'figura {nome}', medir(
+            lambda: _serializar(construir()), repeticoes), aba=aba))
+
+
+def _serializar(figura):
+    return None if figura is None else figura.to_json()
+
+
+def executar(tamanhos=None, motores=('pandas',), repeticoes=REPETICOES, dias=90, semente=42, ao_medir=None):
+    """Roda o benchmark em uma pasta temporária e devolve o relatório (dict serializável)"""
+    tamanhos = tamanhos or TAMANHOS_PADRAO
+    regras = regras_jornada.carregar_regras()
+    medicoes = []
+
+    def _registrar(medicao):
+        medicoes.append(medicao)
+        if ao_medir:
+            ao_medir(medicao)
+
+    diretorio_original = os.getcwd()
+    trabalho = tempfile.mkdtemp(prefix='benchmark_dashboard_')
+    try:
+        # Caminhos do carregador são relativos (resultados/, resultados/.cache/): tudo fica na pasta temporária
+        os.chdir(trabalho)
+        pasta = carregamento.PASTA_RESULTADOS
+        for linhas in tamanhos:
+            shutil.rmtree(pasta, ignore_errors=True)
+            inicio = time.perf_counter()
+            df_bruto = dados_sinteticos.gerar_apontamentos(linhas, dias=dias, semente=semente)
+            dados_sinteticos.gravar_snapshot(df_bruto, pasta)
+            del df_bruto
+            _registrar(_medicao(linhas, 'pandas', 'gerar_snapshot', [time.perf_counter() - inicio]))
+
+            # Carga: processamento do CSV (uma vez), gravação do cache e leituras do cache Parquet
+            _registrar(_medicao(linhas, 'pandas', 'carregar_dados (CSV)', medir(
+                lambda: carregamento.carregar_dados(pasta, usar_cache=False, incremental=False), 1)))
+            _registrar(_medicao(linhas, 'pandas', 'carregar_dados (gera cache)', medir(
+                lambda: carregamento.carregar_dados(pasta, incremental=False), 1)))
+            df = carregamento.carregar_dados(pasta, incremental=False)
+            _registrar(_medicao(linhas, 'pandas', 'carregar_dados (cache)', medir(
+                lambda: carregamento.carregar_dados(pasta, incremental=False), repeticoes)))
+            _registrar(_medicao(linhas, 'pandas', 'classificar_por_faixa', medir(
+                lambda horas=df['duracao_horas']: regras_jornada.classificar_por_faixa(
+                    horas, regras['limite_diario'], regras['tolerancia_faixa']), repeticoes)))
+
+            for motor in motores:
+                if motor == 'duckdb':
+                    if not motor_duckdb.DUCKDB_DISPONIVEL:
+                        continue
+                    inicio = time.perf_counter()
+                    conjunto = motor_duckdb.abrir_conjunto(pasta, incremental=False, regras=regras)
+                    _registrar(_medicao(linhas, motor, 'abrir_conjunto', [time.perf_counter() - inicio]))
+                else:
+                    inicio = time.perf_counter()
+                    conjunto = consultas.ConjuntoApontamentos(df, regras=regras)
+                    _registrar(_medicao(linhas, motor, 'ConjuntoApontamentos', [time.perf_counter() - inicio]))
+                medir_motor(conjunto, linhas, motor, regras, repeticoes, _registrar)
+                del conjunto
+            del df
+    finally:
+        os.chdir(diretorio_original)
+        shutil.rmtree(trabalho, ignore_errors=True)
+
+    return {
+        'carimbo': datetime.datetime.now().strftime('%Y%m%d_%H%M%S'),
+        'ambiente': _ambiente(),
+        'parametros': {'tamanhos': list(tamanhos), 'motores': list(motores), 'repeticoes': repeticoes,
+                       'dias': dias, 'semente': semente, 'dias_recorte': DIAS_RECORTE},
+        'medicoes': medicoes,
+    }
+
+
+def salvar(relatorio, pasta=PASTA_BENCHMARKS):
+    os.makedirs(pasta, exist_ok=True)
+    destino = os.path.join(pasta, f"benchmark_{relatorio['carimbo']}.json")
+    with open(destino, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    return destino
+
+
+def comparar(atual, referencia, limiar=LIMIAR_REGRESSAO):
+    """Razão atual/referência por (linhas, motor, etapa); só etapas presentes nas duas execuções"""
+    chave = lambda medicao: (medicao['linhas'], medicao['motor'], medicao['etapa'])  # noqa: E731
+    anteriores = {chave(medicao): medicao for medicao in referencia['medicoes']}
+    comparacao = []
+    for medicao in atual['medicoes']:
+        anterior = anteriores.get(chave(medicao))
+        if anterior is None or medicao['etapa'] == 'gerar_snapshot':
+            continue
+        razao = medicao['mediana_s'] / anterior['mediana_s'] if anterior['mediana_s'] > 0 else float('inf')
+        comparavel = max(medicao['mediana_s'], anterior['mediana_s']) >= MINIMO_COMPARAVEL
+        comparacao.append({**medicao, 'referencia_s': anterior['mediana_s'], 'razao': razao,
+                           'regressao': comparavel and razao > limiar})
+    return comparacao
+
+
+def _formatar_tempo(segundos):
+    return f"{segundos * 1000:9.2f} ms" if segundos < 1 else f"{segundos:9.2f} s "
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos caminhos quentes do dashboard em dados sintéticos")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO, help="Linhas por execução")
+    parser.add_argument('--motores', nargs='+', default=['pandas'], choices=['pandas', 'duckdb'])
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES, help="Repetições por etapa (mediana)")
+    parser.add_argument('--dias', type=int, default=90, help="Dias de histórico dos dados sintéticos")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', default=PASTA_BENCHMARKS, help="Pasta dos resultados JSON")
+    parser.add_argument('--comparar', metavar='JSON', help="Resultado anterior para detectar regressões")
+    parser.add_argument('--limiar', type=float, default=LIMIAR_REGRESSAO,
+                        help="Razão atual/anterior a partir da qual a etapa é regressão")
+    args = parser.parse_args(argv)
+
+    if 'duckdb' in args.motores and not motor_duckdb.DUCKDB_DISPONIVEL:
+        print("⚠️ duckdb não instalado: medindo só o motor pandas")
+
+    def _progresso(medicao):
+        print(f"{medicao['linhas']:>12,} | {medicao['motor']:<6} | {medicao['etapa']:<28} | "
+              f"{_formatar_tempo(medicao['mediana_s'])}")
+
+    relatorio = executar(args.tamanhos, args.motores, args.repeticoes, args.dias, args.semente, _progresso)
+    print(f"📄 {salvar(relatorio, args.saida)}")
+
+    if not args.comparar:
+        return 0
+    with open(args.comparar, encoding='utf-8') as arquivo:
+        referencia = json.load(arquivo)
+    comparacao = comparar(relatorio, referencia, args.limiar)
+    regressoes = [linha for linha in comparacao if linha['regressao']]
+    print(f"\n📊 Comparação com {os.path.basename(args.comparar)} (limiar {args.limiar:.2f}x)")
+    for linha in comparacao:
+        marca = '🔴' if linha['regressao'] else ('🟢' if linha['razao'] < 1 / args.limiar else '  ')
+        print(f"{marca} {linha['linhas']:>12,} | {linha['motor']:<6} | {linha['etapa']:<28} | "
+              f"{_formatar_tempo(linha['referencia_s'])} -> {_formatar_tempo(linha['mediana_s'])} "
+              f"({linha['razao']:.2f}x)")
+    print(f"{'❌' if regressoes else '✅'} {len(regressoes)} regressão(ões)")
+    return 1 if regressoes else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
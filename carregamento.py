@@ -0,0 +1,611 @@
+"""
+📦 CARREGAMENTO - Leitura dos snapshots de apontamentos
+Processa a carga mais recente de resultados/ (um CSV ou as partições mensais
+_pAAAA-MM de um mesmo carimbo) e mantém um cache colunar (Parquet) por arquivo,
+reaproveitado enquanto o arquivo de origem não mudar.
+"""
+
+import codecs
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+import regras_jornada
+
+PASTA_RESULTADOS = "resultados"
+PADRAO_SNAPSHOT = "dados_com_duracao_*.csv"
+# Carimbo da carga no nome do snapshot (as partições mensais de uma carga compartilham o carimbo)
+PADRAO_CARIMBO = re.compile(r'dados_com_duracao_(\d{8}_\d{6})')
+# Partição mensal (ingestao_sql particionada): cobre o mês inteiro, mesmo sem linhas
+PADRAO_PARTICAO = re.compile(r'dados_com_duracao_\d{8}_\d{6}_p(\d{4}-\d{2})\.csv$')
+PASTA_CACHE = os.path.join(PASTA_RESULTADOS, ".cache")
+PASTA_BASE_INCREMENTAL = os.path.join(PASTA_CACHE, "base_incremental")
+
+# Ingestão incremental (DASHBOARD_INGESTAO_INCREMENTAL=1): acumula os snapshots
+# numa base local em vez de reprocessar apenas o arquivo mais recente
+MODO_INCREMENTAL = os.getenv("DASHBOARD_INGESTAO_INCREMENTAL", "0") == "1"
+
+# Incrementar sempre que o processamento mudar, para invalidar caches antigos
+VERSAO_CACHE = 7
+
+# Bytes lidos do início do arquivo para identificar o encoding
+TAMANHO_AMOSTRA_ENCODING = 64 * 1024
+
+# Sequências típicas de UTF-8 lido como latin-1/cp1252 (ex: "TÃ©cnico", "PadrÃ£o")
+PADRAO_MOJIBAKE = r'[ÃÂ]'
+
+# Colunas exigidas do snapshot e colunas de texto que seguem para a agregação
+COLUNAS_OBRIGATORIAS = ['s_nm_recurso', 's_nm_usuario_valida', 's_ds_operacao', 'd_dt_data',
+                        'd_dt_inicio_apontamento', 'd_dt_fim_apontamento', 'duracao_horas']
+COLUNAS_TEXTO = ['s_nm_recurso', 's_nm_usuario_valida', 's_ds_operacao']
+
+# Chaves da jornada diária e colunas produzidas pela agregação
+CHAVES_JORNADA = ['s_nm_recurso', 'data', 's_nm_usuario_valida']
+COLUNAS_AGRUPADAS = CHAVES_JORNADA + ['duracao_horas', 'd_dt_inicio_apontamento', 'd_dt_fim_apontamento',
+                                     's_ds_operacao', 'd_dt_data', 'total_apontamentos_dia', 'tipo_analise']
+OPERACOES_RESUMO = 3  # Operações listadas no resumo de cada jornada
+
+# Chave de reagregação e colunas mantidas na base incremental
+CHAVES_DIA = ['s_nm_recurso', 'data']
+COLUNAS_BASE = ['s_id_apontamento', 's_nm_recurso', 'data', 's_nm_usuario_valida', 'duracao_horas',
+                'dt_inicio', 'dt_fim', 's_ds_operacao', 'd_dt_data', 'hash_linha']
+
+_TRAVA_INGESTAO = threading.Lock()
+
+# Colunas de texto com poucos valores distintos (armazenadas como categoria)
+COLUNAS_CATEGORICAS = ['s_nm_recurso', 's_nm_usuario_valida', 'd_dt_data', 'tipo_analise',
+                       'tipo_dia', 'nome_dia', 'classificacao_jornada']
+COLUNAS_HORAS = ['duracao_horas', 'duracao_bruta', 'horas_almoco', 'duracao_liquida',
+                 'horas_extras', 'horas_normais', 'horas_pagas']
+
+
+def localizar_snapshot_mais_recente(pasta=PASTA_RESULTADOS):
+    """Retorna o caminho do snapshot mais recente ou None"""
+    arquivos = glob.glob(os.path.join(pasta, PADRAO_SNAPSHOT))
+    return max(arquivos) if arquivos else None
+
+
+def localizar_carga_mais_recente(pasta=PASTA_RESULTADOS):
+    """Snapshots da carga mais recente: o arquivo único ou todas as partições _pAAAA-MM do carimbo"""
+    ultimo = localizar_snapshot_mais_recente(pasta)
+    if ultimo is None:
+        return []
+    carimbo = carimbo_snapshot(ultimo)
+    return sorted(arquivo for arquivo in glob.glob(os.path.join(pasta, PADRAO_SNAPSHOT))
+                  if carimbo_snapshot(arquivo) == carimbo)
+
+
+def carimbo_snapshot(caminho):
+    """Carimbo AAAAMMDD_HHMMSS da carga que gerou o snapshot (ou o próprio nome)"""
+    nome = os.path.basename(caminho)
+    encontrado = PADRAO_CARIMBO.match(nome)
+    return encontrado.group(1) if encontrado else nome
+
+
+def mes_particao_snapshot(caminho):
+    """Mês AAAA-MM da partição mensal do snapshot (None se o arquivo não for particionado)"""
+    encontrado = PADRAO_PARTICAO.match(os.path.basename(caminho))
+    return encontrado.group(1) if encontrado else None
+
+
+def assinatura_snapshot(caminho):
+    """Identifica a versão do arquivo pelo nome, tamanho, mtime e regras de jornada"""
+    info = os.stat(caminho)
+    chave = (f"{os.path.basename(caminho)}|{info.st_size}|{info.st_mtime_ns}|v{VERSAO_CACHE}"
+             f"|{regras_jornada.assinatura_regras()}")
+    return hashlib.sha1(chave.encode('utf-8')).hexdigest()[:16]
+
+
+def assinatura_carga(caminhos):
+    """Assinatura do conjunto de snapshots de uma carga (a do próprio arquivo se for um só)"""
+    if len(caminhos) == 1:
+        return assinatura_snapshot(caminhos[0])
+    chave = '|'.join(assinatura_snapshot(caminho) for caminho in caminhos)
+    return hashlib.sha1(chave.encode('utf-8')).hexdigest()[:16]
+
+
+def caminho_cache(caminho, pasta_cache=PASTA_CACHE):
+    """Caminho do Parquet correspondente à versão atual do snapshot"""
+    nome = os.path.splitext(os.path.basename(caminho))[0]
+    return os.path.join(pasta_cache, f"{nome}_{assinatura_snapshot(caminho)}.parquet")
+
+
+def detectar_encoding(caminho, tamanho_amostra=TAMANHO_AMOSTRA_ENCODING):
+    """Identifica o encoding do arquivo a partir de uma amostra dos primeiros bytes"""
+    with open(caminho, 'rb') as arquivo:
+        amostra = arquivo.read(tamanho_amostra)
+
+    if amostra.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        # final=False tolera um caractere multibyte cortado no fim da amostra
+        codecs.getincrementaldecoder('utf-8')().decode(amostra, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    try:
+        amostra.decode('cp1252')
+        return 'cp1252'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+
+def ler_csv(caminho):
+    """Lê o CSV bruto com o encoding detectado (uma única leitura no caso comum)"""
+    encoding = detectar_encoding(caminho)
+    try:
+        return pd.read_csv(caminho, encoding=encoding)
+    except UnicodeDecodeError:
+        # A amostra não representava o arquivo todo: latin-1 aceita qualquer byte
+        return pd.read_csv(caminho, encoding='latin-1')
+
+
+def corrigir_texto(valor):
+    """Desfaz a dupla codificação (UTF-8 lido como latin-1/cp1252) de um valor"""
+    for encoding in ('latin-1', 'cp1252'):
+        try:
+            return valor.encode(encoding).decode('utf-8')
+        except UnicodeError:
+            continue
+    return valor
+
+
+def reparar_mojibake(serie):
+    """Corrige texto duplamente codificado trabalhando sobre os valores únicos"""
+    codigos, unicos = pd.factorize(serie)
+    if len(unicos) == 0:
+        return serie
+
+    tabela = np.asarray(unicos, dtype=object)
+    suspeitos = pd.Series(tabela).astype(str).str.contains(PADRAO_MOJIBAKE, regex=True).to_numpy()
+
+    corrigidos = []
+    for posicao in np.flatnonzero(suspeitos):
+        original = tabela[posicao]
+        if isinstance(original, str):
+            corrigido = corrigir_texto(original)
+            if corrigido != original:
+                tabela[posicao] = corrigido
+                corrigidos.append(posicao)
+
+    if not corrigidos:
+        return serie
+
+    # Substituir apenas as linhas cujos valores foram corrigidos
+    linhas = np.flatnonzero(np.isin(codigos, corrigidos))
+    serie = serie.copy()
+    serie.iloc[linhas] = tabela[codigos[linhas]]
+    return serie
+
+
+def preparar_apontamentos(df):
+    """Valida colunas, corrige textos e converte tipos dos apontamentos brutos"""
+    faltantes = [col for col in COLUNAS_OBRIGATORIAS if col not in df.columns]
+    if faltantes:
+        raise ValueError(f"Colunas ausentes no snapshot: {', '.join(faltantes)}")
+
+    # Corrigir strings com encoding
+    for col in COLUNAS_TEXTO:
+        df[col] = reparar_mojibake(df[col])
+
+    # Converter colunas de data
+    df['data'] = pd.to_datetime(df['d_dt_data'], errors='coerce')
+    df['dt_inicio'] = pd.to_datetime(df['d_dt_inicio_apontamento'], errors='coerce')
+    df['dt_fim'] = pd.to_datetime(df['d_dt_fim_apontamento'], errors='coerce')
+
+    # IMPORTANTE: Garantir que duracao_horas seja numérica
+    df['duracao_horas'] = pd.to_numeric(df['duracao_horas'], errors='coerce')
+
+    # Remover registros sem duração válida
+    return df.dropna(subset=['duracao_horas'])
+
+
+def resumir_operacoes(grupo, ordem, total, operacoes, n_operacoes=OPERACOES_RESUMO):
+    """Monta "N apontamentos: op1; op2; op3..." para cada grupo sem iterar grupos"""
+    resumo = total.astype(str).astype(object) + ' apontamentos: '
+    for posicao in range(n_operacoes):
+        selecao = ordem == posicao
+        textos = np.full(len(total), '', dtype=object)
+        textos[grupo[selecao]] = ('; ' if posicao else '') + operacoes[selecao]
+        resumo = resumo + textos
+    return resumo + np.where(total > n_operacoes, '...', '')
+
+
+def agregar_por_dia(df):
+    """Agrupa os apontamentos por funcionário + dia com redutores nativos"""
+    agrupado = df.groupby(CHAVES_JORNADA, sort=True, observed=True)
+    df_agrupado = agrupado.agg(
+        duracao_horas=('duracao_horas', 'sum'),  # SOMAR as horas do dia
+        d_dt_inicio_apontamento=('dt_inicio', 'min'),  # Primeiro apontamento do dia (datetime)
+        d_dt_fim_apontamento=('dt_fim', 'max'),        # Último apontamento do dia (datetime)
+        d_dt_data=('d_dt_data', 'first'),  # Manter a data
+        total_apontamentos_dia=('duracao_horas', 'size')  # Contagem com as mesmas chaves do grupo
+    ).reset_index()
+
+    # Primeiras operações de cada grupo, na ordem do arquivo (ngroup segue a ordem do agg)
+    grupo = agrupado.ngroup().to_numpy(dtype='float64')
+    ordem = agrupado.cumcount().to_numpy(dtype='float64')
+    linhas = np.flatnonzero(~np.isnan(grupo) & (ordem < OPERACOES_RESUMO))  # Chaves nulas ficam fora
+    operacoes = df['s_ds_operacao'].iloc[linhas].to_numpy(dtype=object).astype(str).astype(object)
+    df_agrupado['s_ds_operacao'] = resumir_operacoes(
+        grupo[linhas].astype('int64'),
+        ordem[linhas].astype('int64'),
+        df_agrupado['total_apontamentos_dia'].to_numpy(),
+        operacoes
+    )
+
+    # Adicionar metadados sobre a agregação
+    df_agrupado['tipo_analise'] = 'AGRUPADO_POR_DIA'
+    return df_agrupado[COLUNAS_AGRUPADAS]
+
+
+def derivar_colunas(df_agrupado, regras=None):
+    """Aplica as regras de jornada, pré-classifica por faixa e ordena por data"""
+    regras = regras if regras is not None else regras_jornada.carregar_regras()
+    df_agrupado = regras_jornada.aplicar_regras(df_agrupado, regras)
+
+    # Classificação por faixa de referência calculada uma vez por carga
+    df_agrupado = regras_jornada.precalcular_faixas(df_agrupado, regras)
+
+    df_agrupado = compactar_tipos(df_agrupado)
+
+    # Ordenado por data: recortes de período por busca binária (consultas.py)
+    return df_agrupado.sort_values('data', kind='stable', ignore_index=True)
+
+
+def compactar_tipos(df):
+    """Reduz a memória por jornada: categorias para textos, float32/int8 para números"""
+    # Nomes, validadores e rótulos repetidos viram categoria (preservada no Parquet)
+    for col in COLUNAS_CATEGORICAS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+
+    # Resumo de operações: categoria apenas quando os textos se repetem
+    if 's_ds_operacao' in df.columns and df['s_ds_operacao'].nunique() < len(df) * 0.5:
+        df['s_ds_operacao'] = df['s_ds_operacao'].astype('category')
+
+    # Início/fim como datetime (8 bytes) em vez de texto
+    for col in ['d_dt_inicio_apontamento', 'd_dt_fim_apontamento']:
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+
+    # Horas com precisão de float32 (~7 dígitos), suficiente para exibição
+    for col in COLUNAS_HORAS:
+        if col in df.columns:
+            df[col] = df[col].astype('float32')
+
+    df['dia_semana_num'] = df['dia_semana_num'].astype('int8')
+    df['total_apontamentos_dia'] = pd.to_numeric(df['total_apontamentos_dia'], downcast='integer')
+    return df
+
+
+def bytes_por_linha(df):
+    """Memória ocupada por jornada (inclui o conteúdo dos textos)"""
+    if len(df) == 0:
+        return 0.0
+    return df.memory_usage(deep=True, index=False).sum() / len(df)
+
+
+def processar_snapshot(caminho):
+    """Lê o CSV bruto e agrega os apontamentos por funcionário + dia"""
+    df = preparar_apontamentos(ler_csv(caminho))
+    return derivar_colunas(agregar_por_dia(df))
+
+
+def gravar_parquet(df, destino):
+    """Grava o Parquet de forma atômica (arquivo temporário + rename)"""
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    temporario = destino + ".tmp"
+    df.to_parquet(temporario, index=False)
+    os.replace(temporario, destino)
+
+
+def salvar_cache(df, destino):
+    """Grava o cache do snapshot e remove versões antigas do mesmo arquivo"""
+    try:
+        gravar_parquet(df, destino)
+    except (OSError, ImportError, ValueError):
+        # Sem permissão de escrita ou sem pyarrow: seguir sem cache
+        return False
+
+    prefixo = os.path.basename(destino).rsplit('_', 1)[0] + '_'
+    padrao = prefixo + '[0-9a-f]' * 16 + '.parquet'
+    for antigo in glob.glob(os.path.join(os.path.dirname(destino), padrao)):
+        if antigo != destino:
+            try:
+                os.remove(antigo)
+            except OSError:
+                pass
+    return True
+
+
+def carregar_snapshot(caminho, usar_cache=True):
+    """Carrega o snapshot do cache Parquet ou processa o CSV e grava o cache"""
+    if not usar_cache:
+        return processar_snapshot(caminho)
+
+    destino = caminho_cache(caminho)
+    if os.path.exists(destino):
+        try:
+            return pd.read_parquet(destino)
+        except Exception:
+            pass  # Cache corrompido ou ilegível: reprocessar o CSV
+
+    df = processar_snapshot(caminho)
+    salvar_cache(df, destino)
+    return df
+
+
+def carregar_carga(caminhos, usar_cache=True):
+    """Carrega os snapshots de uma carga (cada partição com seu cache) como um único conjunto"""
+    partes = [carregar_snapshot(caminho, usar_cache=usar_cache) for caminho in caminhos]
+    if len(partes) == 1:
+        return partes[0]
+    # Categorias diferentes entre partições viram object no concat: compactar de novo
+    df = compactar_tipos(pd.concat(partes, ignore_index=True))
+    return df.sort_values('data', kind='stable', ignore_index=True)
+
+
+# ==================== INGESTÃO INCREMENTAL ====================
+# Base local deduplicada por s_id_apontamento, particionada por mês:
+#   base_incremental/apontamentos/AAAA-MM.parquet  -> linhas brutas preparadas + hash
+#   base_incremental/agrupado/AAAA-MM.parquet      -> jornadas agregadas por dia
+#   base_incremental/ids.parquet                   -> mês de cada s_id_apontamento da base
+# Cada snapshot novo só prepara as linhas novas/alteradas e só reagrega os
+# grupos (s_nm_recurso, data) afetados, reescrevendo apenas os meses tocados.
+
+def _caminho_particao(pasta_base, tipo, mes):
+    return os.path.join(pasta_base, tipo, f"{mes}.parquet")
+
+
+def _meses_particionados(pasta_base, tipo):
+    arquivos = glob.glob(os.path.join(pasta_base, tipo, '*.parquet'))
+    return sorted(os.path.splitext(os.path.basename(arquivo))[0] for arquivo in arquivos)
+
+
+def _ler_particao(pasta_base, tipo, mes, colunas=None):
+    caminho = _caminho_particao(pasta_base, tipo, mes)
+    if not os.path.exists(caminho):
+        return None
+    return pd.read_parquet(caminho, columns=colunas)
+
+
+def _chaves_dia(df):
+    return pd.MultiIndex.from_frame(df[CHAVES_DIA])
+
+
+def ler_manifesto(pasta_base=PASTA_BASE_INCREMENTAL):
+    """Lê o manifesto da base incremental (vazio se ausente ou de outra versão)"""
+    caminho = os.path.join(pasta_base, 'manifesto.json')
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            manifesto = json.load(arquivo)
+    except (OSError, ValueError):
+        return {}
+    return manifesto if manifesto.get('versao') == VERSAO_CACHE else {}
+
+
+def _salvar_manifesto(manifesto, pasta_base):
+    os.makedirs(pasta_base, exist_ok=True)
+    caminho = os.path.join(pasta_base, 'manifesto.json')
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as arquivo:
+        json.dump(manifesto, arquivo, ensure_ascii=False, indent=2)
+    os.replace(caminho + '.tmp', caminho)
+
+
+def _meses_periodo(inicio, fim):
+    return pd.period_range(inicio, fim, freq='M').strftime('%Y-%m').tolist()
+
+
+def ler_indice_base(pasta_base=PASTA_BASE_INCREMENTAL, meses=None):
+    """Índice id -> (hash, data, mês) dos apontamentos já ingeridos nos meses pedidos (todos se None)
+
+    Lê só as colunas do índice de cada partição mensal: o custo acompanha os
+    meses consultados, não o tamanho da base.
+    """
+    existentes = _meses_particionados(pasta_base, 'apontamentos')
+    partes = []
+    for mes in existentes if meses is None else sorted(set(meses) & set(existentes)):
+        parte = _ler_particao(pasta_base, 'apontamentos', mes, ['s_id_apontamento', 'hash_linha', 'data'])
+        parte['mes'] = mes
+        partes.append(parte)
+    if not partes:
+        return pd.DataFrame({'s_id_apontamento': [], 'hash_linha': np.array([], dtype='uint64'),
+                             'data': pd.Series(dtype='datetime64[ns]'), 'mes': []})
+    return pd.concat(partes, ignore_index=True)
+
+
+def _caminho_ids(pasta_base):
+    return os.path.join(pasta_base, 'ids.parquet')
+
+
+def ler_ids_base(pasta_base=PASTA_BASE_INCREMENTAL):
+    """Mês de cada s_id_apontamento da base (reconstruído das partições se o arquivo faltar)"""
+    caminho = _caminho_ids(pasta_base)
+    if os.path.exists(caminho):
+        return pd.read_parquet(caminho)
+    partes = [_ler_particao(pasta_base, 'apontamentos', mes, ['s_id_apontamento']).assign(mes=mes)
+              for mes in _meses_particionados(pasta_base, 'apontamentos')]
+    if not partes:
+        return pd.DataFrame({'s_id_apontamento': pd.Series(dtype='int64'), 'mes': pd.Series(dtype=object)})
+    return pd.concat(partes, ignore_index=True)
+
+
+def ingerir_snapshot_incremental(caminho, pasta_base=PASTA_BASE_INCREMENTAL):
+    """Incorpora um snapshot à base, processando apenas linhas novas, alteradas ou removidas
+
+    O snapshot é a verdade para o período que cobre (o mês inteiro numa partição
+    _pAAAA-MM, senão da menor à maior data): apontamentos da base nesse período cujo id não aparece mais no arquivo são
+    removidos, como numa recarga completa. Os hashes são lidos só das partições
+    dos meses do período; o índice global id -> mês (ids.parquet) encontra ids
+    cuja data mudou de mês, para tirá-los da partição antiga.
+    """
+    bruto = ler_csv(caminho)
+    faltantes = [col for col in ['s_id_apontamento', 'd_dt_data'] if col not in bruto.columns]
+    if faltantes:
+        raise ValueError(f"Colunas ausentes no snapshot: {', '.join(faltantes)}")
+    bruto = bruto.drop_duplicates('s_id_apontamento', keep='last').reset_index(drop=True)
+    hashes = pd.util.hash_pandas_object(bruto, index=False).to_numpy()
+
+    # Período coberto pelo snapshot (uma partição vazia ainda remove o mês da base)
+    mes_particao = mes_particao_snapshot(caminho)
+    if mes_particao:
+        periodo = pd.Period(mes_particao, freq='M')
+        inicio, fim = periodo.start_time, periodo.end_time.normalize()
+    else:
+        datas = pd.to_datetime(bruto['d_dt_data'], errors='coerce')
+        inicio, fim = datas.min(), datas.max()
+    meses_periodo = [] if pd.isna(inicio) else _meses_periodo(inicio, fim)
+
+    # Comparar com o que já está na base (por id e hash da linha bruta), só nos meses do período
+    indice = ler_indice_base(pasta_base, meses_periodo)
+    unicos = indice.drop_duplicates('s_id_apontamento', keep='last')  # get_indexer exige ids únicos
+    posicoes = pd.Index(unicos['s_id_apontamento']).get_indexer(bruto['s_id_apontamento'])
+    novos = posicoes < 0
+    alterados = np.zeros(len(bruto), dtype=bool)
+    if len(unicos):
+        hashes_base = unicos['hash_linha'].to_numpy()
+        alterados = ~novos & (hashes_base[np.where(novos, 0, posicoes)] != hashes)
+
+    # Ids já na base em meses fora do período: a data mudou de mês, não é apontamento novo
+    ids_base = ler_ids_base(pasta_base)
+    fora_do_periodo = ids_base.loc[~ids_base['mes'].isin(meses_periodo), 's_id_apontamento']
+    movidos = novos & bruto['s_id_apontamento'].isin(fora_do_periodo).to_numpy()
+    novos, alterados = novos & ~movidos, alterados | movidos
+    selecao = novos | alterados
+
+    # Removidos na origem: na base, dentro do período, e ausentes do snapshot
+    ausentes = ~indice['s_id_apontamento'].isin(bruto['s_id_apontamento'])
+    removidos = indice.loc[ausentes & indice['data'].between(inicio, fim), 's_id_apontamento']
+
+    resumo = {'linhas': len(bruto), 'novos': int(novos.sum()), 'alterados': int(alterados.sum()),
+              'removidos': len(removidos), 'meses': []}
+    if not selecao.any() and removidos.empty:
+        return resumo
+
+    delta = bruto[selecao].copy()
+    delta['hash_linha'] = hashes[selecao]
+    delta = preparar_apontamentos(delta).dropna(subset=['data'])
+    delta['mes'] = delta['data'].dt.strftime('%Y-%m')
+
+    # Ids substituídos podem estar em outros meses (data alterada)
+    ids_substituidos = pd.concat([bruto.loc[alterados, 's_id_apontamento'], removidos], ignore_index=True)
+    meses_antigos = ids_base.loc[ids_base['s_id_apontamento'].isin(ids_substituidos), 'mes']
+    meses = sorted(set(delta['mes']) | set(meses_antigos))
+
+    for mes in meses:
+        delta_mes = delta[delta['mes'] == mes][COLUNAS_BASE]
+        linhas = _ler_particao(pasta_base, 'apontamentos', mes)
+        if linhas is None:
+            linhas = delta_mes.iloc[:0]
+
+        removidas = linhas['s_id_apontamento'].isin(ids_substituidos)
+        afetadas = _chaves_dia(linhas[removidas]).union(_chaves_dia(delta_mes))
+        linhas = pd.concat([linhas[~removidas], delta_mes], ignore_index=True)
+
+        # Reagregar apenas os grupos (funcionário, dia) tocados neste mês
+        partes = []
+        agrupado = _ler_particao(pasta_base, 'agrupado', mes)
+        if agrupado is not None:
+            partes.append(agrupado[~_chaves_dia(agrupado).isin(afetadas)])
+        linhas_afetadas = linhas[_chaves_dia(linhas).isin(afetadas)]
+        if len(linhas_afetadas):
+            partes.append(agregar_por_dia(linhas_afetadas))
+        recalculado = pd.concat(partes, ignore_index=True)
+        recalculado = recalculado.sort_values(CHAVES_JORNADA, ignore_index=True)
+
+        gravar_parquet(linhas, _caminho_particao(pasta_base, 'apontamentos', mes))
+        gravar_parquet(recalculado, _caminho_particao(pasta_base, 'agrupado', mes))
+
+    # Índice global: sai o que foi substituído ou removido, entra o delta no mês atual
+    mantidos = ~ids_base['s_id_apontamento'].isin(pd.concat([ids_substituidos, delta['s_id_apontamento']]))
+    gravar_parquet(pd.concat([ids_base[mantidos], delta[['s_id_apontamento', 'mes']]], ignore_index=True),
+                   _caminho_ids(pasta_base))
+
+    resumo['meses'] = meses
+    return resumo
+
+
+def particoes_agrupadas(pasta_base=PASTA_BASE_INCREMENTAL):
+    """Mês AAAA-MM -> arquivo Parquet das jornadas agregadas da base incremental"""
+    return {mes: _caminho_particao(pasta_base, 'agrupado', mes) for mes in _meses_particionados(pasta_base, 'agrupado')}
+
+
+def carregar_base_agrupada(pasta_base=PASTA_BASE_INCREMENTAL):
+    """Junta as partições mensais agregadas (None se a base estiver vazia)"""
+    partes = [_ler_particao(pasta_base, 'agrupado', mes) for mes in _meses_particionados(pasta_base, 'agrupado')]
+    if not partes:
+        return None
+    return pd.concat(partes, ignore_index=True)
+
+
+def atualizar_base_incremental(pasta=PASTA_RESULTADOS, pasta_base=PASTA_BASE_INCREMENTAL):
+    """Ingere os snapshots ainda não incorporados e retorna os resumos de cada um"""
+    arquivos = sorted(glob.glob(os.path.join(pasta, PADRAO_SNAPSHOT)))
+    if not arquivos:
+        return []
+
+    with _TRAVA_INGESTAO:
+        manifesto = ler_manifesto(pasta_base)
+        if not manifesto:
+            # Base inexistente ou de versão antiga: recomeçar pela carga mais recente (todas as partições)
+            shutil.rmtree(pasta_base, ignore_errors=True)
+            manifesto = {'versao': VERSAO_CACHE, 'ingeridos': {}, 'ultimo': None}
+            pendentes = [arq for arq in arquivos if carimbo_snapshot(arq) == carimbo_snapshot(arquivos[-1])]
+        else:
+            ultimo = manifesto.get('ultimo') or ''
+            pendentes = [arq for arq in arquivos
+                         if os.path.basename(arq) >= ultimo
+                         and manifesto['ingeridos'].get(os.path.basename(arq)) != assinatura_snapshot(arq)]
+
+        resumos = []
+        for caminho in pendentes:
+            resumo = ingerir_snapshot_incremental(caminho, pasta_base)
+            resumo['arquivo'] = os.path.basename(caminho)
+            resumos.append(resumo)
+            manifesto['ingeridos'][resumo['arquivo']] = assinatura_snapshot(caminho)
+            manifesto['ultimo'] = max(manifesto['ultimo'] or '', resumo['arquivo'])
+            _salvar_manifesto(manifesto, pasta_base)
+        return resumos
+
+
+def carregar_dados_incremental(pasta=PASTA_RESULTADOS, pasta_base=PASTA_BASE_INCREMENTAL):
+    """Atualiza a base incremental e retorna as jornadas com as colunas derivadas"""
+    atualizar_base_incremental(pasta, pasta_base)
+    df_agrupado = carregar_base_agrupada(pasta_base)
+    if df_agrupado is None:
+        return None
+    return derivar_colunas(df_agrupado)
+
+
+def carregar_dados(pasta=PASTA_RESULTADOS, usar_cache=True, incremental=None):
+    """Carrega o snapshot mais recente (None se não houver dados)"""
+    if incremental is None:
+        incremental = MODO_INCREMENTAL
+    if incremental:
+        return carregar_dados_incremental(pasta)
+
+    caminhos = localizar_carga_mais_recente(pasta)
+    if not caminhos:
+        return None
+    return carregar_carga(caminhos, usar_cache=usar_cache)
+
+
+def versao_dados(pasta=PASTA_RESULTADOS, incremental=None):
+    """Assinatura barata dos dados visíveis (só stat); muda quando algum snapshot ou regra muda"""
+    if incremental is None:
+        incremental = MODO_INCREMENTAL
+    if incremental:
+        arquivos = sorted(glob.glob(os.path.join(pasta, PADRAO_SNAPSHOT)))
+    else:
+        arquivos = localizar_carga_mais_recente(pasta)
+    if not arquivos:
+        return None
+    chave = '|'.join(assinatura_snapshot(arquivo) for arquivo in arquivos) + f"|incremental={incremental}"
+    return hashlib.sha1(chave.encode('utf-8')).hexdigest()[:16]
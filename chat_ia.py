@@ -0,0 +1,455 @@
+"""
+🤖 CHAT IA - Contexto, backends de resposta, execução em segundo plano e cache
+Monta o contexto enviado ao modelo a partir do recorte atual, conversa com o
+backend configurado (OpenAI ou um backend local sem rede, ambos com streaming
+e com as ferramentas de consulta de ferramentas_chat) em um pool de threads com fila de resultados por sessão, e guarda as respostas
+por pergunta normalizada + hash do contexto + filtro, com expiração (TTL),
+descarte LRU e persistência opcional em JSON.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import regras_jornada
+
+MODELO = "gpt-3.5-turbo"
+TEMPERATURA = 0.3   # Reduzir temperatura para respostas mais focadas
+MAX_TOKENS = 400    # Tokens suficientes para respostas completas
+TIMEOUT = 30        # Segundos
+MAX_RODADAS_FERRAMENTAS = 4  # Rodadas de chamadas de ferramenta antes de exigir a resposta final
+FERRAMENTAS_ATIVAS = os.getenv("DASHBOARD_CHAT_FERRAMENTAS", "1") != "0"  # 0: só o resumo no prompt
+
+# Backend: 'openai' (padrão) ou 'local' (respostas sintéticas, sem rede nem API key)
+BACKEND = os.getenv("DASHBOARD_CHAT_BACKEND", "openai")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None  # Servidor compatível (ex.: stub local)
+LOCAL_ATRASO_INICIAL = float(os.getenv("DASHBOARD_CHAT_LOCAL_ATRASO", "0.3"))       # Segundos até o 1º token
+LOCAL_ATRASO_TOKEN = float(os.getenv("DASHBOARD_CHAT_LOCAL_ATRASO_TOKEN", "0.02"))  # Segundos entre tokens
+
+MAX_WORKERS = int(os.getenv("DASHBOARD_CHAT_WORKERS", "4"))  # Perguntas simultâneas no processo
+SESSAO_INATIVA = 3600  # Segundos até descartar a fila de uma sessão sem consultas
+
+CACHE_CAPACIDADE = int(os.getenv("DASHBOARD_CHAT_CACHE_CAPACIDADE", "256"))
+CACHE_TTL = float(os.getenv("DASHBOARD_CHAT_CACHE_TTL", str(6 * 3600)))  # Segundos
+ARQUIVO_CACHE = os.getenv("DASHBOARD_CHAT_CACHE_ARQUIVO")                  # Vazio: só em memória
+
+
+# ==================== CONTEXTO ====================
+def calcular_estatisticas(resumo, data_inicio, data_fim, validador_selecionado, faixa_referencia, top_3_func):
+    """Estatísticas do contexto: resumo do cubo + identificação do filtro e top 3"""
+    return {
+        **resumo,
+        'periodo': f"{data_inicio} a {data_fim}",
+        'validador': validador_selecionado,
+        'faixa_referencia': faixa_referencia,
+        'top_3_func': top_3_func
+    }
+
+
+def montar_contexto(stats, regras, ferramentas=False):
+    """Prompt de sistema com as regras de cálculo, o resumo do recorte e, opcionalmente, as consultas"""
+    almoco = regras['horas_almoco']
+    limite = regras['limite_diario']
+    multiplicador = regras['multiplicador_extra']
+    dias_uteis = regras_jornada.descrever_dias(regras['dias_uteis'])
+    fim_de_semana = regras_jornada.descrever_dias(set(range(7)) - set(regras['dias_uteis']))
+    total = max(stats['total_registros'], 1)
+    top_3 = chr(10).join([f"- {nome}: {horas:.2f}h" for nome, horas in stats['top_3_func'].items()])
+    consultas = """
+CONSULTAS DISPONÍVEIS:
+Para detalhes além do resumo acima (funcionário específico, ranking de horas extras,
+série por dia, outliers), chame as ferramentas em vez de estimar. Cite os números retornados.
+""" if ferramentas else ""
+    return f"""
+Você é um assistente especializado em análise de dados de apontamentos de trabalho.
+Forneça respostas detalhadas e estruturadas baseadas nos dados apresentados.
+
+REGRAS DE CÁLCULO APLICADAS:
+✅ Desconto de {almoco:g}h de almoço por dia (já aplicado nos dados)
+✅ Classificação de dia útil ({dias_uteis}) vs final de semana ({fim_de_semana})
+✅ Horas extras = tudo acima de {limite:g}h APÓS desconto do almoço
+✅ Horas pagas = horas normais + (horas extras × {multiplicador:g})
+
+DADOS ATUAIS FILTRADOS:
+- Período: {stats['periodo']}
+- Validador: {stats['validador']}
+- Faixa de referência: {stats['faixa_referencia']}h
+- Total de jornadas: {stats['total_registros']}
+- Dias úteis: {stats['dias_uteis']} | Fins de semana: {stats['dias_nao_uteis']}
+- Funcionários únicos: {stats['funcionarios']}
+
+HORAS TRABALHADAS:
+- Horas brutas (com almoço): {stats['total_horas_brutas']:.2f}h
+- Horas líquidas (sem almoço): {stats['total_horas_liquidas']:.2f}h
+- Horas extras (>{limite:g}h/dia): {stats['total_horas_extras']:.2f}h
+- Horas pagas (com {multiplicador - 1:.0%} extras): {stats['total_horas_pagas']:.2f}h
+- Média por jornada: {stats['media_horas']:.2f}h
+
+DISTRIBUIÇÃO:
+- Abaixo da faixa: {stats['abaixo']} ({stats['abaixo']/total*100:.1f}%)
+- Normal: {stats['normal']} ({stats['normal']/total*100:.1f}%)
+- Acima da faixa: {stats['acima']} ({stats['acima']/total*100:.1f}%)
+
+TOP 3 FUNCIONÁRIOS (horas brutas):
+{top_3}
+
+IMPORTANTE: Ao responder sobre horas extras, sempre considere que:
+- Horas extras são calculadas APÓS desconto de {almoco:g}h de almoço
+- Exemplo: {limite + almoco + 1:g}h trabalhadas = {limite + 1:g}h líquidas = 1h extra ({limite + 1:g}h - {limite:g}h)
+- Dias úteis vs fins de semana podem ter padrões diferentes
+{consultas}
+Responda de forma clara, use dados específicos e foque em insights práticos sobre produtividade e custos.
+"""
+
+
+# ==================== BACKENDS ====================
+class BackendOpenAI:
+    """Chat Completions da OpenAI (ou de um servidor compatível via base_url)"""
+
+    nome = 'openai'
+
+    def __init__(self, api_key, base_url=OPENAI_BASE_URL):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key, base_url=base_url)
+
+    def _criar(self, mensagens, stream, ferramentas=None, final=False):
+        opcoes = {}
+        if ferramentas is not None:
+            # Na última rodada as ferramentas continuam declaradas, mas o modelo precisa responder
+            opcoes = {'tools': ferramentas.esquemas, 'tool_choice': 'none' if final else 'auto'}
+        return self.client.chat.completions.create(
+            model=MODELO,
+            messages=mensagens,
+            temperature=TEMPERATURA,
+            max_tokens=MAX_TOKENS,
+            timeout=TIMEOUT,
+            stream=stream,
+            **opcoes
+        )
+
+    def responder(self, contexto, pergunta, ferramentas=None):
+        """Resposta completa, resolvendo antes as chamadas de ferramenta pedidas pelo modelo"""
+        mensagens = _mensagens_iniciais(contexto, pergunta)
+        for rodada in range(MAX_RODADAS_FERRAMENTAS + 1):
+            final = rodada == MAX_RODADAS_FERRAMENTAS
+            mensagem = self._criar(mensagens, False, ferramentas, final).choices[0].message
+            if not mensagem.tool_calls or final:
+                return mensagem.content or ''
+            executar_ferramentas(mensagens, [
+                {'id': chamada.id, 'nome': chamada.function.name, 'argumentos': chamada.function.arguments}
+                for chamada in mensagem.tool_calls
+            ], ferramentas)
+
+    def transmitir(self, contexto, pergunta, ferramentas=None):
+        """Pedaços de texto à medida que chegam; rodadas de ferramenta são resolvidas no caminho"""
+        mensagens = _mensagens_iniciais(contexto, pergunta)
+        for rodada in range(MAX_RODADAS_FERRAMENTAS + 1):
+            final = rodada == MAX_RODADAS_FERRAMENTAS
+            chamadas = {}  # índice -> chamada montada a partir dos deltas
+            for pedaco in self._criar(mensagens, True, ferramentas, final):
+                if not pedaco.choices:
+                    continue
+                delta = pedaco.choices[0].delta
+                if delta.content:
+                    yield delta.content
+                for parcial in delta.tool_calls or []:
+                    chamada = chamadas.setdefault(parcial.index, {'id': '', 'nome': '', 'argumentos': ''})
+                    chamada['id'] = parcial.id or chamada['id']
+                    if parcial.function is not None:
+                        chamada['nome'] += parcial.function.name or ''
+                        chamada['argumentos'] += parcial.function.arguments or ''
+            if not chamadas or final:
+                return
+            executar_ferramentas(mensagens, [chamadas[indice] for indice in sorted(chamadas)], ferramentas)
+
+
+def _mensagens_iniciais(contexto, pergunta):
+    return [
+        {"role": "system", "content": contexto},
+        {"role": "user", "content": pergunta}
+    ]
+
+
+def executar_ferramentas(mensagens, chamadas, ferramentas):
+    """Anexa ao diálogo as chamadas pedidas pelo modelo e as respostas do motor de consultas"""
+    mensagens.append({'role': 'assistant', 'content': None, 'tool_calls': [
+        {'id': chamada['id'], 'type': 'function',
+         'function': {'name': chamada['nome'], 'arguments': chamada['argumentos']}}
+        for chamada in chamadas
+    ]})
+    for chamada in chamadas:
+        mensagens.append({'role': 'tool', 'tool_call_id': chamada['id'],
+                          'content': ferramentas.executar(chamada['nome'], chamada['argumentos'])})
+
+
+# Backend local: início de palavra da pergunta normalizada -> consulta executada
+FERRAMENTAS_LOCAIS = [
+    ('outlier', 'outliers'),
+    ('sobrecarga', 'ranking_horas_extras'),
+    ('extra', 'ranking_horas_extras'),
+    ('tendencia', 'serie_diaria'),
+    ('dia', 'serie_diaria'),
+    ('quem', 'totais_funcionarios'),
+    ('funcionario', 'totais_funcionarios'),
+]
+
+
+class BackendLocal:
+    """Respostas sintéticas com latência configurável (testes e medições offline)"""
+
+    nome = 'local'
+
+    def __init__(self, atraso_inicial=LOCAL_ATRASO_INICIAL, atraso_token=LOCAL_ATRASO_TOKEN):
+        self.atraso_inicial = atraso_inicial
+        self.atraso_token = atraso_token
+
+    @staticmethod
+    def _texto(contexto, pergunta, ferramentas=None):
+        inicio = contexto.find('DADOS ATUAIS FILTRADOS:')
+        fim = contexto.find('DISTRIBUIÇÃO:')
+        resumo = contexto[inicio:fim].strip() if inicio >= 0 else ''
+        texto = f"🧪 **Resposta local** para: _{pergunta}_\n\n{resumo}"
+        palavras = normalizar_pergunta(pergunta).split()
+        nome = next((nome for chave, nome in FERRAMENTAS_LOCAIS
+                     if any(palavra.startswith(chave) for palavra in palavras)), None)
+        if ferramentas is not None and nome:
+            argumentos = '{}' if nome == 'serie_diaria' else '{"limite": 5}'
+            texto += f"\n\n🔧 `{nome}`: {ferramentas.executar(nome, argumentos)}"
+        return texto
+
+    def transmitir(self, contexto, pergunta, ferramentas=None):
+        time.sleep(self.atraso_inicial)
+        for token in re.findall(r'\S+\s*', self._texto(contexto, pergunta, ferramentas)):
+            yield token
+            time.sleep(self.atraso_token)
+
+    def responder(self, contexto, pergunta, ferramentas=None):
+        return ''.join(self.transmitir(contexto, pergunta, ferramentas))
+
+
+def criar_backend(nome=None, api_key=None, base_url=OPENAI_BASE_URL):
+    """Instancia o backend configurado"""
+    nome = nome or BACKEND
+    if nome == 'local':
+        return BackendLocal()
+    if nome == 'openai':
+        return BackendOpenAI(api_key, base_url)
+    raise ValueError(f"Backend de chat desconhecido: {nome}")
+
+
+class PoolBackends:
+    """Um backend (e seu cliente HTTP) por configuração, reutilizado entre perguntas e sessões"""
+
+    def __init__(self):
+        self._backends = {}
+        self._trava = threading.Lock()
+
+    def obter(self, nome=None, api_key=None, base_url=OPENAI_BASE_URL):
+        nome = nome or BACKEND
+        chave = (nome, hashlib.sha1((api_key or '').encode('utf-8')).hexdigest(), base_url)
+        with self._trava:
+            if chave not in self._backends:
+                self._backends[chave] = criar_backend(nome, api_key, base_url)
+            return self._backends[chave]
+
+
+def cronometrar(pedacos, medicao):
+    """Repassa os pedaços registrando em medicao o tempo até o 1º token e o total (s)"""
+    inicio = time.perf_counter()
+    medicao['primeiro_token'] = None
+    for pedaco in pedacos:
+        if medicao['primeiro_token'] is None:
+            medicao['primeiro_token'] = time.perf_counter() - inicio
+        yield pedaco
+    medicao['total'] = time.perf_counter() - inicio
+
+
+def medir_resposta(backend, contexto, pergunta, ferramentas=None):
+    """Resposta completa (sem streaming) e sua latência total (s)"""
+    inicio = time.perf_counter()
+    resposta = backend.responder(contexto, pergunta, ferramentas)
+    return resposta, {'primeiro_token': None, 'total': time.perf_counter() - inicio}
+
+
+# ==================== CACHE DE RESPOSTAS ====================
+def normalizar_pergunta(pergunta):
+    """Minúsculas, sem acentos, pontuação nem espaços repetidos"""
+    texto = unicodedata.normalize('NFKD', pergunta.casefold())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r'[^\w\s]', ' ', texto)
+    return ' '.join(texto.split())
+
+
+def chave_resposta(pergunta, contexto, filtro):
+    """Chave do cache: pergunta normalizada + hash do contexto + impressão digital do filtro"""
+    hash_contexto = hashlib.sha1(contexto.encode('utf-8')).hexdigest()
+    texto = f"{normalizar_pergunta(pergunta)}|{hash_contexto}|{filtro!r}|{MODELO}"
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+
+class CacheRespostas:
+    """Cache LRU com TTL, seguro entre threads, com persistência opcional em JSON"""
+
+    def __init__(self, capacidade=CACHE_CAPACIDADE, ttl=CACHE_TTL, arquivo=ARQUIVO_CACHE):
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self.arquivo = arquivo
+        self.acertos = 0
+        self.faltas = 0
+        self._itens = OrderedDict()  # chave -> (instante, resposta)
+        self._trava = threading.Lock()
+        self._trava_arquivo = threading.Lock()  # Serializa a escrita do JSON, fora de _trava
+        self._versao = 0                        # Alterações feitas / última gravada no arquivo
+        self._versao_salva = 0
+        self._carregar()
+
+    def _expirado(self, instante, agora):
+        return self.ttl is not None and agora - instante > self.ttl
+
+    def _carregar(self):
+        if not self.arquivo or not os.path.exists(self.arquivo):
+            return
+        try:
+            with open(self.arquivo, encoding='utf-8') as arquivo:
+                itens = json.load(arquivo)
+        except (OSError, ValueError):
+            return  # Cache corrompido: recomeça vazio
+        agora = time.time()
+        for chave, (instante, resposta) in sorted(itens.items(), key=lambda item: item[1][0]):
+            if not self._expirado(instante, agora):
+                self._itens[chave] = (instante, resposta)
+        while len(self._itens) > self.capacidade:
+            self._itens.popitem(last=False)
+
+    def _salvar(self, itens, versao):
+        """Grava a cópia dos itens; uma cópia mais antiga que a já gravada é descartada"""
+        if not self.arquivo:
+            return
+        with self._trava_arquivo:
+            if versao <= self._versao_salva:
+                return
+            pasta = os.path.dirname(self.arquivo)
+            if pasta:
+                os.makedirs(pasta, exist_ok=True)
+            temporario = f"{self.arquivo}.{os.getpid()}.tmp"
+            with open(temporario, 'w', encoding='utf-8') as arquivo:
+                json.dump(itens, arquivo, ensure_ascii=False)
+            os.replace(temporario, self.arquivo)
+            self._versao_salva = versao
+
+    def obter(self, chave):
+        """Resposta guardada para a chave, ou None (ausente ou expirada)"""
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is None or self._expirado(item[0], time.time()):
+                self._itens.pop(chave, None)
+                self.faltas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return item[1]
+
+    def guardar(self, chave, resposta):
+        with self._trava:
+            self._itens[chave] = (time.time(), resposta)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+            self._versao += 1
+            itens, versao = (dict(self._itens), self._versao) if self.arquivo else (None, None)
+        # JSON escrito fora da trava: obter/guardar de outras threads não esperam o disco
+        self._salvar(itens, versao)
+
+    def __len__(self):
+        return len(self._itens)
+
+
+# ==================== EXECUÇÃO EM SEGUNDO PLANO ====================
+class TarefaChat:
+    """Pergunta enviada ao worker; texto, latência e erro são preenchidos durante a execução"""
+
+    def __init__(self, pergunta, chave):
+        self.pergunta = pergunta
+        self.chave = chave
+        self.texto = ''
+        self.latencia = {}
+        self.erro = None
+        self.concluida = False
+
+
+class ExecutorChat:
+    """Pool de threads para as perguntas; cada sessão recolhe as suas numa fila própria"""
+
+    def __init__(self, max_workers=MAX_WORKERS, cache=None):
+        self.cache = cache
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chat-ia')
+        self._andamento = {}  # sessão -> [TarefaChat]
+        self._filas = {}      # sessão -> queue.Queue de tarefas concluídas
+        self._acessos = {}    # sessão -> último acesso
+        self._trava = threading.Lock()
+
+    def _tocar(self, sessao):
+        agora = time.time()
+        self._acessos[sessao] = agora
+        for antiga in [s for s, instante in self._acessos.items() if agora - instante > SESSAO_INATIVA]:
+            if not self._andamento.get(antiga):
+                self._acessos.pop(antiga, None)
+                self._filas.pop(antiga, None)
+                self._andamento.pop(antiga, None)
+
+    def enviar(self, sessao, tarefa, backend, contexto, streaming=True, ferramentas=None):
+        """Agenda a tarefa; retorna False se a mesma pergunta já está em andamento na sessão"""
+        with self._trava:
+            self._tocar(sessao)
+            andamento = self._andamento.setdefault(sessao, [])
+            if any(atual.chave == tarefa.chave for atual in andamento):
+                return False
+            andamento.append(tarefa)
+            self._filas.setdefault(sessao, queue.Queue())
+        self._pool.submit(self._executar, sessao, tarefa, backend, contexto, streaming, ferramentas)
+        return True
+
+    def _executar(self, sessao, tarefa, backend, contexto, streaming, ferramentas):
+        try:
+            if streaming:
+                pedacos = backend.transmitir(contexto, tarefa.pergunta, ferramentas)
+                for pedaco in cronometrar(pedacos, tarefa.latencia):
+                    tarefa.texto += pedaco
+            else:
+                tarefa.texto, tarefa.latencia = medir_resposta(backend, contexto, tarefa.pergunta, ferramentas)
+            if self.cache is not None:
+                self.cache.guardar(tarefa.chave, tarefa.texto)
+        except Exception as e:
+            tarefa.erro = str(e)
+        finally:
+            tarefa.concluida = True
+            with self._trava:
+                andamento = self._andamento.get(sessao, [])
+                if tarefa in andamento:
+                    andamento.remove(tarefa)
+                self._filas.setdefault(sessao, queue.Queue()).put(tarefa)
+
+    def em_andamento(self, sessao):
+        """Tarefas da sessão ainda em execução (com o texto parcial)"""
+        with self._trava:
+            return list(self._andamento.get(sessao, []))
+
+    def coletar(self, sessao):
+        """Retira da fila da sessão as tarefas concluídas, sem bloquear"""
+        with self._trava:
+            self._tocar(sessao)
+            fila = self._filas.get(sessao)
+        concluidas = []
+        while fila is not None:
+            try:
+                concluidas.append(fila.get_nowait())
+            except queue.Empty:
+                break
+        return concluidas
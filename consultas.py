@@ -0,0 +1,44 @@
+"""
+🔎 CONSULTAS - Recortes do conjunto de jornadas agregadas
+O carregador entrega as jornadas ordenadas pela coluna data; as posições de
+cada chave de filtro vêm do cubo (busca binária no período) e um período
+contínuo vira uma fatia sem cópia.
+"""
+
+import pandas as pd
+
+import cubos
+from regras_jornada import CLASSIFICACOES_FAIXA
+
+
+class ConjuntoApontamentos:
+    """Jornadas carregadas uma vez por processo e compartilhadas entre as sessões
+
+    O DataFrame é somente leitura: cada sessão guarda apenas a chave de filtro e
+    recebe recortes que reaproveitam as colunas do conjunto.
+    """
+
+    motor = 'pandas'
+
+    def __init__(self, df, versao=None, regras=None):
+        self.df = df
+        self.versao = versao
+        self.cubo = cubos.CuboJornadas(df, regras)
+
+        # Dimensões usadas pela sidebar, calculadas uma única vez
+        self.data_min = df['data'].min().date()
+        self.data_max = df['data'].max().date()
+        self.validadores = sorted(df['s_nm_usuario_valida'].dropna().unique().tolist())
+        self.funcionarios = sorted(df['s_nm_recurso'].dropna().unique().tolist())
+        self.n_jornadas = len(df)
+        self.bytes_memoria = int(df.memory_usage(deep=True).sum())
+
+    def recorte(self, chave, faixa_referencia, tolerancia):
+        """Jornadas da chave de filtro com a coluna classificacao da faixa"""
+        posicoes = self.cubo.posicoes(chave)
+        if len(posicoes) and posicoes[-1] - posicoes[0] + 1 == len(posicoes):
+            recorte = self.df.iloc[posicoes[0]:posicoes[-1] + 1]  # Período contínuo: fatia sem cópia
+        else:
+            recorte = self.df.take(posicoes)
+        codigos = self.cubo.classificacao(faixa_referencia, tolerancia)[posicoes]
+        return recorte.assign(classificacao=pd.Categorical.from_codes(codigos, CLASSIFICACOES_FAIXA))
@@ -0,0 +1,270 @@
+"""
+🧊 CUBOS - Agregações funcionário × dia × classificação
+As medidas das jornadas ficam em arrays NumPy montados uma vez por carga; os
+recortes usados pelas abas (por funcionário, por dia, horas extras, ranking)
+saem de bincount sobre os códigos e ficam memorizados por chave de filtro.
+
+Chave de filtro: (data_inicio, data_fim, validador, funcionario), com 'Todos'
+para não filtrar validador/funcionário.
+"""
+
+from functools import lru_cache
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+import regras_jornada
+from regras_jornada import CLASSIFICACOES_FAIXA, NOMES_DIAS
+
+TODOS = 'Todos'
+TAMANHO_MEMO = 256  # Recortes memorizados por tipo de agregação
+
+
+def _codificar(serie):
+    categorias = pd.Categorical(serie)
+    return categorias.codes.astype('int64'), pd.Index(categorias.categories)
+
+
+def _codigo(categorias, valor):
+    try:
+        return categorias.get_loc(valor)
+    except KeyError:
+        return -1
+
+
+def extras_por_data_vazio():
+    """Resultado de extras_por_data sem dias com extra, já com os tipos das colunas"""
+    return pd.DataFrame({
+        'data': pd.Series(dtype='datetime64[ns]'),
+        'horas_extras': pd.Series(dtype='float64'),
+        's_nm_recurso': pd.Series(dtype='int64')
+    })
+
+
+class CuboJornadas:
+    """Medidas das jornadas em arrays, com recortes memorizados por chave de filtro"""
+
+    def __init__(self, df, regras=None):
+        self.df = df
+        self.regras = regras if regras is not None else regras_jornada.carregar_regras()
+
+        # Dimensões codificadas
+        self.cod_funcionario, self.funcionarios = _codificar(df['s_nm_recurso'])
+        self.cod_validador, self.validadores = _codificar(df['s_nm_usuario_valida'])
+        self.dia = df['data'].to_numpy().astype('datetime64[D]').astype('int64')
+        self.dia_semana = df['dia_semana_num'].to_numpy().astype('int64')
+
+        # Medidas (float64 para somas exatas mesmo com colunas em float32)
+        self.duracao = df['duracao_horas'].to_numpy(dtype='float64')
+        self.extras = df['horas_extras'].to_numpy(dtype='float64')
+        self.pagas = df['horas_pagas'].to_numpy(dtype='float64')
+        self.liquida = df['duracao_liquida'].to_numpy(dtype='float64')
+        self.eh_dia_util = df['eh_dia_util'].to_numpy(dtype=bool)
+
+        # Recortes memorizados por chave de filtro
+        self.posicoes = lru_cache(maxsize=TAMANHO_MEMO)(self._posicoes)
+        self.classificacao = lru_cache(maxsize=8)(self._classificacao)
+        self.resumo = lru_cache(maxsize=TAMANHO_MEMO)(self._resumo)
+        self.por_funcionario = lru_cache(maxsize=TAMANHO_MEMO)(self._por_funcionario)
+        self.por_dia = lru_cache(maxsize=TAMANHO_MEMO)(self._por_dia)
+        self.top_funcionarios = lru_cache(maxsize=TAMANHO_MEMO)(self._top_funcionarios)
+        self.media_dia_semana = lru_cache(maxsize=TAMANHO_MEMO)(self._media_dia_semana)
+        self.extras_por_funcionario = lru_cache(maxsize=TAMANHO_MEMO)(self._extras_por_funcionario)
+        self.extras_por_data = lru_cache(maxsize=TAMANHO_MEMO)(self._extras_por_data)
+
+    # ==================== FILTROS ====================
+    def _posicoes(self, chave):
+        """Posições das jornadas que atendem à chave de filtro"""
+        data_inicio, data_fim, validador, funcionario = chave
+        inicio = self.dia.searchsorted(np.datetime64(data_inicio, 'D').astype('int64'), side='left')
+        fim = self.dia.searchsorted(np.datetime64(data_fim, 'D').astype('int64'), side='right')
+        posicoes = np.arange(inicio, fim)
+        if validador != TODOS:
+            posicoes = posicoes[self.cod_validador[posicoes] == _codigo(self.validadores, validador)]
+        if funcionario != TODOS:
+            posicoes = posicoes[self.cod_funcionario[posicoes] == _codigo(self.funcionarios, funcionario)]
+        return posicoes
+
+    def _classificacao(self, faixa_referencia, tolerancia):
+        """Códigos 0/1/2 (Abaixo/Normal/Acima) de todas as jornadas para a faixa"""
+        coluna = regras_jornada.coluna_classificacao(faixa_referencia)
+        if coluna in self.df.columns and tolerancia == self.regras['tolerancia_faixa']:
+            return self.df[coluna].cat.codes.to_numpy().astype('int64')
+        return regras_jornada.classificar_por_faixa(self.duracao, faixa_referencia, tolerancia).codes.astype('int64')
+
+    def _dias(self, posicoes):
+        """Índice compacto dos dias do recorte (posições já vêm ordenadas por data)"""
+        primeiro = self.dia[posicoes[0]]
+        return self.dia[posicoes] - primeiro, primeiro
+
+    @staticmethod
+    def _datas(dias):
+        return pd.Index(pd.to_datetime(dias.astype('datetime64[D]')).date, name='data')
+
+    # ==================== AGREGAÇÕES ====================
+    def _resumo(self, chave, faixa_referencia, tolerancia):
+        """Totais do recorte numa única passada (cabeçalho, chat e aba de horas extras)"""
+        posicoes = self.posicoes(chave)
+        n = len(self.funcionarios)
+        codigos = self.cod_funcionario[posicoes]
+        duracao = self.duracao[posicoes]
+        extras = self.extras[posicoes]
+        com_extra = extras > 0
+        classes = np.bincount(self.classificacao(faixa_referencia, tolerancia)[posicoes], minlength=3)
+        dias_uteis = int(self.eh_dia_util[posicoes].sum())
+        total_horas = float(duracao.sum())
+        return MappingProxyType({
+            'total_registros': len(posicoes),
+            'total_horas': total_horas,
+            'total_horas_brutas': total_horas,
+            'total_horas_liquidas': float(self.liquida[posicoes].sum()),
+            'total_horas_extras': float(extras.sum()),
+            'total_horas_pagas': float(self.pagas[posicoes].sum()),
+            'media_horas': total_horas / len(posicoes) if len(posicoes) else float('nan'),
+            **{nome.lower(): int(classes[codigo]) for codigo, nome in enumerate(CLASSIFICACOES_FAIXA)},
+            'funcionarios': int(np.count_nonzero(np.bincount(codigos, minlength=n))),
+            'funcionarios_com_extras': int(np.count_nonzero(np.bincount(codigos[com_extra], minlength=n))),
+            'jornadas_com_extras': int(com_extra.sum()),
+            'dias_uteis': dias_uteis,
+            'dias_nao_uteis': len(posicoes) - dias_uteis
+        })
+
+    def _por_funcionario(self, chave, faixa_referencia, tolerancia):
+        """Qtd, total, média, mínimo, máximo e dias abaixo da faixa por funcionário"""
+        posicoes = self.posicoes(chave)
+        n = len(self.funcionarios)
+        codigos = self.cod_funcionario[posicoes]
+        duracao = self.duracao[posicoes]
+
+        qtd = np.bincount(codigos, minlength=n)
+        total = np.bincount(codigos, weights=duracao, minlength=n)
+        minimo = np.full(n, np.inf)
+        maximo = np.full(n, -np.inf)
+        np.minimum.at(minimo, codigos, duracao)
+        np.maximum.at(maximo, codigos, duracao)
+        abaixo = np.bincount(codigos, weights=self.classificacao(faixa_referencia, tolerancia)[posicoes] == 0,
+                             minlength=n).astype('int64')
+
+        presentes = qtd > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media = total / qtd
+        resultado = pd.DataFrame({
+            'Qtd': qtd, 'Total_h': total, 'Média_h': media, 'Min_h': minimo, 'Max_h': maximo,
+            'Abaixo_Padrão': abaixo
+        }, index=pd.Index(self.funcionarios, name='s_nm_recurso'))[presentes]
+
+        # Classificação geral
+        resultado['Status'] = np.select(
+            [resultado['Abaixo_Padrão'] > resultado['Qtd'] * 0.3, resultado['Abaixo_Padrão'] > 0],
+            ['🔴 Crítico', '🟡 Atenção'],
+            '🟢 OK'
+        )
+        return resultado.sort_values('Total_h', ascending=False)
+
+    def _por_dia(self, chave, faixa_referencia, tolerancia):
+        """Qtd, total, média e contagem por classificação de cada dia"""
+        posicoes = self.posicoes(chave)
+        colunas = ['Qtd', 'Total_h', 'Média_h'] + CLASSIFICACOES_FAIXA
+        if len(posicoes) == 0:
+            return pd.DataFrame(columns=colunas, index=pd.Index([], name='data'))
+
+        dias, primeiro = self._dias(posicoes)
+        n = int(dias[-1]) + 1
+        qtd = np.bincount(dias, minlength=n)
+        total = np.bincount(dias, weights=self.duracao[posicoes], minlength=n)
+        classes = self.classificacao(faixa_referencia, tolerancia)[posicoes]
+        contagens = {
+            nome: np.bincount(dias, weights=classes == codigo, minlength=n).astype('int64')
+            for codigo, nome in enumerate(CLASSIFICACOES_FAIXA)
+        }
+
+        presentes = np.flatnonzero(qtd)
+        resultado = pd.DataFrame({
+            'Qtd': qtd[presentes],
+            'Total_h': total[presentes],
+            'Média_h': total[presentes] / qtd[presentes],
+            **{nome: valores[presentes] for nome, valores in contagens.items()}
+        }, index=self._datas(presentes + primeiro))
+        return resultado[colunas]
+
+    def por_dia_classificacao(self, chave, faixa_referencia, tolerancia):
+        """Formato longo (data, classificacao, count) apenas com combinações presentes"""
+        por_dia = self.por_dia(chave, faixa_referencia, tolerancia)
+        longo = por_dia[CLASSIFICACOES_FAIXA].reset_index().melt(
+            id_vars='data', var_name='classificacao', value_name='count'
+        )
+        return longo[longo['count'] > 0].reset_index(drop=True)
+
+    def distribuicao(self, chave, faixa_referencia, tolerancia):
+        """Quantidade de jornadas em cada classificação"""
+        classes = self.classificacao(faixa_referencia, tolerancia)[self.posicoes(chave)]
+        return pd.Series(np.bincount(classes, minlength=3), index=CLASSIFICACOES_FAIXA, name='count')
+
+    def jornadas(self, chave, faixa_referencia, tolerancia):
+        """Funcionário, data, duração, horas extras e classificação de cada jornada do recorte"""
+        posicoes = self.posicoes(chave)
+        return pd.DataFrame({
+            's_nm_recurso': self.funcionarios[self.cod_funcionario[posicoes]],
+            'data': pd.to_datetime(self.dia[posicoes].astype('datetime64[D]')),
+            'duracao_horas': self.duracao[posicoes],
+            'horas_extras': self.extras[posicoes],
+            'classificacao': pd.Categorical.from_codes(
+                self.classificacao(faixa_referencia, tolerancia)[posicoes], CLASSIFICACOES_FAIXA)
+        })
+
+    def _top_funcionarios(self, chave, n=10):
+        """Funcionários com mais horas brutas no recorte"""
+        posicoes = self.posicoes(chave)
+        total = np.bincount(self.cod_funcionario[posicoes], weights=self.duracao[posicoes],
+                            minlength=len(self.funcionarios))
+        serie = pd.Series(total, index=pd.Index(self.funcionarios, name='s_nm_recurso'), name='duracao_horas')
+        qtd = np.bincount(self.cod_funcionario[posicoes], minlength=len(self.funcionarios))
+        return serie[qtd > 0].nlargest(n)
+
+    def _media_dia_semana(self, chave):
+        """Média de horas por funcionário × dia da semana (formato longo)"""
+        posicoes = self.posicoes(chave)
+        codigos = self.cod_funcionario[posicoes] * 7 + self.dia_semana[posicoes]
+        n = len(self.funcionarios) * 7
+        qtd = np.bincount(codigos, minlength=n)
+        total = np.bincount(codigos, weights=self.duracao[posicoes], minlength=n)
+        presentes = np.flatnonzero(qtd)
+        return pd.DataFrame({
+            'dia_semana': np.asarray(NOMES_DIAS)[presentes % 7],
+            's_nm_recurso': self.funcionarios[presentes // 7],
+            'duracao_horas': total[presentes] / qtd[presentes]
+        })
+
+    def _extras_por_funcionario(self, chave):
+        """Horas extras, pagas e trabalhadas dos dias com extra, por funcionário"""
+        posicoes = self.posicoes(chave)
+        posicoes = posicoes[self.extras[posicoes] > 0]
+        n = len(self.funcionarios)
+        codigos = self.cod_funcionario[posicoes]
+        qtd = np.bincount(codigos, minlength=n)
+        resultado = pd.DataFrame({
+            'horas_extras': np.bincount(codigos, weights=self.extras[posicoes], minlength=n),
+            'horas_pagas': np.bincount(codigos, weights=self.pagas[posicoes], minlength=n),
+            'duracao_horas': np.bincount(codigos, weights=self.duracao[posicoes], minlength=n)
+        }, index=pd.Index(self.funcionarios, name='s_nm_recurso'))[qtd > 0]
+        return resultado.sort_values('horas_extras', ascending=False)
+
+    def _extras_por_data(self, chave):
+        """Total de horas extras e funcionários com extra em cada dia"""
+        posicoes = self.posicoes(chave)
+        posicoes = posicoes[self.extras[posicoes] > 0]
+        if len(posicoes) == 0:
+            return extras_por_data_vazio()
+
+        dias, primeiro = self._dias(posicoes)
+        n = int(dias[-1]) + 1
+        total = np.bincount(dias, weights=self.extras[posicoes], minlength=n)
+        pares = np.unique(dias * len(self.funcionarios) + self.cod_funcionario[posicoes])
+        funcionarios = np.bincount(pares // len(self.funcionarios), minlength=n)
+        presentes = np.flatnonzero(funcionarios)
+        return pd.DataFrame({
+            'data': pd.to_datetime((presentes + primeiro).astype('datetime64[D]')),
+            'horas_extras': total[presentes],
+            's_nm_recurso': funcionarios[presentes]
+        })
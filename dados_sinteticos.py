@@ -0,0 +1,240 @@
+"""
+🧪 DADOS SINTÉTICOS - Snapshots de apontamentos para testes de desempenho
+Gera apontamentos com o mesmo esquema de 29 colunas dos snapshots
+dados_com_duracao_*.csv: vários apontamentos por jornada, trabalho em fim de
+semana, faltas, jornadas curtas e longas e textos com mojibake (UTF-8 lido como
+latin-1), como nos arquivos exportados do sistema de origem. Tudo vetorizado em
+NumPy, então 10 milhões de linhas saem em segundos (a gravação do CSV domina).
+
+Uso:
+    python dados_sinteticos.py --linhas 1000000
+    python dados_sinteticos.py --funcionarios 200 --validadores 8 --dias 365 --saida /tmp/resultados
+"""
+
+import argparse
+import datetime
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import carregamento
+
+PASTA_SINTETICOS = os.path.join(carregamento.PASTA_RESULTADOS, "sinteticos")
+
+# Esquema dos snapshots (mesma ordem das colunas exportadas)
+COLUNAS_SNAPSHOT = [
+    's_id_apontamento', 's_ds_operacao', 's_nr_contrato', 's_nr_cpf', 's_id_recurso', 's_nm_recurso',
+    's_id_cargo', 's_ds_cargo', 'd_dt_data', 'd_dt_data_fim', 'd_dt_inicio_apontamento', 'd_dt_fim_apontamento',
+    'f_hr_hora_inicio', 'f_hr_hora_fim', 'n_fl_abatimento', 'b_fl_validado', 's_id_usuario_valida',
+    's_nm_usuario_valida', 's_id_usuario', 's_nm_usuario', 's_id_tipo_jornada', 's_ds_tipo_jornada',
+    's_id_divisao', 's_ds_divisao', 's_nm_sigla', 's_nm_cliente_operacional', 'dt_inicio', 'dt_fim',
+    'duracao_horas'
+]
+
+PRIMEIROS_NOMES = ['Ana', 'André', 'Bárbara', 'Bruno', 'Camilly', 'César', 'Débora', 'Edmilson', 'Elisângela',
+                   'Fábio', 'Flávia', 'Gustavo', 'Helena', 'Henrique', 'Inês', 'João', 'Júlia', 'Letícia',
+                   'Lúcio', 'Márcia', 'Mauro', 'Natália', 'Otávio', 'Patrícia', 'Renato', 'Rosiane', 'Sérgio',
+                   'Simone', 'Tânia', 'Vinícius']
+SOBRENOMES = ['Abud', 'Alves', 'Araújo', 'Barros', 'Cardoso', 'Conceição', 'Costa', 'Dias', 'Falcão',
+              'Gonçalves', 'Lenate', 'Lopes', 'Magalhães', 'Moraes', 'Nóbrega', 'Oliveira', 'Pereira',
+              'Ribeiro', 'Santana', 'Santos', 'Silva', 'Simões', 'Sousa', 'Tavares', 'Vieira']
+OPERACOES = ['Suporte Técnico e Atendimento ao Cliente', 'Análise de Processos', 'Reunião de Alinhamento',
+             'Gestão de Demandas', 'Documentação Técnica', 'Treinamento e Capacitação', 'Validação de Relatórios',
+             'Atendimento Presencial', 'Homologação de Sistemas', 'Planejamento Operacional']
+CARGOS = ['8246-Analista de Processos I', '8247-Analista de Processos II', '8310-Técnico de Operação',
+          '8402-Assistente Administrativo', '8515-Coordenador de Operação']
+DIVISOES = [('Coordenadoria de Operação Clientes I', 'COCA'), ('Coordenadoria de Operação Clientes III', 'COCB'),
+            ('Divisão de Suporte Técnico', 'DSTE'), ('Gerência de Atendimento', 'GATE')]
+CLIENTES = ['DIPOL', 'DETRAN', 'SEFAZ', 'PRODESP']
+
+# Perfis de jornada (dias úteis): probabilidade, média e desvio das horas trabalhadas
+PERFIS_JORNADA = [(0.70, 9.0, 0.35), (0.15, 5.5, 1.2), (0.15, 10.5, 0.9)]
+MEDIA_FIM_DE_SEMANA, DESVIO_FIM_DE_SEMANA = 5.0, 1.5
+
+
+def _mojibake(texto):
+    """Dupla codificação típica da exportação: 'Técnico' -> 'TÃ©cnico'"""
+    return texto.encode('utf-8').decode('latin-1')
+
+
+def _nomes(quantidade, deslocamento=0):
+    """Nomes completos distintos (nome + dois sobrenomes; sufixo numérico além das combinações)"""
+    n_primeiros, n_sobrenomes = len(PRIMEIROS_NOMES), len(SOBRENOMES)
+    combinacoes = n_primeiros * n_sobrenomes * n_sobrenomes
+    nomes = []
+    for i in range(deslocamento, deslocamento + quantidade):
+        meio = (i // n_primeiros) % n_sobrenomes
+        ultimo = (meio + 1 + i // (n_primeiros * n_sobrenomes)) % n_sobrenomes  # Deslocado: evita "Abud Abud"
+        nome = f"{PRIMEIROS_NOMES[i % n_primeiros]} {SOBRENOMES[meio]} {SOBRENOMES[ultimo]}"
+        nomes.append(nome if i < combinacoes else f"{nome} {i // combinacoes + 1}")
+    return nomes
+
+
+def _coluna_texto(valores, codigos, rng, prob_mojibake):
+    """Categoria com os textos do pool; parte das linhas recebe a versão com mojibake"""
+    valores = list(valores)
+    corrompidos = [_mojibake(valor) for valor in valores]
+    categorias = pd.Index(valores + corrompidos).unique()
+    originais = categorias.get_indexer(valores)
+    trocados = categorias.get_indexer(corrompidos)
+    trocar = rng.random(len(codigos)) < prob_mojibake
+    return pd.Categorical.from_codes(np.where(trocar, trocados[codigos], originais[codigos]), categorias)
+
+
+def _categoria(valores, codigos):
+    return pd.Categorical.from_codes(codigos, pd.Index(valores))
+
+
+def estimar_funcionarios(linhas, dias, max_apontamentos_dia, prob_fim_de_semana, prob_ausencia):
+    """Funcionários necessários para chegar a `linhas` apontamentos (com folga de 5%)"""
+    jornadas = dias * (5 / 7 * (1 - prob_ausencia) + 2 / 7 * prob_fim_de_semana)
+    por_funcionario = jornadas * (1 + max_apontamentos_dia) / 2
+    return max(1, math.ceil(linhas / max(por_funcionario, 1e-9) * 1.05))
+
+
+def gerar_apontamentos(linhas=None, funcionarios=None, validadores=None, dias=90, data_fim=None,
+                       max_apontamentos_dia=4, prob_fim_de_semana=0.1, prob_ausencia=0.05,
+                       prob_mojibake=0.5, semente=42):
+    """DataFrame de apontamentos sintéticos no esquema dos snapshots (ordenado por data)
+
+    Com `linhas`, o número de funcionários é estimado (se omitido) e o resultado
+    cortado exatamente nesse total; sem `linhas`, gera todas as jornadas dos
+    `funcionarios` (padrão 50) no período.
+    """
+    rng = np.random.default_rng(semente)
+    if funcionarios is None:
+        funcionarios = (50 if linhas is None else
+                        estimar_funcionarios(linhas, dias, max_apontamentos_dia, prob_fim_de_semana, prob_ausencia))
+    validadores = validadores or max(1, min(funcionarios, math.ceil(funcionarios / 15)))
+    data_fim = data_fim or datetime.date.today()
+    datas = pd.date_range(end=pd.Timestamp(data_fim), periods=dias, freq='D')
+
+    # Presença funcionário × dia: dias úteis menos faltas, fins de semana ocasionais
+    dia_util = np.asarray(datas.dayofweek < 5)[:, None]
+    sorteio = rng.random((dias, funcionarios))
+    presente = np.where(dia_util, sorteio >= prob_ausencia, sorteio < prob_fim_de_semana)
+    dia_jornada, func_jornada = np.nonzero(presente)  # Ordem dia -> funcionário (como o ORDER BY da origem)
+    n_jornadas = len(dia_jornada)
+    util_jornada = dia_util[dia_jornada, 0]
+
+    # Horas da jornada (arredondadas a 15 min) e início entre 07:00 e 10:00
+    perfil = rng.choice(len(PERFIS_JORNADA), size=n_jornadas, p=[p for p, _, _ in PERFIS_JORNADA])
+    medias = np.array([media for _, media, _ in PERFIS_JORNADA])[perfil]
+    desvios = np.array([desvio for _, _, desvio in PERFIS_JORNADA])[perfil]
+    horas = np.where(util_jornada, rng.normal(medias, desvios),
+                     rng.normal(MEDIA_FIM_DE_SEMANA, DESVIO_FIM_DE_SEMANA, n_jornadas))
+    minutos_jornada = (np.clip(np.round(horas * 4), 2, 56) * 15).astype('int64')
+    inicio_jornada = datas.to_numpy()[dia_jornada] + ((7 * 60 + rng.integers(0, 13, n_jornadas) * 15)
+                                                      .astype('timedelta64[m]'))
+
+    # Apontamentos da jornada: fatias consecutivas que somam a jornada inteira
+    por_jornada = rng.integers(1, max_apontamentos_dia + 1, n_jornadas)
+    jornada = np.repeat(np.arange(n_jornadas), por_jornada)
+    if linhas is not None:
+        jornada = jornada[:linhas]
+    ordem = np.arange(len(jornada)) - np.repeat(np.cumsum(por_jornada) - por_jornada, por_jornada)[:len(jornada)]
+    partes = por_jornada[jornada]
+    total = minutos_jornada[jornada]
+    inicio = inicio_jornada[jornada] + (total * ordem // partes).astype('timedelta64[m]')
+    fim = inicio_jornada[jornada] + (total * (ordem + 1) // partes).astype('timedelta64[m]')
+    n = len(jornada)
+
+    # Atributos fixos por funcionário e por validador
+    func = func_jornada[jornada]
+    validador_func = np.arange(funcionarios) % validadores
+    validador = validador_func[func]
+    divisao_validador = np.arange(validadores) % len(DIVISOES)
+    nomes_validadores = _nomes(validadores, deslocamento=len(PRIMEIROS_NOMES) * 7 + 3)
+    ids_validadores = np.arange(3000, 3000 + validadores)
+    cargo_func = rng.integers(0, len(CARGOS), funcionarios)
+    cpfs = rng.choice(10**11, funcionarios, replace=False)
+    data = datas.to_numpy()[dia_jornada[jornada]]
+    inicio_s, fim_s = pd.DatetimeIndex(inicio), pd.DatetimeIndex(fim)
+
+    df = pd.DataFrame({
+        's_id_apontamento': np.arange(4_000_000, 4_000_000 + n),
+        's_ds_operacao': _coluna_texto(OPERACOES, rng.integers(0, len(OPERACOES), n), rng, prob_mojibake),
+        's_nr_contrato': _categoria([f"E{5000000 + i:07d}" for i in range(funcionarios)], func),
+        's_nr_cpf': _categoria([f"{c // 10**8:03d}.{c // 10**5 % 1000:03d}.{c // 100 % 1000:03d}-{c % 100:02d}"
+                                for c in cpfs.tolist()], func),
+        's_id_recurso': 5000 + func,
+        's_nm_recurso': _coluna_texto(_nomes(funcionarios), func, rng, prob_mojibake),
+        's_id_cargo': 400 + cargo_func[func],
+        's_ds_cargo': _coluna_texto(CARGOS, cargo_func[func], rng, prob_mojibake),
+        'd_dt_data': data,
+        'd_dt_data_fim': data,
+        'd_dt_inicio_apontamento': inicio,
+        'd_dt_fim_apontamento': fim,
+        'f_hr_hora_inicio': inicio_s.hour.to_numpy('float64'),
+        'f_hr_hora_fim': fim_s.hour.to_numpy('float64'),
+        'n_fl_abatimento': np.ones(n),
+        'b_fl_validado': np.ones(n, dtype='int64'),
+        's_id_usuario_valida': ids_validadores[validador],
+        's_nm_usuario_valida': _coluna_texto(nomes_validadores, validador, rng, prob_mojibake),
+        's_id_usuario': ids_validadores[validador],
+        's_nm_usuario': _coluna_texto(nomes_validadores, validador, rng, prob_mojibake),
+        's_id_tipo_jornada': np.ones(n, dtype='int64'),
+        's_ds_tipo_jornada': _coluna_texto(['Padrão'], np.zeros(n, dtype='int64'), rng, prob_mojibake),
+        's_id_divisao': 360 + divisao_validador[validador],
+        's_ds_divisao': _coluna_texto([nome for nome, _ in DIVISOES], divisao_validador[validador], rng,
+                                      prob_mojibake),
+        's_nm_sigla': _categoria([sigla for _, sigla in DIVISOES], divisao_validador[validador]),
+        's_nm_cliente_operacional': _categoria(CLIENTES, divisao_validador[validador] % len(CLIENTES)),
+        'dt_inicio': inicio,
+        'dt_fim': fim,
+        'duracao_horas': (fim - inicio).astype('timedelta64[m]').astype('int64') / 60,
+    })
+    return df[COLUNAS_SNAPSHOT]
+
+
+def gravar_snapshot(df, pasta=PASTA_SINTETICOS, carimbo=None):
+    """Grava o CSV como os snapshots de origem (UTF-8 com BOM), com troca atômica"""
+    os.makedirs(pasta, exist_ok=True)
+    carimbo = carimbo or datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    destino = os.path.join(pasta, f"dados_com_duracao_{carimbo}.csv")
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    df.to_csv(temporario, index=False, encoding='utf-8-sig')
+    os.replace(temporario, destino)
+    return destino
+
+
+def _data(valor):
+    try:
+        return datetime.date.fromisoformat(valor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida (use AAAA-MM-DD): {valor}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snapshot sintético de apontamentos (esquema dos dados_com_duracao_*.csv)")
+    parser.add_argument('--linhas', type=int, help="Total de apontamentos (estima os funcionários se omitidos)")
+    parser.add_argument('--funcionarios', type=int, help="Funcionários (padrão: 50 ou o necessário para --linhas)")
+    parser.add_argument('--validadores', type=int, help="Validadores (padrão: 1 a cada 15 funcionários)")
+    parser.add_argument('--dias', type=int, default=90, help="Dias de histórico")
+    parser.add_argument('--fim', type=_data, help="Última data AAAA-MM-DD (padrão: hoje)")
+    parser.add_argument('--apontamentos-dia', type=int, default=4, help="Máximo de apontamentos por jornada")
+    parser.add_argument('--fim-de-semana', type=float, default=0.1, help="Probabilidade de trabalho no fim de semana")
+    parser.add_argument('--ausencia', type=float, default=0.05, help="Probabilidade de falta em dia útil")
+    parser.add_argument('--mojibake', type=float, default=0.5, help="Fração dos textos com dupla codificação")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', default=PASTA_SINTETICOS,
+                        help=f"Pasta do snapshot (padrão: {PASTA_SINTETICOS}; use resultados/ para abrir no dashboard)")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    df = gerar_apontamentos(args.linhas, args.funcionarios, args.validadores, args.dias, args.fim,
+                            args.apontamentos_dia, args.fim_de_semana, args.ausencia, args.mojibake, args.semente)
+    geracao = time.perf_counter() - inicio
+    destino = gravar_snapshot(df, args.saida)
+    print(f"✅ {len(df):,} apontamentos de {df['s_id_recurso'].nunique():,} funcionário(s) "
+          f"(geração {geracao:.1f}s, gravação {time.perf_counter() - inicio - geracao:.1f}s)")
+    print(f"📄 {destino}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
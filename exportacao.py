@@ -0,0 +1,183 @@
+"""
+📥 EXPORTAÇÃO - Arquivos dos dados filtrados gerados sob demanda
+Os arquivos são escritos em blocos direto no disco (sem montar o conteúdo
+inteiro em memória) e ficam em cache por chave de filtro até saírem da
+lista dos mais recentes. O XLSX é escrito em modo streaming do openpyxl e
+limitado a LIMITE_LINHAS_XLSX linhas (o máximo de uma planilha do Excel);
+recortes maiores devem sair em CSV ou Parquet.
+
+O download em si não é streaming: o Streamlit serve o arquivo a partir da
+memória do servidor. Com conteudo() passado como data sob demanda, os bytes
+só são lidos quando o usuário clica em baixar, e não a cada rerun.
+"""
+
+import glob
+import gzip
+import hashlib
+import os
+import threading
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import carregamento
+
+try:
+    import openpyxl
+    OPENPYXL_DISPONIVEL = True
+except ImportError:
+    OPENPYXL_DISPONIVEL = False
+
+PASTA_EXPORTACOES = os.path.join(carregamento.PASTA_CACHE, "exportacoes")
+TAMANHO_BLOCO = 50_000  # Linhas por bloco escrito
+MAX_EXPORTACOES = 20    # Arquivos mantidos em cache
+LIMITE_LINHAS_XLSX = 1_048_575  # Linhas de dados numa planilha do Excel (1.048.576 com o cabeçalho)
+
+FORMATOS = {
+    'csv': {'rotulo': '📄 CSV', 'extensao': '.csv', 'mime': 'text/csv'},
+    'csv.gz': {'rotulo': '🗜️ CSV compactado (gzip)', 'extensao': '.csv.gz', 'mime': 'application/gzip'},
+    'parquet': {'rotulo': '🧱 Parquet', 'extensao': '.parquet', 'mime': 'application/vnd.apache.parquet'},
+    'xlsx': {'rotulo': '📊 Excel (XLSX)', 'extensao': '.xlsx',
+             'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'},
+}
+
+
+def formatos_disponiveis():
+    """Formatos oferecidos (XLSX só com openpyxl instalado)"""
+    return [formato for formato in FORMATOS if formato != 'xlsx' or OPENPYXL_DISPONIVEL]
+
+
+def caminho_exportacao(chave, formato, pasta=PASTA_EXPORTACOES):
+    """Arquivo correspondente à chave de filtro e ao formato"""
+    assinatura = hashlib.sha1(repr(chave).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(pasta, f"exportacao_{assinatura}{FORMATOS[formato]['extensao']}")
+
+
+def localizar(chave, formato, pasta=PASTA_EXPORTACOES):
+    """Caminho do arquivo já gerado para a chave, ou None"""
+    caminho = caminho_exportacao(chave, formato, pasta)
+    return caminho if os.path.exists(caminho) else None
+
+
+def abrir(caminho):
+    """(arquivo binário aberto, tamanho em bytes), ou None se o arquivo não existe mais
+
+    A limpeza de outra sessão pode remover o arquivo entre localizar() e a
+    leitura; depois de aberto ele continua legível até ser fechado.
+    """
+    if caminho is None:
+        return None
+    try:
+        arquivo = open(caminho, 'rb')
+    except FileNotFoundError:
+        return None
+    return arquivo, os.fstat(arquivo.fileno()).st_size
+
+
+def conteudo(df, chave, formato, pasta=PASTA_EXPORTACOES):
+    """Bytes do arquivo da chave para o download (gerado de novo se a limpeza o removeu)"""
+    aberto = abrir(exportar(df, chave, formato, pasta))
+    if aberto is None:  # Removido entre exportar() e a abertura
+        aberto = abrir(exportar(df, chave, formato, pasta))
+    arquivo, _ = aberto
+    with arquivo:
+        return arquivo.read()
+
+
+def _blocos(df, tamanho_bloco):
+    for inicio in range(0, max(len(df), 1), tamanho_bloco):
+        yield inicio, df.iloc[inicio:inicio + tamanho_bloco]
+
+
+def _escrever_csv(df, arquivo, tamanho_bloco):
+    for inicio, bloco in _blocos(df, tamanho_bloco):
+        bloco.to_csv(arquivo, index=False, header=inicio == 0)
+
+
+def _escrever_parquet(df, destino, tamanho_bloco):
+    escritor = None
+    try:
+        for _, bloco in _blocos(df, tamanho_bloco):
+            tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(destino, tabela.schema)
+            escritor.write_table(tabela)  # Um row group por bloco
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+def _escrever_xlsx(df, destino, tamanho_bloco):
+    if len(df) > LIMITE_LINHAS_XLSX:
+        raise ValueError(f"XLSX comporta até {LIMITE_LINHAS_XLSX:,} linhas ({len(df):,} no recorte): "
+                         "use CSV ou Parquet")
+    livro = openpyxl.Workbook(write_only=True)  # Linhas vão para o disco à medida que são escritas
+    planilha = livro.create_sheet()
+    planilha.append([str(coluna) for coluna in df.columns])
+    for _, bloco in _blocos(df, tamanho_bloco):
+        bloco = bloco.astype(object).where(bloco.notna(), None)  # NaN/NaT viram células vazias
+        for linha in bloco.itertuples(index=False, name=None):
+            planilha.append(linha)
+    livro.save(destino)
+
+
+def _escrever(df, destino, formato, tamanho_bloco):
+    if formato == 'csv':
+        with open(destino, 'w', encoding='utf-8-sig', newline='') as arquivo:
+            _escrever_csv(df, arquivo, tamanho_bloco)
+    elif formato == 'csv.gz':
+        with gzip.open(destino, 'wt', encoding='utf-8-sig', newline='') as arquivo:
+            _escrever_csv(df, arquivo, tamanho_bloco)
+    elif formato == 'parquet':
+        _escrever_parquet(df, destino, tamanho_bloco)
+    elif formato == 'xlsx':
+        if not OPENPYXL_DISPONIVEL:
+            raise ValueError("Exportação XLSX requer o pacote openpyxl")
+        _escrever_xlsx(df, destino, tamanho_bloco)
+    else:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+
+
+def _mtime(caminho):
+    try:
+        return os.path.getmtime(caminho)
+    except OSError:
+        return 0.0
+
+
+def _limpar_antigos(pasta, manter=MAX_EXPORTACOES):
+    # Só arquivos finais: os .tmp de outras sessões ainda em escrita ficam fora
+    arquivos = [arquivo for formato in FORMATOS
+                for arquivo in glob.glob(os.path.join(pasta, f"exportacao_*{FORMATOS[formato]['extensao']}"))]
+    for antigo in sorted(arquivos, key=_mtime, reverse=True)[manter:]:
+        try:
+            os.remove(antigo)
+        except OSError:
+            pass
+
+
+def gravar(df, destino, formato, tamanho_bloco=TAMANHO_BLOCO):
+    """Escreve df em destino no formato pedido, em blocos e com troca atômica"""
+    pasta = os.path.dirname(destino)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        _escrever(df, temporario, formato, tamanho_bloco)
+        os.replace(temporario, destino)  # Troca atômica: nunca expõe arquivo parcial
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return destino
+
+
+def exportar(df, chave, formato, pasta=PASTA_EXPORTACOES, tamanho_bloco=TAMANHO_BLOCO):
+    """Gera (ou reaproveita) o arquivo da chave de filtro e retorna o caminho"""
+    destino = caminho_exportacao(chave, formato, pasta)
+    if os.path.exists(destino):
+        os.utime(destino)  # Mantém entre os mais recentes
+        return destino
+
+    gravar(df, destino, formato, tamanho_bloco)
+    _limpar_antigos(pasta)
+    return destino
@@ -0,0 +1,185 @@
+"""
+🔧 FERRAMENTAS DO CHAT - Motor de consultas local exposto ao modelo
+O modelo recebe só o resumo do recorte no prompt e pede o resto sob demanda:
+totais por funcionário, ranking de horas extras, série diária e jornadas fora
+do padrão. As respostas saem do motor de consultas ativo (cubo em memória ou
+DuckDB, com os mesmos recortes memorizados das abas) e voltam como JSON
+compacto, com no máximo LIMITE_LINHAS linhas.
+"""
+
+import datetime
+import json
+
+import numpy as np
+
+import chat_ia
+
+LIMITE_LINHAS = 25      # Linhas por resposta (mantém o diálogo pequeno)
+LIMITE_SERIE = 92       # Dias na série diária (cobre o horizonte do motor em memória)
+FATOR_IQR = 1.5         # Cercas de Tukey: Q1 - 1,5·IQR e Q3 + 1,5·IQR
+LIMITE_ZSCORE = 2.5     # |z| a partir do qual a jornada é outlier
+
+ORDENACOES_FUNCIONARIOS = {
+    'total': 'Total_h',
+    'media': 'Média_h',
+    'abaixo': 'Abaixo_Padrão',
+    'maximo': 'Max_h',
+}
+
+
+def _funcao(nome, descricao, propriedades):
+    return {
+        'type': 'function',
+        'function': {
+            'name': nome,
+            'description': descricao,
+            'parameters': {'type': 'object', 'properties': propriedades, 'required': []},
+        },
+    }
+
+
+_LIMITE = {'type': 'integer', 'minimum': 1, 'maximum': LIMITE_LINHAS,
+           'description': f"Máximo de linhas (padrão 10, até {LIMITE_LINHAS})"}
+
+ESQUEMAS = [
+    _funcao('totais_funcionarios',
+            "Totais por funcionário no recorte: jornadas, horas totais, média, mínimo, máximo, "
+            "dias abaixo da faixa e status. Filtra por parte do nome se 'funcionario' for informado.",
+            {'funcionario': {'type': 'string', 'description': "Nome (ou parte) do funcionário"},
+             'ordenar_por': {'type': 'string', 'enum': list(ORDENACOES_FUNCIONARIOS),
+                             'description': "Critério de ordenação decrescente (padrão 'total')"},
+             'limite': _LIMITE}),
+    _funcao('ranking_horas_extras',
+            "Funcionários com mais horas extras no recorte, com horas pagas e horas trabalhadas "
+            "nos dias com extra.",
+            {'limite': _LIMITE}),
+    _funcao('serie_diaria',
+            "Série por dia do recorte: jornadas, horas totais e médias, contagem por classificação "
+            "e horas extras. Use para tendências e picos.",
+            {'data_inicio': {'type': 'string', 'description': "AAAA-MM-DD (opcional)"},
+             'data_fim': {'type': 'string', 'description': "AAAA-MM-DD (opcional)"}}),
+    _funcao('outliers',
+            "Jornadas com duração fora do padrão do recorte (cercas IQR ou z-score), "
+            "da mais para a menos discrepante.",
+            {'metodo': {'type': 'string', 'enum': ['iqr', 'zscore'], 'description': "Padrão 'iqr'"},
+             'limite': _LIMITE}),
+]
+
+
+def _valor(valor):
+    """Escalares NumPy/pandas -> tipos JSON (NaN/inf viram null, horas com 2 casas)"""
+    if isinstance(valor, (bool, np.bool_)):
+        return bool(valor)
+    if isinstance(valor, (int, np.integer)):
+        return int(valor)
+    if isinstance(valor, (float, np.floating)):
+        return round(float(valor), 2) if np.isfinite(valor) else None
+    if isinstance(valor, (datetime.date, np.datetime64)):
+        return str(valor)[:10]
+    return valor
+
+
+def _linhas(df, limite):
+    registros = df.head(limite).reset_index().to_dict(orient='records')
+    return [{coluna: _valor(valor) for coluna, valor in linha.items()} for linha in registros]
+
+
+def _limite(valor, padrao=10):
+    try:
+        return min(max(int(valor), 1), LIMITE_LINHAS)
+    except (TypeError, ValueError):
+        return padrao
+
+
+class MotorConsultas:
+    """Consultas do chat sobre o cubo, presas ao recorte (filtro, faixa e tolerância) atual"""
+
+    esquemas = ESQUEMAS
+
+    def __init__(self, cubo, chave, faixa_referencia, tolerancia):
+        self.cubo = cubo
+        self.chave = chave
+        self.faixa_referencia = faixa_referencia
+        self.tolerancia = tolerancia
+
+    def executar(self, nome, argumentos):
+        """Executa a ferramenta pedida pelo modelo; argumentos em JSON, resultado em JSON"""
+        try:
+            parametros = json.loads(argumentos or '{}')
+            if nome not in {esquema['function']['name'] for esquema in ESQUEMAS}:
+                raise ValueError(f"Ferramenta desconhecida: {nome}")
+            resultado = getattr(self, nome)(**parametros)
+        except Exception as e:
+            resultado = {'erro': str(e)}
+        return json.dumps(resultado, ensure_ascii=False, default=_valor)
+
+    # ==================== CONSULTAS ====================
+    def totais_funcionarios(self, funcionario=None, ordenar_por='total', limite=10):
+        df = self.cubo.por_funcionario(self.chave, self.faixa_referencia, self.tolerancia)
+        if funcionario:
+            procurado = chat_ia.normalizar_pergunta(funcionario)
+            nomes = df.index.map(lambda nome: procurado in chat_ia.normalizar_pergunta(nome))
+            df = df[np.asarray(nomes, dtype=bool)]
+        df = df.sort_values(ORDENACOES_FUNCIONARIOS.get(ordenar_por, 'Total_h'), ascending=False)
+        return {'funcionarios': len(df), 'linhas': _linhas(df, _limite(limite))}
+
+    def ranking_horas_extras(self, limite=10):
+        df = self.cubo.extras_por_funcionario(self.chave)
+        return {
+            'funcionarios_com_extras': len(df),
+            'total_horas_extras': _valor(df['horas_extras'].sum()),
+            'linhas': _linhas(df, _limite(limite)),
+        }
+
+    def serie_diaria(self, data_inicio=None, data_fim=None):
+        df = self.cubo.por_dia(self.chave, self.faixa_referencia, self.tolerancia)
+        extras = self.cubo.extras_por_data(self.chave)
+        if extras.empty:  # Recorte sem nenhum dia com extra
+            df = df.assign(horas_extras=0.0)
+        else:
+            df = df.assign(horas_extras=extras.set_index(extras['data'].dt.date)['horas_extras']
+                           .reindex(df.index, fill_value=0.0).to_numpy())
+        datas = df.index.map(str)
+        if data_inicio:
+            df = df[np.asarray(datas >= str(data_inicio)[:10])]
+            datas = df.index.map(str)
+        if data_fim:
+            df = df[np.asarray(datas <= str(data_fim)[:10])]
+        return {'dias': len(df), 'linhas': _linhas(df, LIMITE_SERIE)}
+
+    def outliers(self, metodo='iqr', limite=10):
+        jornadas = self.cubo.jornadas(self.chave, self.faixa_referencia, self.tolerancia)
+        duracao = jornadas['duracao_horas'].to_numpy(dtype='float64')
+        if len(duracao) < 4:
+            return {'metodo': metodo, 'outliers': 0, 'linhas': []}
+
+        if metodo == 'zscore':
+            desvio = duracao.std()
+            desvios = (duracao - duracao.mean()) / desvio if desvio > 0 else np.zeros_like(duracao)
+            fora = np.abs(desvios) >= LIMITE_ZSCORE
+            criterio = {'media': duracao.mean(), 'desvio_padrao': desvio, 'limite_z': LIMITE_ZSCORE}
+        else:
+            metodo = 'iqr'
+            q1, q3 = np.percentile(duracao, [25, 75])
+            inferior, superior = q1 - FATOR_IQR * (q3 - q1), q3 + FATOR_IQR * (q3 - q1)
+            desvios = np.where(duracao < inferior, inferior - duracao, duracao - superior)
+            fora = (duracao < inferior) | (duracao > superior)
+            criterio = {'q1': q1, 'q3': q3, 'limite_inferior': inferior, 'limite_superior': superior}
+
+        indices = np.flatnonzero(fora)
+        indices = indices[np.argsort(-np.abs(desvios[indices]), kind='stable')][:_limite(limite)]
+        selecionadas = jornadas.iloc[indices]
+        linhas = [
+            {
+                'funcionario': str(funcionario),
+                'data': _valor(data.date()),
+                'duracao_horas': _valor(horas),
+                'horas_extras': _valor(extra),
+                'classificacao': str(classe),
+            }
+            for funcionario, data, horas, extra, classe in zip(
+                selecionadas['s_nm_recurso'], selecionadas['data'], selecionadas['duracao_horas'],
+                selecionadas['horas_extras'], selecionadas['classificacao'])
+        ]
+        return {'metodo': metodo, 'criterio': {k: _valor(v) for k, v in criterio.items()},
+                'outliers': int(fora.sum()), 'linhas': linhas}
@@ -0,0 +1,269 @@
+"""
+📈 GRÁFICOS - Figuras das abas com cache por recorte e modo para muitos dados
+As figuras são montadas a partir das agregações do cubo e guardadas por chave
+de recorte (versão dos dados + filtros + faixa): o mesmo recorte reaproveita a
+figura entre reruns e sessões. Séries acima do orçamento de pontos usam traços
+WebGL e são reduzidas no servidor por LTTB (Largest-Triangle-Three-Buckets).
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+ORCAMENTO_PONTOS = int(os.getenv("DASHBOARD_GRAFICOS_PONTOS", "1000"))  # Pontos por série; 0: sem redução
+LIMITE_BARRAS = int(os.getenv("DASHBOARD_GRAFICOS_BARRAS", "50"))      # Barras mantidas em equipes grandes
+CACHE_CAPACIDADE = int(os.getenv("DASHBOARD_GRAFICOS_CACHE", "128"))   # Figuras em memória no processo
+
+CORES_CLASSIFICACAO = {
+    'Abaixo': '#ffc107',
+    'Normal': '#28a745',
+    'Acima': '#dc3545'
+}
+
+
+# ==================== REDUÇÃO DE SÉRIES ====================
+def excede_orcamento(n_pontos, orcamento=None):
+    orcamento = ORCAMENTO_PONTOS if orcamento is None else orcamento
+    return bool(orcamento) and n_pontos > orcamento
+
+
+def _numerico(valores):
+    valores = np.asarray(valores)
+    if valores.dtype == object and pd.api.types.infer_dtype(valores) in ('date', 'datetime'):
+        valores = pd.to_datetime(valores).to_numpy()  # datetime.date das séries por dia
+    if np.issubdtype(valores.dtype, np.datetime64):
+        return valores.astype('datetime64[ns]').astype('int64').astype('float64')
+    return valores.astype('float64')
+
+
+def lttb(x, y, n_saida):
+    """Índices (ordenados) dos n_saida pontos que preservam a forma da série
+
+    O primeiro e o último ponto são mantidos; os demais são divididos em
+    n_saida - 2 baldes e de cada um fica o ponto que forma o maior triângulo
+    com o ponto escolhido no balde anterior e a média do balde seguinte.
+    """
+    n = len(y)
+    if n_saida >= n or n_saida < 3:
+        return np.arange(n)
+    x = _numerico(x)
+    y = _numerico(y)
+
+    bordas = np.linspace(1, n - 1, n_saida - 1).astype(np.int64)
+    indices = np.empty(n_saida, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    anterior = 0
+    for balde in range(n_saida - 2):
+        inicio, fim = bordas[balde], bordas[balde + 1]
+        proximo_fim = bordas[balde + 2] if balde + 2 < len(bordas) else n
+        media_x = x[fim:proximo_fim].mean()
+        media_y = y[fim:proximo_fim].mean()
+        areas = np.abs((x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+                       - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior]))
+        anterior = inicio + int(np.argmax(areas))
+        indices[balde + 1] = anterior
+    return indices
+
+
+def reduzir_serie(df, x, y, orcamento=None, grupo=None):
+    """Série (ou uma série por grupo) limitada ao orçamento de pontos, ordenada por x
+
+    Devolve o DataFrame reduzido e o número de pontos original.
+    """
+    orcamento = ORCAMENTO_PONTOS if orcamento is None else orcamento
+    n_original = len(df)
+    df = df.sort_values(x, kind='stable')
+    if not orcamento:
+        return df, n_original
+
+    partes = [df] if grupo is None else [parte for _, parte in df.groupby(grupo, observed=True, sort=False)]
+    reduzidas = [
+        parte.iloc[lttb(parte[x].to_numpy(), parte[y].to_numpy(), orcamento)] if len(parte) > orcamento else parte
+        for parte in partes
+    ]
+    reduzido = reduzidas[0] if len(reduzidas) == 1 else pd.concat(reduzidas)
+    return reduzido, n_original
+
+
+def _titulo(titulo, n_exibido, n_original, unidade='pontos (LTTB)'):
+    if n_exibido >= n_original:
+        return titulo
+    return f"{titulo} · {n_exibido:,} de {n_original:,} {unidade}"
+
+
+# ==================== FIGURAS ====================
+# Cada função devolve None quando não há dados no recorte.
+
+def distribuicao(distrib, faixa_referencia):
+    """Pizza Abaixo/Normal/Acima"""
+    if distrib.sum() == 0:
+        return None
+    return px.pie(
+        values=distrib.values,
+        names=distrib.index,
+        title=f"Referência: {faixa_referencia:g}h",
+        color=distrib.index,
+        color_discrete_map=CORES_CLASSIFICACAO
+    )
+
+
+def top_funcionarios(top_func):
+    """Barras horizontais do total de horas (top 10)"""
+    if len(top_func) == 0:
+        return None
+    return px.bar(
+        x=top_func.values,
+        y=top_func.index,
+        orientation='h',
+        title="Top 10 Funcionários",
+        labels={'x': 'Horas', 'y': 'Funcionário'},
+        color=top_func.values,
+        color_continuous_scale='Blues'
+    )
+
+
+def evolucao_temporal(temp):
+    """Linhas de jornadas por dia, uma por classificação"""
+    if len(temp) == 0:
+        return None
+    grande = excede_orcamento(temp.groupby('classificacao', observed=True).size().max())
+    exibido, n_original = reduzir_serie(temp, 'data', 'count', grupo='classificacao') if grande else (temp, len(temp))
+    return px.line(
+        exibido,
+        x='data',
+        y='count',
+        color='classificacao',
+        title=_titulo("Apontamentos por Dia e Classificação", len(exibido), n_original),
+        color_discrete_map=CORES_CLASSIFICACAO,
+        render_mode='webgl' if grande else 'auto'
+    )
+
+
+def padrao_semanal(heatmap_pivot):
+    """Mapa de calor da média de horas por dia da semana"""
+    if heatmap_pivot.empty:
+        return None
+    return px.imshow(
+        heatmap_pivot,
+        title="Média de Horas por Dia da Semana (Top 10)",
+        labels=dict(x="Dia da Semana", y="Funcionário", color="Horas"),
+        color_continuous_scale="RdYlGn"
+    )
+
+
+def evolucao_pessoa(analise_diaria, faixa_referencia, funcionario):
+    """Horas por dia do funcionário contra a meta"""
+    if len(analise_diaria) == 0:
+        return None
+    grande = excede_orcamento(len(analise_diaria))
+    exibido, n_original = reduzir_serie(analise_diaria, 'Data', 'Total_h') if grande else (analise_diaria, len(analise_diaria))
+    Traco = go.Scattergl if grande else go.Scatter
+
+    fig = go.Figure()
+
+    # Linha de horas trabalhadas
+    fig.add_trace(Traco(
+        x=exibido['Data'],
+        y=exibido['Total_h'],
+        mode='lines' if grande else 'lines+markers',
+        name='Horas Trabalhadas',
+        line=dict(color='#1f77b4', width=3),
+        marker=dict(size=8)
+    ))
+
+    # Linha de referência
+    fig.add_trace(Traco(
+        x=exibido['Data'],
+        y=[faixa_referencia] * len(exibido),
+        mode='lines',
+        name=f'Meta ({faixa_referencia:g}h)',
+        line=dict(color='green', width=2, dash='dash')
+    ))
+
+    fig.update_layout(
+        title=_titulo(f"Evolução Diária - {funcionario}", len(exibido), n_original),
+        xaxis_title="Data",
+        yaxis_title="Horas",
+        hovermode='x unified',
+        height=400
+    )
+    return fig
+
+
+def extras_por_funcionario(funcionarios_extras, limite=None):
+    """Barras das horas extras por funcionário; equipes grandes mostram só as maiores"""
+    if len(funcionarios_extras) == 0:
+        return None
+    limite = LIMITE_BARRAS if limite is None else limite
+    n_original = len(funcionarios_extras)
+    if limite and n_original > limite:
+        funcionarios_extras = funcionarios_extras.nlargest(limite, 'horas_extras')
+    fig = px.bar(
+        funcionarios_extras.reset_index(),
+        x='s_nm_recurso',
+        y='horas_extras',
+        title=_titulo("Horas Extras por Funcionário", len(funcionarios_extras), n_original, 'funcionários (maiores)'),
+        labels={'s_nm_recurso': 'Funcionário', 'horas_extras': 'Horas Extras'},
+        color='horas_extras',
+        color_continuous_scale='Reds'
+    )
+    fig.update_layout(xaxis_tickangle=-45)
+    return fig
+
+
+def evolucao_extras(horas_extras_tempo):
+    """Linha do total de horas extras por data"""
+    if len(horas_extras_tempo) == 0:
+        return None
+    grande = excede_orcamento(len(horas_extras_tempo))
+    exibido, n_original = (reduzir_serie(horas_extras_tempo, 'data', 'horas_extras') if grande
+                           else (horas_extras_tempo, len(horas_extras_tempo)))
+    return px.line(
+        exibido,
+        x='data',
+        y='horas_extras',
+        title=_titulo("Evolução das Horas Extras por Data", len(exibido), n_original),
+        labels={'data': 'Data', 'horas_extras': 'Total de Horas Extras'},
+        render_mode='webgl' if grande else 'auto'
+    )
+
+
+# ==================== CACHE DE FIGURAS ====================
+class CacheFiguras:
+    """LRU de figuras por chave de recorte, compartilhado entre sessões
+
+    As figuras guardadas são somente leitura: quem exibe não deve alterá-las.
+    """
+
+    def __init__(self, capacidade=CACHE_CAPACIDADE):
+        self.capacidade = capacidade
+        self._figuras = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+
+    def obter(self, chave, construir):
+        """(figura, acerto): a figura em cache ou a construída agora por construir()"""
+        with self._trava:
+            if chave in self._figuras:
+                self._figuras.move_to_end(chave)
+                self.acertos += 1
+                return self._figuras[chave], True
+            self.faltas += 1
+
+        # Construção fora da trava: sessões com recortes diferentes não se bloqueiam
+        figura = construir()
+        with self._trava:
+            self._figuras[chave] = figura
+            self._figuras.move_to_end(chave)
+            while len(self._figuras) > self.capacidade:
+                self._figuras.popitem(last=False)
+        return figura, False
+
+    def __len__(self):
+        return len(self._figuras)
@@ -0,0 +1,247 @@
+"""
+🛢️ INGESTÃO SQL - Snapshots de apontamentos direto do banco
+Lê os apontamentos de uma fonte DB-API (SQL Server via pyodbc ou SQLite) em
+janelas de datas filtradas no servidor e em lotes (fetchmany), calcula
+duracao_horas e grava os snapshots dados_com_duracao_*.csv lidos pelo
+carregador, bloco a bloco, sem montar a tabela inteira em memória.
+
+Com a ingestão incremental ativa (DASHBOARD_INGESTAO_INCREMENTAL=1) o período,
+estendido a meses inteiros, é gravado em um snapshot por mês (mesmo vazio, para
+que remoções na origem cheguem à base) e a base local só incorpora o que mudou,
+então uma atualização custa proporcionalmente ao intervalo pedido, não à tabela toda.
+
+Uso:
+    python ingestao_sql.py --inicio 2025-09-01 --fim 2025-09-30
+    python ingestao_sql.py --conexao "DRIVER={ODBC Driver 18 for SQL Server};SERVER=...;DATABASE=..."
+    python ingestao_sql.py --criar-sqlite resultados/apontamentos.db   # fonte local a partir do último snapshot
+"""
+
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import time
+
+import pandas as pd
+
+import carregamento
+
+try:
+    import pyodbc
+    PYODBC_DISPONIVEL = True
+    ERROS_BANCO = (sqlite3.Error, pyodbc.Error)
+except ImportError:
+    PYODBC_DISPONIVEL = False
+    ERROS_BANCO = (sqlite3.Error,)
+
+CONEXAO = os.getenv("DASHBOARD_SQL_CONEXAO", "sqlite:///resultados/apontamentos.db")
+TABELA = os.getenv("DASHBOARD_SQL_TABELA", "apontamentos")
+JANELA_DIAS = 7        # Dias por consulta (cada janela é um SELECT filtrado por data)
+TAMANHO_LOTE = 10_000  # Linhas por fetchmany
+DIAS_PADRAO = 90       # Período quando --inicio não é informado
+
+# Colunas lidas da fonte (as exigidas pelo carregador + id para a base incremental)
+COLUNAS_FONTE = ['s_id_apontamento', 's_ds_operacao', 's_nm_recurso', 's_nm_usuario_valida', 'd_dt_data',
+                 'd_dt_inicio_apontamento', 'd_dt_fim_apontamento']
+COLUNAS_SNAPSHOT = COLUNAS_FONTE + ['duracao_horas']
+
+CONSULTA = """
+SELECT {colunas}
+FROM {tabela}
+WHERE d_dt_data >= ? AND d_dt_data < ?
+ORDER BY d_dt_data, s_id_apontamento
+"""
+
+# SQLite guarda datas como texto ISO; o adaptador padrão de date foi descontinuado no Python 3.12
+sqlite3.register_adapter(datetime.date, datetime.date.isoformat)
+
+
+def conectar(conexao=CONEXAO):
+    """Conexão DB-API: 'sqlite:///arquivo.db' ou string ODBC (requer pyodbc)"""
+    if conexao.startswith('sqlite:///'):
+        return sqlite3.connect(conexao[len('sqlite:///'):])
+    if not PYODBC_DISPONIVEL:
+        raise ValueError("Conexão ODBC requer o pacote pyodbc")
+    return pyodbc.connect(conexao)
+
+
+def janelas(data_inicio, data_fim, dias=JANELA_DIAS):
+    """Intervalos [início, fim) de até `dias` dias, sem atravessar a virada do mês"""
+    atual = data_inicio
+    while atual <= data_fim:
+        proximo_mes = (atual.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+        fim = min(atual + datetime.timedelta(days=dias), proximo_mes, data_fim + datetime.timedelta(days=1))
+        yield atual, fim
+        atual = fim
+
+
+def ler_janela(cursor, data_inicio, data_fim, tabela=TABELA, tamanho_lote=TAMANHO_LOTE):
+    """Lotes (DataFrames) dos apontamentos da janela, lidos com fetchmany"""
+    consulta = CONSULTA.format(colunas=', '.join(COLUNAS_FONTE), tabela=tabela)
+    cursor.execute(consulta, (data_inicio, data_fim))
+    colunas = [descricao[0] for descricao in cursor.description]
+    while True:
+        linhas = cursor.fetchmany(tamanho_lote)
+        if not linhas:
+            break
+        yield pd.DataFrame.from_records([tuple(linha) for linha in linhas], columns=colunas)
+
+
+def calcular_duracao(lote):
+    """Converte datas e calcula duracao_horas (fim - início); durações negativas ficam vazias"""
+    inicio = pd.to_datetime(lote['d_dt_inicio_apontamento'], errors='coerce')
+    fim = pd.to_datetime(lote['d_dt_fim_apontamento'], errors='coerce')
+    duracao = (fim - inicio).dt.total_seconds() / 3600
+    return lote.assign(
+        d_dt_data=pd.to_datetime(lote['d_dt_data'], errors='coerce').dt.strftime('%Y-%m-%d'),
+        d_dt_inicio_apontamento=inicio.dt.strftime('%Y-%m-%d %H:%M:%S'),
+        d_dt_fim_apontamento=fim.dt.strftime('%Y-%m-%d %H:%M:%S'),
+        duracao_horas=duracao.where(duracao >= 0)
+    )
+
+
+class _Snapshot:
+    """Arquivo de snapshot escrito em blocos e publicado com troca atômica ao fechar"""
+
+    def __init__(self, destino, publicar_vazio=False):
+        self.destino = destino
+        self.publicar_vazio = publicar_vazio  # Partição mensal: sem linhas vira arquivo só com cabeçalho
+        self.temporario = f"{destino}.{os.getpid()}.tmp"
+        self.arquivo = open(self.temporario, 'w', encoding='utf-8-sig', newline='')
+        self.linhas = 0
+
+    def escrever(self, lote):
+        lote.to_csv(self.arquivo, index=False, header=self.linhas == 0)
+        self.linhas += len(lote)
+
+    def fechar(self, publicar=True):
+        if publicar and not self.linhas and self.publicar_vazio:
+            pd.DataFrame(columns=COLUNAS_SNAPSHOT).to_csv(self.arquivo, index=False)
+        self.arquivo.close()
+        if publicar and (self.linhas or self.publicar_vazio):
+            os.replace(self.temporario, self.destino)
+        else:
+            os.remove(self.temporario)
+
+
+def ingerir(data_inicio, data_fim, conexao=CONEXAO, tabela=TABELA, pasta=carregamento.PASTA_RESULTADOS,
+            particionar=None, janela_dias=JANELA_DIAS, tamanho_lote=TAMANHO_LOTE):
+    """Gera os snapshots do período a partir da fonte SQL e retorna um resumo da carga"""
+    if particionar is None:
+        particionar = carregamento.MODO_INCREMENTAL
+    if particionar:
+        # Cada partição é a verdade do mês inteiro para a base incremental
+        data_inicio = data_inicio.replace(day=1)
+        data_fim = (data_fim.replace(day=1) + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+    os.makedirs(pasta, exist_ok=True)
+    carimbo = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    inicio = time.perf_counter()
+    resumo = {'linhas': 0, 'janelas': 0, 'arquivos': []}
+
+    def _novo_snapshot(sufixo=''):
+        return _Snapshot(os.path.join(pasta, f"dados_com_duracao_{carimbo}{sufixo}.csv"), publicar_vazio=bool(sufixo))
+
+    def _publicar(snapshot):
+        snapshot.fechar()
+        if snapshot.linhas or snapshot.publicar_vazio:
+            resumo['arquivos'].append(snapshot.destino)
+
+    conexao_db = conectar(conexao)
+    snapshot = None if particionar else _novo_snapshot()
+    mes_atual = None
+    try:
+        cursor = conexao_db.cursor()
+        for janela_inicio, janela_fim in janelas(data_inicio, data_fim, janela_dias):
+            resumo['janelas'] += 1
+            mes = janela_inicio.strftime('%Y-%m')
+            if particionar and mes != mes_atual:
+                # Janelas não atravessam meses: ao mudar de mês, publica a partição anterior
+                if snapshot is not None:
+                    _publicar(snapshot)
+                snapshot, mes_atual = _novo_snapshot(f"_p{mes}"), mes
+            for lote in ler_janela(cursor, janela_inicio, janela_fim, tabela, tamanho_lote):
+                snapshot.escrever(calcular_duracao(lote))
+                resumo['linhas'] += len(lote)
+        if snapshot is not None:
+            _publicar(snapshot)
+            snapshot = None
+    finally:
+        if snapshot is not None:
+            snapshot.fechar(publicar=False)  # Falha no meio: não deixa snapshot parcial
+        conexao_db.close()
+
+    resumo['segundos'] = round(time.perf_counter() - inicio, 3)
+    return resumo
+
+
+def criar_sqlite(caminho_db, caminho_csv=None, tabela=TABELA):
+    """Fonte SQLite local a partir de um snapshot (padrão: a carga mais recente), para testes"""
+    caminhos = [caminho_csv] if caminho_csv else carregamento.localizar_carga_mais_recente()
+    if not caminhos:
+        raise FileNotFoundError(f"Nenhum snapshot {carregamento.PADRAO_SNAPSHOT} para popular a base")
+    df = pd.concat([carregamento.ler_csv(caminho) for caminho in caminhos], ignore_index=True)
+    for coluna in carregamento.COLUNAS_TEXTO:
+        df[coluna] = carregamento.reparar_mojibake(df[coluna])
+    conexao_db = sqlite3.connect(caminho_db)
+    try:
+        df.drop(columns=['duracao_horas', 'dt_inicio', 'dt_fim'], errors='ignore').to_sql(
+            tabela, conexao_db, if_exists='replace', index=False)
+        conexao_db.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_data ON {tabela} (d_dt_data)")
+        conexao_db.commit()
+    finally:
+        conexao_db.close()
+    return len(df)
+
+
+def _data(valor):
+    try:
+        return datetime.date.fromisoformat(valor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida (use AAAA-MM-DD): {valor}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingestão dos apontamentos de uma fonte SQL para resultados/")
+    parser.add_argument('--inicio', type=_data, help=f"Data inicial AAAA-MM-DD (padrão: fim - {DIAS_PADRAO} dias)")
+    parser.add_argument('--fim', type=_data, help="Data final AAAA-MM-DD (padrão: hoje)")
+    parser.add_argument('--conexao', default=CONEXAO,
+                        help="sqlite:///arquivo.db ou string ODBC (padrão: DASHBOARD_SQL_CONEXAO)")
+    parser.add_argument('--tabela', default=TABELA, help="Tabela ou view de origem (padrão: DASHBOARD_SQL_TABELA)")
+    parser.add_argument('--saida', default=carregamento.PASTA_RESULTADOS, help="Pasta dos snapshots gerados")
+    parser.add_argument('--janela-dias', type=int, default=JANELA_DIAS, help="Dias por consulta")
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help="Linhas por fetchmany")
+    particao = parser.add_mutually_exclusive_group()
+    particao.add_argument('--particionar', action='store_true', default=None,
+                          help="Um snapshot por mês (padrão com DASHBOARD_INGESTAO_INCREMENTAL=1)")
+    particao.add_argument('--arquivo-unico', action='store_false', dest='particionar',
+                          help="Um único snapshot com o período todo")
+    parser.add_argument('--criar-sqlite', metavar='ARQUIVO_DB',
+                        help="Cria uma fonte SQLite a partir do snapshot mais recente e sai")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.criar_sqlite:
+            linhas = criar_sqlite(args.criar_sqlite, tabela=args.tabela)
+            print(f"✅ {linhas:,} apontamentos em {args.criar_sqlite} (tabela {args.tabela})")
+            return 0
+
+        data_fim = args.fim or datetime.date.today()
+        data_inicio = args.inicio or data_fim - datetime.timedelta(days=DIAS_PADRAO)
+        resumo = ingerir(data_inicio, data_fim, args.conexao, args.tabela, args.saida, args.particionar,
+                         janela_dias=args.janela_dias, tamanho_lote=args.lote)
+    except (FileNotFoundError, ValueError, *ERROS_BANCO) as e:
+        print(f"❌ {e}")
+        return 1
+
+    print(f"✅ {resumo['linhas']:,} apontamentos de {data_inicio} a {data_fim} "
+          f"em {resumo['janelas']} janela(s) ({resumo['segundos']:.1f}s)")
+    for arquivo in resumo['arquivos']:
+        print(f"📄 {arquivo}")
+    if not resumo['arquivos']:
+        print("⚠️ Nenhum apontamento no período: nenhum snapshot gravado")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
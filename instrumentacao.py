@@ -0,0 +1,270 @@
+"""
+🩺 INSTRUMENTAÇÃO - Tempos por rerun e log estruturado de desempenho
+Cada rerun do dashboard abre uma medição com trechos nomeados (carga, filtros,
+abas, gráficos, exportação, chat) e contadores de acerto/falta dos caches. A
+medição alimenta o painel "Diagnóstico" da sidebar e, opcionalmente, uma linha
+por rerun em um log JSON Lines para atribuir reruns lentos em produção.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+import numpy as np
+
+DIAGNOSTICO_PADRAO = os.getenv("DASHBOARD_DIAGNOSTICO", "0") == "1"  # Painel aberto ao iniciar a sessão
+ARQUIVO_LOG = os.getenv("DASHBOARD_LOG_DESEMPENHO")                  # Vazio: sem log em disco
+LIMIAR_LOG_MS = float(os.getenv("DASHBOARD_LOG_LIMIAR_MS", "0"))     # Só registra reruns mais lentos
+TAMANHO_MAXIMO_LOG = 20 * 1024**2  # Bytes; acima disso o log vira .1 e recomeça
+HISTORICO_RERUNS = 20              # Totais recentes mostrados no painel
+
+_atual = threading.local()  # Medição do rerun em curso na thread do script
+_trava_log = threading.Lock()
+
+
+class Medicao:
+    """Trechos e contadores de um rerun"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.instante = datetime.now()
+        self.trechos = []  # [nome, nível, início_ms, duração_ms]
+        self.contadores = Counter()
+        self._nivel = 0
+
+    @contextmanager
+    def trecho(self, nome):
+        registro = [nome, self._nivel, (time.perf_counter() - self.inicio) * 1000, None]
+        self.trechos.append(registro)
+        self._nivel += 1
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            # st.stop()/st.rerun() levantam exceção: o trecho fecha do mesmo jeito
+            registro[3] = (time.perf_counter() - inicio) * 1000
+            self._nivel -= 1
+
+    def registrar(self, nome, segundos):
+        """Trecho medido fora do script (ex.: chamada ao modelo na thread do chat)"""
+        self.trechos.append([nome, self._nivel, (time.perf_counter() - self.inicio) * 1000, segundos * 1000])
+
+    def contar(self, nome, quantidade=1):
+        self.contadores[nome] += quantidade
+
+    def total_ms(self):
+        return (time.perf_counter() - self.inicio) * 1000
+
+    def como_dict(self, **contexto):
+        """Registro do rerun: trechos, contadores e o contexto informado (filtros, motor...)"""
+        contadores = dict(self.contadores)
+        # Caches do Streamlit só contam chamadas (no chamador) e faltas (no corpo): acertos = diferença
+        for nome in [nome for nome in contadores if nome.endswith('.chamadas')]:
+            prefixo = nome[:-len('.chamadas')]
+            chamadas = contadores.pop(nome)
+            contadores[f'{prefixo}.acertos'] = chamadas - contadores.get(f'{prefixo}.faltas', 0)
+            contadores.setdefault(f'{prefixo}.faltas', 0)
+        return {
+            'evento': 'rerun',
+            'instante': self.instante.isoformat(timespec='milliseconds'),
+            'total_ms': round(self.total_ms(), 2),
+            'trechos': [
+                {'nome': nome, 'nivel': nivel, 'inicio_ms': round(inicio, 2),
+                 'duracao_ms': None if duracao is None else round(duracao, 2)}
+                for nome, nivel, inicio, duracao in self.trechos
+            ],
+            'contadores': dict(sorted(contadores.items())),
+            **contexto
+        }
+
+
+# ==================== MEDIÇÃO DO RERUN ATUAL ====================
+def iniciar():
+    """Abre a medição do rerun na thread do script
+
+    Um rerun interrompido por st.rerun() não chega a finalizar: a medição
+    dele vai para o log marcada como interrompida antes de abrir a nova.
+    """
+    anterior = atual()
+    if anterior is not None:
+        gravar_log(anterior.como_dict(interrompido=True))
+    _atual.medicao = Medicao()
+    return _atual.medicao
+
+
+def atual():
+    return getattr(_atual, 'medicao', None)
+
+
+def finalizar(**contexto):
+    """Fecha a medição do rerun e devolve o registro (None sem medição aberta)
+
+    Reruns parciais (fragmentos) não abrem medição: os trechos deles são ignorados.
+    """
+    medicao = atual()
+    if medicao is None:
+        return None
+    _atual.medicao = None
+    return medicao.como_dict(**contexto)
+
+
+@contextmanager
+def trecho(nome):
+    """Mede o bloco dentro da medição atual (sem efeito se não houver uma)"""
+    medicao = atual()
+    if medicao is None:
+        yield
+        return
+    with medicao.trecho(nome):
+        yield
+
+
+def medido(nome):
+    """Decorador: mede cada chamada da função como um trecho"""
+    def decorador(funcao):
+        @wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with trecho(nome):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+
+def registrar(nome, segundos):
+    medicao = atual()
+    if medicao is not None and segundos is not None:
+        medicao.registrar(nome, segundos)
+
+
+def contar(nome, quantidade=1):
+    medicao = atual()
+    if medicao is not None:
+        medicao.contar(nome, quantidade)
+
+
+def contar_cache(nome, acerto):
+    contar(f'cache.{nome}.{"acertos" if acerto else "faltas"}')
+
+
+# ==================== MEMOS (lru_cache) ====================
+def estatisticas_memos(*objetos):
+    """Acertos/faltas acumulados de cada método memorizado (cache_info) dos objetos"""
+    estatisticas = {}
+    for obj in objetos:
+        for nome, valor in vars(obj).items():
+            if hasattr(valor, 'cache_info'):
+                info = valor.cache_info()
+                estatisticas[nome] = (info.hits, info.misses)
+    return estatisticas
+
+
+def contar_memos(antes, depois, prefixo='memo'):
+    """Conta na medição atual o que os memos acertaram/faltaram entre dois instantâneos
+
+    Os memos são compartilhados entre sessões: com acessos simultâneos a
+    diferença é aproximada.
+    """
+    for nome, (acertos, faltas) in depois.items():
+        acertos_antes, faltas_antes = antes.get(nome, (0, 0))
+        if acertos - acertos_antes:
+            contar(f'{prefixo}.{nome}.acertos', acertos - acertos_antes)
+        if faltas - faltas_antes:
+            contar(f'{prefixo}.{nome}.faltas', faltas - faltas_antes)
+
+
+# ==================== LOG JSON LINES ====================
+def gravar_log(registro, arquivo=None, limiar_ms=None):
+    """Acrescenta o registro ao log de desempenho; devolve True se gravou"""
+    arquivo = arquivo or ARQUIVO_LOG
+    limiar_ms = LIMIAR_LOG_MS if limiar_ms is None else limiar_ms
+    if not arquivo or registro is None:
+        return False
+    if registro.get('evento') == 'rerun' and registro.get('total_ms', 0) < limiar_ms:
+        return False
+
+    linha = json.dumps(registro, ensure_ascii=False, default=str)
+    with _trava_log:
+        pasta = os.path.dirname(arquivo)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        if os.path.exists(arquivo) and os.path.getsize(arquivo) > TAMANHO_MAXIMO_LOG:
+            os.replace(arquivo, arquivo + '.1')
+        with open(arquivo, 'a', encoding='utf-8') as saida:
+            saida.write(linha + '\n')
+    return True
+
+
+def ler_log(arquivo=None):
+    """Registros do log de desempenho (linhas inválidas são ignoradas)"""
+    arquivo = arquivo or ARQUIVO_LOG
+    if not arquivo or not os.path.exists(arquivo):
+        return []
+    registros = []
+    with open(arquivo, encoding='utf-8') as entrada:
+        for linha in entrada:
+            try:
+                registros.append(json.loads(linha))
+            except json.JSONDecodeError:
+                continue
+    return registros
+
+
+def resumir_log(registros):
+    """Por trecho: reruns em que aparece, mediana, p95 e máximo (ms), do mais pesado ao mais leve"""
+    duracoes = {}
+    for registro in registros:
+        if registro.get('evento') != 'rerun':
+            continue
+        duracoes.setdefault('rerun (total)', []).append(registro['total_ms'])
+        for item in registro.get('trechos', []):
+            if item.get('duracao_ms') is not None:
+                duracoes.setdefault(item['nome'], []).append(item['duracao_ms'])
+    linhas = [
+        {'trecho': nome, 'reruns': len(valores), 'mediana_ms': float(np.median(valores)),
+         'p95_ms': float(np.percentile(valores, 95)), 'max_ms': float(np.max(valores))}
+        for nome, valores in duracoes.items()
+    ]
+    return sorted(linhas, key=lambda linha: linha['p95_ms'], reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resumo do log de desempenho do dashboard (JSON Lines)")
+    parser.add_argument('arquivo', nargs='?', default=ARQUIVO_LOG, help="Log gerado com DASHBOARD_LOG_DESEMPENHO")
+    parser.add_argument('--limite', type=int, default=20, help="Trechos mostrados")
+    args = parser.parse_args(argv)
+
+    registros = ler_log(args.arquivo)
+    if not registros:
+        print(f"⚠️ Nenhum registro em {args.arquivo or '(DASHBOARD_LOG_DESEMPENHO não definido)'}")
+        return 1
+
+    print(f"📄 {args.arquivo}: {sum(r.get('evento') == 'rerun' for r in registros)} rerun(s)")
+    print(f"{'trecho':<32} | {'reruns':>6} | {'mediana':>9} | {'p95':>9} | {'máximo':>9}")
+    for linha in resumir_log(registros)[:args.limite]:
+        print(f"{linha['trecho'][:32]:<32} | {linha['reruns']:>6} | {linha['mediana_ms']:>7.1f}ms | "
+              f"{linha['p95_ms']:>7.1f}ms | {linha['max_ms']:>7.1f}ms")
+
+    chats = [r for r in registros if r.get('evento') == 'chat' and r.get('total_s') is not None]
+    if chats:
+        totais = [r['total_s'] for r in chats]
+        print(f"\n🤖 Chat: {len(chats)} resposta(s), mediana {np.median(totais):.2f}s, p95 {np.percentile(totais, 95):.2f}s")
+
+    contadores = Counter()
+    for registro in registros:
+        contadores.update(registro.get('contadores', {}))
+    if contadores:
+        print("\n🧮 Contadores acumulados")
+        for nome, valor in sorted(contadores.items()):
+            print(f"   {nome}: {valor:,}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
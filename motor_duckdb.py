@@ -0,0 +1,362 @@
+"""
+🦆 MOTOR DUCKDB - Consultas analíticas direto nos Parquet, sem carregar a base
+Alternativa ao conjunto em memória (consultas.ConjuntoApontamentos + cubo) para
+períodos longos: as jornadas derivadas ficam em Parquet particionado por mês e
+cada recorte vira um SELECT com os filtros de período, validador e funcionário
+e as agregações das abas executados pelo DuckDB. Só o resultado chega ao pandas,
+então intervalos de vários anos respondem sem estourar a memória.
+
+Ative com DASHBOARD_MOTOR=duckdb (requer o pacote duckdb).
+
+Layout (recriado a partir do snapshot ou da base incremental):
+    .cache/duckdb/snapshot_<assinatura>/mes=AAAA-MM/jornadas.parquet
+    .cache/duckdb/incremental_<regras>/mes=AAAA-MM/jornadas.parquet
+"""
+
+import datetime
+import glob
+import os
+import shutil
+import threading
+from functools import lru_cache
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+import carregamento
+import regras_jornada
+from cubos import TAMANHO_MEMO, TODOS, CuboJornadas, extras_por_data_vazio
+from regras_jornada import CLASSIFICACOES_FAIXA, NOMES_DIAS
+
+try:
+    import duckdb
+    DUCKDB_DISPONIVEL = True
+except ImportError:
+    DUCKDB_DISPONIVEL = False
+
+MOTOR = os.getenv("DASHBOARD_MOTOR", "pandas").lower()
+PASTA_DUCKDB = os.path.join(carregamento.PASTA_CACHE, "duckdb")
+ARQUIVO_PARTICAO = "jornadas.parquet"
+MARCA_PRONTO = "_pronto"  # Criado depois que todas as partições de um snapshot foram gravadas
+
+_TRAVA_BASE = threading.Lock()
+
+
+def motor_ativo():
+    """'duckdb' quando pedido em DASHBOARD_MOTOR e disponível; senão 'pandas'"""
+    return 'duckdb' if MOTOR == 'duckdb' and DUCKDB_DISPONIVEL else 'pandas'
+
+
+# ==================== BASE PARQUET ====================
+def _caminho_mes(pasta, mes):
+    return os.path.join(pasta, f"mes={mes}", ARQUIVO_PARTICAO)
+
+
+def _gravar_meses(df, pasta):
+    """Grava as jornadas já derivadas em uma partição por mês"""
+    meses = df['data'].dt.strftime('%Y-%m')
+    for mes, parte in df.groupby(meses.to_numpy(), sort=True):
+        carregamento.gravar_parquet(parte, _caminho_mes(pasta, mes))
+
+
+def _remover_irmaos(destino, prefixo):
+    for antigo in glob.glob(os.path.join(os.path.dirname(destino), prefixo + '*')):
+        if antigo != destino:
+            shutil.rmtree(antigo, ignore_errors=True)
+
+
+def sincronizar_snapshot(pasta=carregamento.PASTA_RESULTADOS, pasta_duckdb=PASTA_DUCKDB):
+    """Particiona por mês a carga mais recente (uma vez por versão dos arquivos)"""
+    caminhos = carregamento.localizar_carga_mais_recente(pasta)
+    if not caminhos:
+        return None
+    destino = os.path.join(pasta_duckdb, f"snapshot_{carregamento.assinatura_carga(caminhos)}")
+    if not os.path.exists(os.path.join(destino, MARCA_PRONTO)):
+        df = carregamento.carregar_carga(caminhos)
+        shutil.rmtree(destino, ignore_errors=True)
+        _gravar_meses(df, destino)
+        open(os.path.join(destino, MARCA_PRONTO), 'w').close()
+    _remover_irmaos(destino, 'snapshot_')
+    return destino
+
+
+def sincronizar_incremental(pasta=carregamento.PASTA_RESULTADOS, pasta_base=carregamento.PASTA_BASE_INCREMENTAL,
+                            pasta_duckdb=PASTA_DUCKDB, regras=None):
+    """Deriva só os meses da base incremental que mudaram desde a última sincronização"""
+    regras = regras if regras is not None else regras_jornada.carregar_regras()
+    carregamento.atualizar_base_incremental(pasta, pasta_base)
+    origens = carregamento.particoes_agrupadas(pasta_base)
+    if not origens:
+        return None
+
+    destino = os.path.join(pasta_duckdb, f"incremental_v{carregamento.VERSAO_CACHE}_"
+                                         f"{regras_jornada.assinatura_regras(regras)}")
+    for mes, origem in origens.items():
+        derivado = _caminho_mes(destino, mes)
+        if not os.path.exists(derivado) or os.path.getmtime(derivado) < os.path.getmtime(origem):
+            carregamento.gravar_parquet(carregamento.derivar_colunas(pd.read_parquet(origem), regras), derivado)
+    for particao in glob.glob(os.path.join(destino, 'mes=*')):
+        if os.path.basename(particao)[len('mes='):] not in origens:
+            shutil.rmtree(particao, ignore_errors=True)
+    _remover_irmaos(destino, 'incremental_')
+    return destino
+
+
+def sincronizar_base(pasta=carregamento.PASTA_RESULTADOS, incremental=None, regras=None):
+    """Pasta com os Parquet mensais das jornadas derivadas (None se não houver dados)"""
+    if incremental is None:
+        incremental = carregamento.MODO_INCREMENTAL
+    with _TRAVA_BASE:
+        if incremental:
+            return sincronizar_incremental(pasta, regras=regras)
+        return sincronizar_snapshot(pasta)
+
+
+# ==================== CONSULTAS ====================
+def _meses(data_inicio, data_fim):
+    return data_inicio.strftime('%Y-%m'), data_fim.strftime('%Y-%m')
+
+
+def _indice_nomes(df, coluna='s_nm_recurso'):
+    """Índice por nome em ordem alfabética (mesma ordem das categorias do cubo)"""
+    return df.set_index(coluna).sort_index()
+
+
+class MotorDuckDB:
+    """Mesma interface do cubos.CuboJornadas, com cada agregação executada em SQL"""
+
+    def __init__(self, conexao, colunas, regras=None):
+        self._conexao = conexao
+        self.colunas = set(colunas)
+        self.regras = regras if regras is not None else regras_jornada.carregar_regras()
+
+        # Recortes memorizados por chave de filtro (mesmos tamanhos do cubo)
+        self.resumo = lru_cache(maxsize=TAMANHO_MEMO)(self._resumo)
+        self.por_funcionario = lru_cache(maxsize=TAMANHO_MEMO)(self._por_funcionario)
+        self.por_dia = lru_cache(maxsize=TAMANHO_MEMO)(self._por_dia)
+        self.top_funcionarios = lru_cache(maxsize=TAMANHO_MEMO)(self._top_funcionarios)
+        self.media_dia_semana = lru_cache(maxsize=TAMANHO_MEMO)(self._media_dia_semana)
+        self.extras_por_funcionario = lru_cache(maxsize=TAMANHO_MEMO)(self._extras_por_funcionario)
+        self.extras_por_data = lru_cache(maxsize=TAMANHO_MEMO)(self._extras_por_data)
+        self.jornadas = lru_cache(maxsize=8)(self._jornadas)
+
+    def consultar(self, sql, parametros=()):
+        """Executa num cursor próprio (a conexão é compartilhada entre as sessões)"""
+        cursor = self._conexao.cursor()
+        try:
+            return cursor.execute(sql, list(parametros)).df()
+        finally:
+            cursor.close()
+
+    # ==================== FILTROS ====================
+    @staticmethod
+    def filtro(chave):
+        """WHERE da chave de filtro; o mês poda as partições antes de ler os arquivos"""
+        data_inicio, data_fim, validador, funcionario = chave
+        condicoes = ["mes BETWEEN ? AND ?", "data >= ?", "data < ?"]
+        parametros = [*_meses(data_inicio, data_fim), pd.Timestamp(data_inicio),
+                      pd.Timestamp(data_fim + datetime.timedelta(days=1))]
+        if validador != TODOS:
+            condicoes.append("s_nm_usuario_valida = ?")
+            parametros.append(validador)
+        if funcionario != TODOS:
+            condicoes.append("s_nm_recurso = ?")
+            parametros.append(funcionario)
+        return ' AND '.join(condicoes), parametros
+
+    def classe_sql(self, faixa_referencia, tolerancia):
+        """Expressão com o código 0/1/2 (Abaixo/Normal/Acima), como cubo.classificacao"""
+        coluna = regras_jornada.coluna_classificacao(faixa_referencia)
+        if coluna in self.colunas and tolerancia == self.regras['tolerancia_faixa']:
+            return (f"CASE {coluna} WHEN '{CLASSIFICACOES_FAIXA[0]}' THEN 0 "
+                    f"WHEN '{CLASSIFICACOES_FAIXA[1]}' THEN 1 ELSE 2 END")
+        inferior, superior = float(faixa_referencia - tolerancia), float(faixa_referencia + tolerancia)
+        return (f"CASE WHEN duracao_horas < {inferior!r} THEN 0 "
+                f"WHEN duracao_horas > {superior!r} THEN 2 ELSE 1 END")
+
+    def _recorte_sql(self, chave, faixa_referencia, tolerancia, colunas='*'):
+        where, parametros = self.filtro(chave)
+        sql = (f"SELECT {colunas}, {self.classe_sql(faixa_referencia, tolerancia)} AS classe "
+               f"FROM jornadas WHERE {where}")
+        return sql, parametros
+
+    # ==================== AGREGAÇÕES ====================
+    def _resumo(self, chave, faixa_referencia, tolerancia):
+        sql, parametros = self._recorte_sql(chave, faixa_referencia, tolerancia)
+        linha = self.consultar(f"""
+            SELECT count(*) AS total_registros,
+                   coalesce(sum(duracao_horas::DOUBLE), 0) AS total_horas,
+                   coalesce(sum(duracao_liquida::DOUBLE), 0) AS total_horas_liquidas,
+                   coalesce(sum(horas_extras::DOUBLE), 0) AS total_horas_extras,
+                   coalesce(sum(horas_pagas::DOUBLE), 0) AS total_horas_pagas,
+                   count(*) FILTER (WHERE classe = 0) AS abaixo,
+                   count(*) FILTER (WHERE classe = 1) AS normal,
+                   count(*) FILTER (WHERE classe = 2) AS acima,
+                   count(DISTINCT s_nm_recurso) AS funcionarios,
+                   count(DISTINCT s_nm_recurso) FILTER (WHERE horas_extras > 0) AS funcionarios_com_extras,
+                   count(*) FILTER (WHERE horas_extras > 0) AS jornadas_com_extras,
+                   count(*) FILTER (WHERE eh_dia_util) AS dias_uteis
+            FROM ({sql})
+        """, parametros).iloc[0]
+        total_registros = int(linha['total_registros'])
+        total_horas = float(linha['total_horas'])
+        return MappingProxyType({
+            'total_registros': total_registros,
+            'total_horas': total_horas,
+            'total_horas_brutas': total_horas,
+            'total_horas_liquidas': float(linha['total_horas_liquidas']),
+            'total_horas_extras': float(linha['total_horas_extras']),
+            'total_horas_pagas': float(linha['total_horas_pagas']),
+            'media_horas': total_horas / total_registros if total_registros else float('nan'),
+            **{nome.lower(): int(linha[nome.lower()]) for nome in CLASSIFICACOES_FAIXA},
+            'funcionarios': int(linha['funcionarios']),
+            'funcionarios_com_extras': int(linha['funcionarios_com_extras']),
+            'jornadas_com_extras': int(linha['jornadas_com_extras']),
+            'dias_uteis': int(linha['dias_uteis']),
+            'dias_nao_uteis': total_registros - int(linha['dias_uteis'])
+        })
+
+    def _por_funcionario(self, chave, faixa_referencia, tolerancia):
+        sql, parametros = self._recorte_sql(chave, faixa_referencia, tolerancia)
+        resultado = _indice_nomes(self.consultar(f"""
+            SELECT s_nm_recurso, count(*) AS "Qtd", sum(duracao_horas::DOUBLE) AS "Total_h",
+                   avg(duracao_horas::DOUBLE) AS "Média_h", min(duracao_horas::DOUBLE) AS "Min_h",
+                   max(duracao_horas::DOUBLE) AS "Max_h", count(*) FILTER (WHERE classe = 0) AS "Abaixo_Padrão"
+            FROM ({sql}) GROUP BY s_nm_recurso
+        """, parametros)).astype({'Qtd': 'int64', 'Abaixo_Padrão': 'int64'})
+
+        # Classificação geral
+        resultado['Status'] = np.select(
+            [resultado['Abaixo_Padrão'] > resultado['Qtd'] * 0.3, resultado['Abaixo_Padrão'] > 0],
+            ['🔴 Crítico', '🟡 Atenção'],
+            '🟢 OK'
+        )
+        return resultado.sort_values('Total_h', ascending=False)
+
+    def _por_dia(self, chave, faixa_referencia, tolerancia):
+        sql, parametros = self._recorte_sql(chave, faixa_referencia, tolerancia)
+        contagens = ', '.join(f'count(*) FILTER (WHERE classe = {codigo}) AS "{nome}"'
+                              for codigo, nome in enumerate(CLASSIFICACOES_FAIXA))
+        resultado = self.consultar(f"""
+            SELECT CAST(data AS DATE) AS data, count(*) AS "Qtd", sum(duracao_horas::DOUBLE) AS "Total_h",
+                   avg(duracao_horas::DOUBLE) AS "Média_h", {contagens}
+            FROM ({sql}) GROUP BY 1 ORDER BY 1
+        """, parametros)
+        colunas = ['Qtd', 'Total_h', 'Média_h'] + CLASSIFICACOES_FAIXA
+        if resultado.empty:
+            return pd.DataFrame(columns=colunas, index=pd.Index([], name='data'))
+        resultado.index = pd.Index(pd.to_datetime(resultado.pop('data')).dt.date, name='data')
+        return resultado.astype({nome: 'int64' for nome in ['Qtd'] + CLASSIFICACOES_FAIXA})
+
+    por_dia_classificacao = CuboJornadas.por_dia_classificacao
+
+    def distribuicao(self, chave, faixa_referencia, tolerancia):
+        """Quantidade de jornadas em cada classificação"""
+        resumo = self.resumo(chave, faixa_referencia, tolerancia)
+        return pd.Series([resumo[nome.lower()] for nome in CLASSIFICACOES_FAIXA], index=CLASSIFICACOES_FAIXA,
+                         name='count')
+
+    def _jornadas(self, chave, faixa_referencia, tolerancia):
+        sql, parametros = self._recorte_sql(chave, faixa_referencia, tolerancia,
+                                            "s_nm_recurso, data, duracao_horas::DOUBLE AS duracao_horas, "
+                                            "horas_extras::DOUBLE AS horas_extras")
+        df = self.consultar(f"{sql} ORDER BY data", parametros)
+        return df.assign(
+            data=pd.to_datetime(df['data']),
+            classificacao=pd.Categorical.from_codes(df.pop('classe').to_numpy('int64'), CLASSIFICACOES_FAIXA)
+        )
+
+    def _top_funcionarios(self, chave, n=10):
+        where, parametros = self.filtro(chave)
+        serie = _indice_nomes(self.consultar(f"""
+            SELECT s_nm_recurso, sum(duracao_horas::DOUBLE) AS duracao_horas
+            FROM jornadas WHERE {where} GROUP BY s_nm_recurso
+        """, parametros))['duracao_horas']
+        return serie.nlargest(n)
+
+    def _media_dia_semana(self, chave):
+        where, parametros = self.filtro(chave)
+        df = self.consultar(f"""
+            SELECT dia_semana_num, s_nm_recurso, avg(duracao_horas::DOUBLE) AS duracao_horas
+            FROM jornadas WHERE {where} GROUP BY ALL ORDER BY s_nm_recurso, dia_semana_num
+        """, parametros)
+        return pd.DataFrame({
+            'dia_semana': np.asarray(NOMES_DIAS)[df['dia_semana_num'].to_numpy('int64')],
+            's_nm_recurso': df['s_nm_recurso'].to_numpy(object),
+            'duracao_horas': df['duracao_horas'].to_numpy('float64')
+        })
+
+    def _extras_por_funcionario(self, chave):
+        where, parametros = self.filtro(chave)
+        resultado = _indice_nomes(self.consultar(f"""
+            SELECT s_nm_recurso, sum(horas_extras::DOUBLE) AS horas_extras,
+                   sum(horas_pagas::DOUBLE) AS horas_pagas, sum(duracao_horas::DOUBLE) AS duracao_horas
+            FROM jornadas WHERE {where} AND horas_extras > 0 GROUP BY s_nm_recurso
+        """, parametros))
+        return resultado.sort_values('horas_extras', ascending=False)
+
+    def _extras_por_data(self, chave):
+        where, parametros = self.filtro(chave)
+        resultado = self.consultar(f"""
+            SELECT CAST(data AS DATE) AS data, sum(horas_extras::DOUBLE) AS horas_extras,
+                   count(DISTINCT s_nm_recurso) AS s_nm_recurso
+            FROM jornadas WHERE {where} AND horas_extras > 0 GROUP BY 1 ORDER BY 1
+        """, parametros)
+        if resultado.empty:
+            return extras_por_data_vazio()
+        return resultado.assign(data=pd.to_datetime(resultado['data']),
+                                s_nm_recurso=resultado['s_nm_recurso'].astype('int64'))
+
+
+class ConjuntoDuckDB:
+    """Mesma interface do consultas.ConjuntoApontamentos, lendo os Parquet sob demanda"""
+
+    motor = 'duckdb'
+    bytes_memoria = 0  # As jornadas ficam em disco; só os recortes consultados vão para a memória
+
+    def __init__(self, pasta, versao=None, regras=None):
+        self.pasta = pasta
+        self.versao = versao
+        self.particoes = len(glob.glob(os.path.join(pasta, 'mes=*', ARQUIVO_PARTICAO)))
+
+        conexao = duckdb.connect()
+        # union_by_name: meses gravados em momentos diferentes podem ter tipos compactados diferentes
+        conexao.execute(f"""
+            CREATE VIEW jornadas AS SELECT * FROM read_parquet(
+                '{os.path.join(pasta, 'mes=*', ARQUIVO_PARTICAO)}',
+                hive_partitioning = true, hive_types = {{'mes': VARCHAR}}, union_by_name = true)
+        """)
+        colunas = conexao.execute("SELECT column_name FROM (DESCRIBE jornadas)").fetchall()
+        self.cubo = MotorDuckDB(conexao, [coluna for coluna, in colunas], regras)
+
+        # Dimensões usadas pela sidebar, calculadas uma única vez
+        dimensoes = self.cubo.consultar("SELECT min(data) AS data_min, max(data) AS data_max, "
+                                        "count(*) AS n FROM jornadas").iloc[0]
+        self.data_min = pd.Timestamp(dimensoes['data_min']).date()
+        self.data_max = pd.Timestamp(dimensoes['data_max']).date()
+        self.n_jornadas = int(dimensoes['n'])
+        self.validadores = self._distintos('s_nm_usuario_valida')
+        self.funcionarios = self._distintos('s_nm_recurso')
+        self.recorte = lru_cache(maxsize=4)(self._recorte)
+
+    def _distintos(self, coluna):
+        df = self.cubo.consultar(f"SELECT DISTINCT {coluna} FROM jornadas WHERE {coluna} IS NOT NULL")
+        return sorted(df[coluna].tolist())
+
+    def _recorte(self, chave, faixa_referencia, tolerancia):
+        """Jornadas da chave de filtro com a coluna classificacao da faixa (só as linhas do recorte)"""
+        sql, parametros = self.cubo._recorte_sql(chave, faixa_referencia, tolerancia, '* EXCLUDE (mes)')
+        df = self.cubo.consultar(f"{sql} ORDER BY data", parametros)
+        return df.assign(
+            classificacao=pd.Categorical.from_codes(df.pop('classe').to_numpy('int64'), CLASSIFICACOES_FAIXA)
+        )
+
+
+def abrir_conjunto(pasta=carregamento.PASTA_RESULTADOS, versao=None, incremental=None, regras=None):
+    """Sincroniza a base Parquet e abre o conjunto (None se não houver dados)"""
+    regras = regras if regras is not None else regras_jornada.carregar_regras()
+    destino = sincronizar_base(pasta, incremental, regras)
+    if destino is None:
+        return None
+    return ConjuntoDuckDB(destino, versao, regras)
@@ -0,0 +1,168 @@
+"""
+⚖️ REGRAS DE JORNADA - Cálculo vetorizado das colunas de folha
+Dia útil, desconto de almoço, horas normais/extras/pagas e classificação da
+jornada a partir de uma configuração declarativa (regras_jornada.json).
+"""
+
+import copy
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+ARQUIVO_REGRAS = os.getenv(
+    "DASHBOARD_REGRAS_JORNADA",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "regras_jornada.json")
+)
+
+# Valores usados quando o arquivo de regras não existe ou omite alguma chave
+REGRAS_PADRAO = {
+    "horas_almoco": 1.0,              # Desconto de almoço por jornada
+    "jornada_minima_almoco": 0.0,     # Só desconta almoço a partir desta jornada bruta
+    "limite_diario": 8.0,             # Horas normais por dia (acima disso = extra)
+    "multiplicador_extra": 1.5,       # Adicional das horas extras em dia útil
+    "dias_uteis": [0, 1, 2, 3, 4],    # 0=segunda ... 6=domingo
+    "fim_de_semana": {
+        "descontar_almoco": True,
+        "todas_horas_extras": False,  # True: toda hora líquida no fim de semana é extra
+        "multiplicador_extra": 1.5
+    },
+    "jornada_completa": {"minimo": 7.5, "maximo": 8.5},
+    "faixas_referencia": [4.0, 6.0, 8.0],  # Faixas pré-classificadas no carregamento
+    "tolerancia_faixa": 0.5                # 30 minutos de tolerância
+}
+
+DIA_UTIL = '📅 Dia Útil'
+FIM_DE_SEMANA = '🏖️ Fim de Semana'
+NOMES_DIAS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+SIGLAS_DIAS = ['seg', 'ter', 'qua', 'qui', 'sex', 'sáb', 'dom']
+JORNADA_REDUZIDA = '⚠️ Jornada Reduzida'
+JORNADA_COMPLETA = '✅ Jornada Completa'
+JORNADA_HORA_EXTRA = '🔴 Hora Extra'
+CLASSIFICACOES_FAIXA = ['Abaixo', 'Normal', 'Acima']
+TOLERANCIA_FAIXA = REGRAS_PADRAO['tolerancia_faixa']
+
+
+def _mesclar(base, alteracoes, caminho=''):
+    """Sobrepõe as alterações às regras padrão, rejeitando chaves desconhecidas"""
+    for chave, valor in alteracoes.items():
+        if chave not in base:
+            raise ValueError(f"Regra desconhecida: {caminho}{chave}")
+        if isinstance(base[chave], dict):
+            _mesclar(base[chave], valor, f"{caminho}{chave}.")
+        else:
+            base[chave] = valor
+    return base
+
+
+def carregar_regras(caminho=ARQUIVO_REGRAS):
+    """Lê as regras do arquivo JSON sobre os valores padrão"""
+    regras = copy.deepcopy(REGRAS_PADRAO)
+    if caminho and os.path.exists(caminho):
+        with open(caminho, encoding='utf-8') as arquivo:
+            _mesclar(regras, json.load(arquivo))
+    return regras
+
+
+def assinatura_regras(regras=None):
+    """Hash curto das regras (entra na chave dos caches de dados derivados)"""
+    regras = regras if regras is not None else carregar_regras()
+    texto = json.dumps(regras, sort_keys=True)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()[:8]
+
+
+def descrever_dias(dias):
+    """Dias da semana (0=segunda) em texto curto: [0, 1, 2, 3, 4] -> 'seg-sex', [0, 2] -> 'seg, qua'"""
+    dias = sorted({int(dia) % 7 for dia in dias})
+    if not dias:
+        return 'nenhum'
+    if len(dias) == 7:
+        return 'seg-dom'
+
+    # Começa depois de um dia ausente: sequências como sáb-dom-seg ficam juntas
+    inicio = next(dia for dia in dias if (dia - 1) % 7 not in dias)
+    sequencias = []
+    for dia in sorted(dias, key=lambda dia: (dia - inicio) % 7):
+        if sequencias and dia == (sequencias[-1][-1] + 1) % 7:
+            sequencias[-1].append(dia)
+        else:
+            sequencias.append([dia])
+    return ', '.join(SIGLAS_DIAS[seq[0]] if len(seq) == 1 else f"{SIGLAS_DIAS[seq[0]]}-{SIGLAS_DIAS[seq[-1]]}"
+                     for seq in sequencias)
+
+
+def aplicar_regras(df, regras=None):
+    """Calcula todas as colunas de folha de uma vez, sem funções por linha"""
+    regras = regras if regras is not None else carregar_regras()
+    fds = regras['fim_de_semana']
+    completa = regras['jornada_completa']
+
+    # AJUSTE 1: IDENTIFICAR DIA ÚTIL vs NÃO ÚTIL
+    dia_semana = df['data'].dt.dayofweek.to_numpy()
+    util = np.isin(dia_semana, regras['dias_uteis'])
+    df['dia_semana_num'] = dia_semana
+    df['tipo_dia'] = pd.Categorical.from_codes((~util).astype('int8'), [DIA_UTIL, FIM_DE_SEMANA])
+    df['nome_dia'] = pd.Categorical.from_codes(dia_semana, NOMES_DIAS)
+    df['eh_dia_util'] = util
+
+    # AJUSTE 2: DESCONTO DE ALMOÇO
+    bruta = df['duracao_horas'].to_numpy(dtype='float64')
+    desconta = (util | fds['descontar_almoco']) & (bruta >= regras['jornada_minima_almoco'])
+    almoco = np.where(desconta, regras['horas_almoco'], 0.0)
+    liquida = np.clip(bruta - almoco, 0, None)
+    df['duracao_bruta'] = bruta  # Salvar original
+    df['horas_almoco'] = almoco
+    df['duracao_liquida'] = liquida
+
+    # AJUSTE 3: HORAS NORMAIS E EXTRAS (após desconto de almoço)
+    limite = regras['limite_diario']
+    tudo_extra = ~util & fds['todas_horas_extras']
+    extras = np.where(tudo_extra, liquida, np.clip(liquida - limite, 0, None))
+    normais = np.where(tudo_extra, 0.0, np.minimum(liquida, limite))
+    multiplicador = np.where(util, regras['multiplicador_extra'], fds['multiplicador_extra'])
+    df['horas_extras'] = extras
+    df['horas_normais'] = normais
+    df['horas_pagas'] = normais + extras * multiplicador
+
+    # Indicadores visuais
+    df['possui_hora_extra'] = extras > 0
+    df['classificacao_jornada'] = pd.Categorical(
+        np.select(
+            [liquida < completa['minimo'], liquida <= completa['maximo']],
+            [JORNADA_REDUZIDA, JORNADA_COMPLETA],
+            JORNADA_HORA_EXTRA
+        ),
+        categories=[JORNADA_REDUZIDA, JORNADA_COMPLETA, JORNADA_HORA_EXTRA]
+    )
+    return df
+
+
+def coluna_classificacao(faixa_referencia):
+    """Nome da coluna pré-calculada para uma faixa (ex: classificacao_8h)"""
+    return f"classificacao_{faixa_referencia:g}h"
+
+
+def classificar_por_faixa(duracao, faixa_referencia, tolerancia=TOLERANCIA_FAIXA):
+    """Classifica apontamentos (escalar ou vetor) em relação a uma faixa de referência"""
+    valores = np.asarray(duracao, dtype='float64')
+    codigos = np.where(valores < faixa_referencia - tolerancia, 0,
+                       np.where(valores > faixa_referencia + tolerancia, 2, 1)).astype('int8')
+    if codigos.ndim == 0:
+        return CLASSIFICACOES_FAIXA[int(codigos)]
+
+    classificacao = pd.Categorical.from_codes(codigos, CLASSIFICACOES_FAIXA)
+    if isinstance(duracao, pd.Series):
+        return pd.Series(classificacao, index=duracao.index, name='classificacao')
+    return classificacao
+
+
+def precalcular_faixas(df, regras=None, coluna='duracao_horas'):
+    """Adiciona uma coluna categórica de classificação para cada faixa configurada"""
+    regras = regras if regras is not None else carregar_regras()
+    for faixa in regras['faixas_referencia']:
+        df[coluna_classificacao(faixa)] = classificar_por_faixa(
+            df[coluna].to_numpy(), faixa, regras['tolerancia_faixa']
+        )
+    return df
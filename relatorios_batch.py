@@ -0,0 +1,214 @@
+"""
+🗂️ RELATÓRIOS EM LOTE - Relatórios do dashboard sem abrir o Streamlit
+Gera, para cada validador (s_nm_usuario_valida), os alertas abaixo/acima da
+faixa, a tabela por funcionário e o detalhamento de horas extras, com o mesmo
+carregador e o mesmo cubo usados pelas abas. Os validadores são processados em
+paralelo num pool de processos; cada processo carrega o conjunto uma única vez.
+
+Uso:
+    python relatorios_batch.py                                   # período completo, todos os validadores
+    python relatorios_batch.py --inicio 2025-09-01 --fim 2025-09-30 --formato parquet
+    python relatorios_batch.py --validador "Mauro Abud" --faixa 6 --processos 1
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import carregamento
+import consultas
+import exportacao
+from cubos import TODOS
+
+PASTA_RELATORIOS = os.path.join(carregamento.PASTA_RESULTADOS, "relatorios")
+COLUNAS_ALERTA = ['data', 'tipo_dia', 's_nm_recurso', 'duracao_bruta', 'duracao_liquida',
+                  'horas_extras', 'horas_pagas', 's_ds_operacao']
+
+_CONJUNTO = None  # Conjunto de jornadas do processo (herdado no fork ou carregado no worker)
+
+
+def _carregar_conjunto():
+    global _CONJUNTO
+    if _CONJUNTO is None:
+        df = carregamento.carregar_dados()
+        if df is not None:
+            _CONJUNTO = consultas.ConjuntoApontamentos(df, carregamento.versao_dados())
+    return _CONJUNTO
+
+
+def _ascii(validador):
+    texto = unicodedata.normalize('NFKD', validador).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^A-Za-z0-9]+', '_', texto).strip('_').lower() or 'sem_nome'
+
+
+def _nome_pasta(validador, validadores=()):
+    """Nome do validador -> pasta ASCII (ex: 'Mauro Abud' -> 'mauro_abud')
+
+    Quando outro validador vira a mesma pasta ('José'/'Jose'), cada um ganha um
+    hash curto do nome original, estável entre execuções e processos.
+    """
+    nome = _ascii(validador)
+    if sum(_ascii(outro) == nome for outro in validadores) > 1:
+        return f"{nome}_{hashlib.sha1(validador.encode('utf-8')).hexdigest()[:8]}"
+    return nome
+
+
+def _arredondar(df, casas=2):
+    """Arredonda só as colunas de ponto flutuante (datas e textos ficam como estão)"""
+    return df.round({coluna: casas for coluna in df.select_dtypes('floating').columns})
+
+
+def _valor_json(valor):
+    if isinstance(valor, float):
+        return round(valor, 4) if math.isfinite(valor) else None
+    return valor
+
+
+def _alertas(recorte, classificacao, crescente):
+    alertas = recorte.loc[recorte['classificacao'] == classificacao, COLUNAS_ALERTA]
+    return _arredondar(alertas.sort_values('duracao_liquida', ascending=crescente, kind='stable'))
+
+
+def gerar_relatorio_validador(validador, data_inicio, data_fim, faixa_referencia, tolerancia,
+                              pasta, formato='csv'):
+    """Escreve os relatórios de um validador em pasta/<validador>/ e retorna o resumo"""
+    inicio = time.perf_counter()
+    conjunto = _carregar_conjunto()
+    cubo = conjunto.cubo
+    chave = (data_inicio, data_fim, validador, TODOS)
+    recorte = conjunto.recorte(chave, faixa_referencia, tolerancia)
+
+    tabelas = {
+        'alertas_abaixo': _alertas(recorte, 'Abaixo', crescente=True),
+        'alertas_acima': _alertas(recorte, 'Acima', crescente=False),
+        'funcionarios': _arredondar(cubo.por_funcionario(chave, faixa_referencia, tolerancia)).reset_index(),
+        'horas_extras_funcionarios': _arredondar(cubo.extras_por_funcionario(chave)).reset_index(),
+        'horas_extras_dias': _arredondar(cubo.extras_por_data(chave)),
+    }
+    destino = os.path.join(pasta, _nome_pasta(validador, conjunto.validadores))
+    extensao = exportacao.FORMATOS[formato]['extensao']
+    for nome, tabela in tabelas.items():
+        exportacao.gravar(tabela, os.path.join(destino, nome + extensao), formato)
+
+    resumo = {
+        'validador': validador,
+        'periodo': f"{data_inicio} a {data_fim}",
+        'faixa_referencia': faixa_referencia,
+        'tolerancia': tolerancia,
+        **cubo.resumo(chave, faixa_referencia, tolerancia),
+    }
+    with open(os.path.join(destino, 'resumo.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump({campo: _valor_json(valor) for campo, valor in resumo.items()}, arquivo,
+                  ensure_ascii=False, indent=2)
+    return {**resumo, 'pasta': destino, 'segundos': round(time.perf_counter() - inicio, 3)}
+
+
+def gerar_relatorios(data_inicio=None, data_fim=None, validadores=None, faixa_referencia=None,
+                     tolerancia=None, pasta=None, formato='csv', processos=None, ao_concluir=None):
+    """Relatórios de todos os validadores (ou dos informados); retorna (resumos, erros)"""
+    conjunto = _carregar_conjunto()
+    if conjunto is None:
+        raise FileNotFoundError(f"Nenhum snapshot {carregamento.PADRAO_SNAPSHOT} em {carregamento.PASTA_RESULTADOS}/")
+    if formato not in exportacao.formatos_disponiveis():
+        raise ValueError(f"Formato indisponível: {formato}")
+
+    regras = conjunto.cubo.regras
+    faixas = regras['faixas_referencia']
+    if faixa_referencia is None:
+        faixa_referencia = regras['limite_diario'] if regras['limite_diario'] in faixas else faixas[0]
+    if tolerancia is None:
+        tolerancia = regras['tolerancia_faixa']
+    data_inicio = data_inicio or conjunto.data_min
+    data_fim = data_fim or conjunto.data_max
+    validadores = validadores or conjunto.validadores
+    desconhecidos = sorted(set(validadores) - set(conjunto.validadores))
+    if desconhecidos:
+        raise ValueError(f"Validador(es) sem dados: {', '.join(desconhecidos)}")
+    pasta = pasta or os.path.join(PASTA_RELATORIOS, f"{data_inicio:%Y%m%d}_{data_fim:%Y%m%d}")
+
+    argumentos = (data_inicio, data_fim, faixa_referencia, tolerancia, pasta, formato)
+    processos = max(1, min(processos or os.cpu_count() or 1, len(validadores)))
+    resumos, erros = [], {}
+
+    def _registrar(validador, tarefa):
+        resumo = erro = None
+        try:
+            resumo = tarefa()
+            resumos.append(resumo)
+        except Exception as e:
+            erro = erros[validador] = str(e)
+        if ao_concluir:
+            ao_concluir(validador, resumo, erro)
+
+    if processos == 1:
+        for validador in validadores:
+            _registrar(validador, lambda: gerar_relatorio_validador(validador, *argumentos))
+    else:
+        with ProcessPoolExecutor(max_workers=processos, initializer=_carregar_conjunto) as pool:
+            futuros = {pool.submit(gerar_relatorio_validador, validador, *argumentos): validador
+                       for validador in validadores}
+            for futuro in as_completed(futuros):
+                _registrar(futuros[futuro], futuro.result)
+
+    # Índice com uma linha por validador
+    if resumos:
+        indice = pd.DataFrame(sorted(resumos, key=lambda resumo: resumo['validador']))
+        exportacao.gravar(_arredondar(indice), os.path.join(pasta, 'indice' + exportacao.FORMATOS[formato]['extensao']),
+                          formato)
+    return resumos, erros
+
+
+def _data(valor):
+    try:
+        return datetime.date.fromisoformat(valor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida (use AAAA-MM-DD): {valor}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Relatórios do dashboard por validador, sem abrir o Streamlit")
+    parser.add_argument('--inicio', type=_data, help="Data inicial AAAA-MM-DD (padrão: primeira data dos dados)")
+    parser.add_argument('--fim', type=_data, help="Data final AAAA-MM-DD (padrão: última data dos dados)")
+    parser.add_argument('--validador', action='append', dest='validadores',
+                        help="Validador a processar (repita a opção para vários; padrão: todos)")
+    parser.add_argument('--faixa', type=float, help="Faixa de referência em horas (padrão: a do dashboard)")
+    parser.add_argument('--tolerancia', type=float, help="Tolerância da faixa em horas (padrão: a das regras)")
+    parser.add_argument('--formato', default='csv', choices=list(exportacao.FORMATOS))
+    parser.add_argument('--saida', help=f"Pasta de saída (padrão: {PASTA_RELATORIOS}/<inicio>_<fim>)")
+    parser.add_argument('--processos', type=int, help="Processos em paralelo (padrão: núcleos da máquina)")
+    args = parser.parse_args(argv)
+
+    def _progresso(validador, resumo, erro):
+        if erro:
+            print(f"❌ {validador}: {erro}")
+        else:
+            print(f"✅ {validador}: {resumo['total_registros']} jornadas, "
+                  f"{resumo['abaixo']} abaixo / {resumo['acima']} acima ({resumo['segundos']:.2f}s)")
+
+    inicio = time.perf_counter()
+    try:
+        resumos, erros = gerar_relatorios(
+            args.inicio, args.fim, args.validadores, args.faixa, args.tolerancia,
+            args.saida, args.formato, args.processos, ao_concluir=_progresso
+        )
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    if resumos:
+        print(f"📁 {len(resumos)} relatório(s) em {os.path.dirname(resumos[0]['pasta'])} "
+              f"({time.perf_counter() - inicio:.1f}s)")
+    return 1 if erros else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""Fixtures compartilhadas: snapshot sintético numa pasta de trabalho temporária"""
+
+import datetime
+
+import pandas as pd
+import pytest
+
+import carregamento
+import consultas
+import dados_sinteticos
+import motor_duckdb
+import regras_jornada
+from cubos import TODOS
+
+DATA_FIM = datetime.date(2025, 3, 31)
+MOTORES = ['pandas', pytest.param('duckdb', marks=pytest.mark.skipif(
+    not motor_duckdb.DUCKDB_DISPONIVEL, reason="duckdb não instalado"))]
+
+
+@pytest.fixture
+def pasta_trabalho(tmp_path, monkeypatch):
+    """Diretório atual temporário: os caminhos relativos do carregador (resultados/...) ficam nele"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def regras():
+    return regras_jornada.carregar_regras()
+
+
+@pytest.fixture
+def pasta_snapshot(pasta_trabalho):
+    """resultados/ com um snapshot sintético de 40 funcionários em 60 dias"""
+    df = dados_sinteticos.gerar_apontamentos(funcionarios=40, dias=60, data_fim=DATA_FIM, semente=7)
+    dados_sinteticos.gravar_snapshot(df, carregamento.PASTA_RESULTADOS, carimbo='20250331_120000')
+    return carregamento.PASTA_RESULTADOS
+
+
+@pytest.fixture(params=MOTORES)
+def conjunto(request, pasta_snapshot, regras):
+    """Conjunto de jornadas do snapshot em cada motor (cubo em memória e DuckDB)"""
+    if request.param == 'duckdb':
+        return motor_duckdb.abrir_conjunto(pasta_snapshot, incremental=False, regras=regras)
+    df = carregamento.carregar_dados(pasta_snapshot, incremental=False)
+    return consultas.ConjuntoApontamentos(df, regras=regras)
+
+
+@pytest.fixture
+def chave_sem_extras(conjunto, regras):
+    """Chave de filtro de um funcionário num dia em que trabalhou sem hora extra"""
+    chave_total = (conjunto.data_min, conjunto.data_max, TODOS, TODOS)
+    jornadas = conjunto.recorte(chave_total, regras['limite_diario'], regras['tolerancia_faixa'])
+    jornada = jornadas[jornadas['horas_extras'] == 0].iloc[0]
+    dia = pd.Timestamp(jornada['data']).date()
+    return (dia, dia, TODOS, jornada['s_nm_recurso'])
@@ -0,0 +1,150 @@
+"""Ingestão incremental comparada com a recarga completa do mesmo snapshot"""
+
+import datetime
+
+import pandas as pd
+import pytest
+
+import carregamento
+import dados_sinteticos
+import motor_duckdb
+
+COLUNAS_COMPARADAS = carregamento.CHAVES_JORNADA + ['duracao_horas', 'total_apontamentos_dia']
+
+
+def _gravar(df, carimbo):
+    return dados_sinteticos.gravar_snapshot(df, carregamento.PASTA_RESULTADOS, carimbo=carimbo)
+
+
+def _jornadas(df):
+    df = df[COLUNAS_COMPARADAS].astype({'s_nm_recurso': str, 's_nm_usuario_valida': str, 'data': 'datetime64[ns]',
+                                        'duracao_horas': float, 'total_apontamentos_dia': 'int64'})
+    return df.sort_values(carregamento.CHAVES_JORNADA, ignore_index=True)
+
+
+def _apontamentos():
+    """Três meses parciais (jan a mar/2025) de 12 funcionários"""
+    return dados_sinteticos.gerar_apontamentos(funcionarios=12, dias=60, data_fim=datetime.date(2025, 3, 31),
+                                               semente=3)
+
+
+def test_incremental_igual_a_recarga_apos_remocao(pasta_trabalho):
+    original = _apontamentos()
+    _gravar(original, '20250331_080000')
+    carregamento.atualizar_base_incremental()
+
+    # Segunda carga: um dia inteiro de um funcionário e um apontamento isolado somem, outro muda
+    dia = original['d_dt_data'].iloc[len(original) // 2]
+    funcionario = original['s_nm_recurso'].iloc[len(original) // 2]
+    dia_removido = (original['d_dt_data'] == dia) & (original['s_nm_recurso'] == funcionario)
+    atualizado = original[~dia_removido].drop(index=original.index[5]).copy()
+    atualizado.loc[atualizado.index[10], 'duracao_horas'] += 1.5
+    caminho = _gravar(atualizado, '20250331_180000')
+    resumos = carregamento.atualizar_base_incremental()
+
+    assert resumos[-1]['removidos'] == int(dia_removido.sum()) + 1
+    assert resumos[-1]['alterados'] == 1
+    recarga = carregamento.carregar_snapshot(caminho, usar_cache=False)
+    pd.testing.assert_frame_equal(_jornadas(carregamento.carregar_base_agrupada()), _jornadas(recarga))
+
+
+def test_remocao_respeita_periodo_do_snapshot(pasta_trabalho):
+    original = _apontamentos()
+    _gravar(original, '20250331_080000')
+    carregamento.atualizar_base_incremental()
+
+    # Snapshot só do último mês: os meses anteriores continuam na base
+    datas = pd.to_datetime(original['d_dt_data'])
+    ultimo_mes = original[datas >= '2025-03-01']
+    _gravar(ultimo_mes.iloc[1:], '20250331_180000')
+    resumos = carregamento.atualizar_base_incremental()
+
+    assert resumos[-1]['removidos'] == 1
+    assert resumos[-1]['meses'] == ['2025-03']
+    base = carregamento.carregar_base_agrupada()
+    esperado = carregamento.agregar_por_dia(carregamento.preparar_apontamentos(pd.concat(
+        [original[datas < '2025-03-01'], ultimo_mes.iloc[1:]]).copy()))
+    pd.testing.assert_frame_equal(_jornadas(base), _jornadas(esperado))
+
+
+def test_indice_le_so_os_meses_do_snapshot(pasta_trabalho, monkeypatch):
+    original = _apontamentos()
+    _gravar(original, '20250331_080000')
+    carregamento.atualizar_base_incremental()
+    assert len(carregamento._meses_particionados(carregamento.PASTA_BASE_INCREMENTAL, 'apontamentos')) == 3
+
+    lidos = []
+    ler_particao = carregamento._ler_particao
+
+    def _registrar_leitura(pasta_base, tipo, mes, colunas=None):
+        lidos.append(mes)
+        return ler_particao(pasta_base, tipo, mes, colunas)
+
+    monkeypatch.setattr(carregamento, '_ler_particao', _registrar_leitura)
+    datas = pd.to_datetime(original['d_dt_data'])
+    _gravar(original[datas >= '2025-03-01'], '20250331_180000')
+    resumos = carregamento.atualizar_base_incremental()
+
+    assert resumos[-1]['novos'] == resumos[-1]['alterados'] == resumos[-1]['removidos'] == 0
+    assert set(lidos) == {'2025-03'}
+
+
+def test_apontamento_que_muda_de_mes(pasta_trabalho):
+    original = _apontamentos()
+    _gravar(original, '20250331_080000')
+    carregamento.atualizar_base_incremental()
+
+    # O apontamento 0 (janeiro) é corrigido para março e chega num snapshot só de março
+    movido = original.copy()
+    colunas_data = ['d_dt_data', 'd_dt_data_fim', 'd_dt_inicio_apontamento', 'd_dt_fim_apontamento',
+                    'dt_inicio', 'dt_fim']
+    movido.loc[0, colunas_data] = movido.loc[0, colunas_data] + pd.Timedelta(days=56)
+    assert pd.Timestamp(movido.loc[0, 'd_dt_data']).strftime('%Y-%m') == '2025-03'
+    datas = pd.to_datetime(movido['d_dt_data'])
+    _gravar(movido[datas >= '2025-03-01'], '20250331_180000')
+    resumos = carregamento.atualizar_base_incremental()
+
+    assert (resumos[-1]['novos'], resumos[-1]['alterados']) == (0, 1)
+    assert resumos[-1]['meses'] == ['2025-01', '2025-03']
+    ids = carregamento.ler_indice_base()['s_id_apontamento']
+    assert ids.is_unique and len(ids) == len(original)
+
+    # Uma carga completa depois disso continua funcionando e bate com a recarga
+    caminho = _gravar(movido, '20250401_080000')
+    resumos = carregamento.atualizar_base_incremental()
+    assert resumos[-1]['novos'] == resumos[-1]['alterados'] == resumos[-1]['removidos'] == 0
+    recarga = carregamento.carregar_snapshot(caminho, usar_cache=False)
+    pd.testing.assert_frame_equal(_jornadas(carregamento.carregar_base_agrupada()), _jornadas(recarga))
+
+
+def _gravar_particionado(df, carimbo):
+    datas = pd.to_datetime(df['d_dt_data'])
+    return [_gravar(parte, f"{carimbo}_p{mes}") for mes, parte in df.groupby(datas.dt.strftime('%Y-%m'))]
+
+
+def test_carga_particionada_carrega_todos_os_meses(pasta_trabalho):
+    original = _apontamentos()
+    _gravar(original.iloc[:50], '20250301_080000')  # Carga anterior, num arquivo único
+    caminhos = _gravar_particionado(original, '20250331_080000')
+    assert len(caminhos) == 3
+
+    assert carregamento.localizar_carga_mais_recente() == sorted(caminhos)
+    esperado = carregamento.agregar_por_dia(carregamento.preparar_apontamentos(original.copy()))
+    carregado = carregamento.carregar_dados(incremental=False)
+    pd.testing.assert_frame_equal(_jornadas(carregado), _jornadas(esperado))
+    assert isinstance(carregado['s_nm_recurso'].dtype, pd.CategoricalDtype)
+
+    # Mudança numa partição que não é a última também muda a versão dos dados
+    versao = carregamento.versao_dados(incremental=False)
+    _gravar(original.iloc[:10], '20250331_080000_p2025-01')
+    assert carregamento.versao_dados(incremental=False) != versao
+
+
+@pytest.mark.skipif(not motor_duckdb.DUCKDB_DISPONIVEL, reason="duckdb não instalado")
+def test_carga_particionada_no_duckdb(pasta_trabalho, regras):
+    original = _apontamentos()
+    _gravar_particionado(original, '20250331_080000')
+    conjunto = motor_duckdb.abrir_conjunto(incremental=False, regras=regras)
+
+    datas = pd.to_datetime(original['d_dt_data'])
+    assert (conjunto.data_min, conjunto.data_max) == (datas.min().date(), datas.max().date())
@@ -0,0 +1,321 @@
+"""Chat IA: prompt, backends, cache de respostas e execução em segundo plano (sem rede)"""
+
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import chat_ia
+import regras_jornada
+from ferramentas_chat import MotorConsultas
+
+
+def _stats():
+    return {
+        'total_registros': 10, 'periodo': '2025-03-01 a 2025-03-31', 'validador': 'Todos',
+        'faixa_referencia': 8.0, 'dias_uteis': 8, 'dias_nao_uteis': 2, 'funcionarios': 3,
+        'total_horas_brutas': 90.0, 'total_horas_liquidas': 80.0, 'total_horas_extras': 4.0,
+        'total_horas_pagas': 82.0, 'media_horas': 9.0, 'abaixo': 2, 'normal': 6, 'acima': 2,
+        'top_3_func': pd.Series({'Ana': 40.0, 'Bruno': 30.0, 'Carla': 20.0}),
+    }
+
+
+@pytest.mark.parametrize('dias, texto', [
+    ([0, 1, 2, 3, 4], 'seg-sex'),
+    ([5, 6], 'sáb-dom'),
+    ([0, 2, 4], 'seg, qua, sex'),
+    ([6, 0, 1, 2, 3], 'dom-qui'),
+    ([], 'nenhum'),
+])
+def test_descrever_dias(dias, texto):
+    assert regras_jornada.descrever_dias(dias) == texto
+
+
+def test_contexto_usa_dias_uteis_das_regras():
+    regras = regras_jornada.carregar_regras()
+    assert "dia útil (seg-sex) vs final de semana (sáb-dom)" in chat_ia.montar_contexto(_stats(), regras)
+
+    regras['dias_uteis'] = [6, 0, 1, 2, 3]
+    contexto = chat_ia.montar_contexto(_stats(), regras)
+    assert "dia útil (dom-qui) vs final de semana (sex-sáb)" in contexto
+    assert "seg-sex" not in contexto
+
+
+# ==================== BACKEND FALSO (formato do SDK da OpenAI) ====================
+def _mensagem(conteudo=None, chamadas=()):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(
+        content=conteudo,
+        tool_calls=[SimpleNamespace(id=id_, function=SimpleNamespace(name=nome, arguments=argumentos))
+                    for id_, nome, argumentos in chamadas] or None))])
+
+
+def _pedaco(conteudo=None, chamada=None):
+    """Delta de streaming; chamada = (índice, id, nome, argumentos parciais)"""
+    parciais = None
+    if chamada is not None:
+        indice, id_, nome, argumentos = chamada
+        parciais = [SimpleNamespace(index=indice, id=id_,
+                                    function=SimpleNamespace(name=nome, arguments=argumentos))]
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=conteudo, tool_calls=parciais))])
+
+
+class ClienteFalso:
+    """client.chat.completions.create devolvendo as respostas roteirizadas, uma por chamada"""
+
+    def __init__(self, respostas):
+        self.respostas = list(respostas)
+        self.pedidos = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._criar))
+
+    def _criar(self, **opcoes):
+        self.pedidos.append({**opcoes, 'messages': list(opcoes['messages'])})
+        return self.respostas.pop(0)
+
+
+class FerramentasFalsas:
+    esquemas = [{'type': 'function', 'function': {'name': 'serie_diaria'}}]
+
+    def __init__(self):
+        self.chamadas = []
+
+    def executar(self, nome, argumentos):
+        self.chamadas.append((nome, json.loads(argumentos)))
+        return json.dumps({'dias': 1})
+
+
+def _backend_openai(respostas):
+    backend = chat_ia.BackendOpenAI.__new__(chat_ia.BackendOpenAI)  # Sem cliente real nem API key
+    backend.client = ClienteFalso(respostas)
+    return backend
+
+
+def test_responder_resolve_rodada_de_ferramentas():
+    backend = _backend_openai([
+        _mensagem(chamadas=[('c1', 'serie_diaria', '{"data_inicio": "2025-03-01"}')]),
+        _mensagem('Pico em 03/03.'),
+    ])
+    ferramentas = FerramentasFalsas()
+
+    assert backend.responder('contexto', 'Qual o pico?', ferramentas) == 'Pico em 03/03.'
+    assert ferramentas.chamadas == [('serie_diaria', {'data_inicio': '2025-03-01'})]
+    segundo = backend.client.pedidos[1]
+    assert segundo['tool_choice'] == 'auto'
+    assert [m['role'] for m in segundo['messages']] == ['system', 'user', 'assistant', 'tool']
+    assert segundo['messages'][3] == {'role': 'tool', 'tool_call_id': 'c1', 'content': '{"dias": 1}'}
+
+
+def test_responder_exige_resposta_na_ultima_rodada():
+    rodadas = chat_ia.MAX_RODADAS_FERRAMENTAS
+    backend = _backend_openai([_mensagem(chamadas=[(f'c{i}', 'serie_diaria', '{}')]) for i in range(rodadas)]
+                              + [_mensagem('Resposta final')])
+    ferramentas = FerramentasFalsas()
+
+    assert backend.responder('contexto', 'pergunta', ferramentas) == 'Resposta final'
+    assert len(ferramentas.chamadas) == rodadas
+    assert [pedido['tool_choice'] for pedido in backend.client.pedidos] == ['auto'] * rodadas + ['none']
+
+
+def test_transmitir_monta_chamadas_a_partir_dos_deltas():
+    backend = _backend_openai([
+        iter([
+            _pedaco(chamada=(0, 'c1', 'serie_', '{"data_')),
+            _pedaco(chamada=(0, None, 'diaria', 'inicio": "2025-03-01"}')),
+            SimpleNamespace(choices=[]),  # Pedaço só com uso de tokens
+        ]),
+        iter([_pedaco('Pico '), _pedaco(None), _pedaco('em 03/03.')]),
+    ])
+    ferramentas = FerramentasFalsas()
+
+    assert list(backend.transmitir('contexto', 'Qual o pico?', ferramentas)) == ['Pico ', 'em 03/03.']
+    assert ferramentas.chamadas == [('serie_diaria', {'data_inicio': '2025-03-01'})]
+    assert backend.client.pedidos[1]['messages'][2]['tool_calls'][0]['id'] == 'c1'
+    assert all(pedido['stream'] for pedido in backend.client.pedidos)
+
+
+def test_backend_local_transmite_e_consulta_ferramenta():
+    backend = chat_ia.BackendLocal(atraso_inicial=0, atraso_token=0)
+    contexto = chat_ia.montar_contexto(_stats(), regras_jornada.carregar_regras(), ferramentas=True)
+    ferramentas = FerramentasFalsas()
+
+    pedacos = list(backend.transmitir(contexto, 'Qual a tendência por dia?', ferramentas))
+    assert len(pedacos) > 1
+    assert ''.join(pedacos) == backend.responder(contexto, 'Qual a tendência por dia?', ferramentas)
+    assert 'Total de jornadas: 10' in ''.join(pedacos)
+    assert ferramentas.chamadas[0] == ('serie_diaria', {})
+
+
+def test_backend_local_serie_diaria_sem_horas_extras(conjunto, regras, chave_sem_extras):
+    ferramentas = MotorConsultas(conjunto.cubo, chave_sem_extras, regras['limite_diario'], regras['tolerancia_faixa'])
+
+    texto = chat_ia.BackendLocal(0, 0).responder('', 'Tendência por dia?', ferramentas)
+    assert '`serie_diaria`' in texto
+    assert '"erro"' not in texto
+    assert '"horas_extras": 0.0' in texto
+
+
+# ==================== CACHE DE RESPOSTAS ====================
+@pytest.fixture
+def relogio(monkeypatch):
+    """time.time() controlado pelo teste"""
+    agora = [1_000_000.0]
+    monkeypatch.setattr(chat_ia.time, 'time', lambda: agora[0])
+    return agora
+
+
+def test_chave_resposta_normaliza_pergunta():
+    filtro = ('2025-03-01', '2025-03-31', 'Todos', 'Todos')
+    assert chat_ia.chave_resposta('Quem fez MAIS horas extras?', 'ctx', filtro) == \
+        chat_ia.chave_resposta('  quem fez mais horas extras ', 'ctx', filtro)
+    assert chat_ia.chave_resposta('quem', 'ctx', filtro) != chat_ia.chave_resposta('quem', 'outro ctx', filtro)
+
+
+def test_cache_lru_descarta_o_menos_usado(relogio):
+    cache = chat_ia.CacheRespostas(capacidade=2, ttl=60, arquivo=None)
+    cache.guardar('a', 'A')
+    cache.guardar('b', 'B')
+    assert cache.obter('a') == 'A'  # 'a' passa a ser o mais recente
+    cache.guardar('c', 'C')
+
+    assert len(cache) == 2
+    assert cache.obter('b') is None
+    assert (cache.obter('a'), cache.obter('c')) == ('A', 'C')
+    assert (cache.acertos, cache.faltas) == (3, 1)
+
+
+def test_cache_expira_pelo_ttl(relogio):
+    cache = chat_ia.CacheRespostas(capacidade=10, ttl=60, arquivo=None)
+    cache.guardar('a', 'A')
+    relogio[0] += 59
+    assert cache.obter('a') == 'A'
+    relogio[0] += 2
+    assert cache.obter('a') is None
+    assert len(cache) == 0
+
+
+def test_cache_persiste_em_json(tmp_path, relogio):
+    arquivo = str(tmp_path / 'cache' / 'respostas.json')
+    cache = chat_ia.CacheRespostas(capacidade=10, ttl=60, arquivo=arquivo)
+    cache.guardar('antiga', 'expira')
+    relogio[0] += 30
+    cache.guardar('nova', 'fica')
+    assert [nome for nome in os.listdir(tmp_path / 'cache')] == ['respostas.json']
+
+    relogio[0] += 40  # 'antiga' com 70s, 'nova' com 40s
+    recarregado = chat_ia.CacheRespostas(capacidade=10, ttl=60, arquivo=arquivo)
+    assert len(recarregado) == 1
+    assert recarregado.obter('nova') == 'fica'
+
+    with open(arquivo, 'w', encoding='utf-8') as saida:
+        saida.write('{corrompido')
+    assert len(chat_ia.CacheRespostas(capacidade=10, ttl=60, arquivo=arquivo)) == 0
+
+
+def test_cache_grava_o_json_fora_da_trava(tmp_path, monkeypatch):
+    arquivo = str(tmp_path / 'respostas.json')
+    cache = chat_ia.CacheRespostas(capacidade=10, ttl=60, arquivo=arquivo)
+    cache.guardar('a', 'A')
+
+    # A primeira gravação fica presa no disco; leituras e uma segunda gravação seguem
+    liberar, gravando = threading.Event(), threading.Event()
+    dump = chat_ia.json.dump
+
+    def _dump_lento(itens, arquivo_json, **kwargs):
+        if 'b' in itens and 'c' not in itens:
+            gravando.set()
+            assert liberar.wait(5)
+        dump(itens, arquivo_json, **kwargs)
+
+    monkeypatch.setattr(chat_ia.json, 'dump', _dump_lento)
+    lenta = threading.Thread(target=cache.guardar, args=('b', 'B'))
+    lenta.start()
+    try:
+        assert gravando.wait(5)
+        lidos = []
+        leitura = threading.Thread(target=lambda: lidos.extend([cache.obter('a'), cache.obter('b')]))
+        leitura.start()
+        leitura.join(2)
+        assert lidos == ['A', 'B']
+        seguinte = threading.Thread(target=cache.guardar, args=('c', 'C'))
+        seguinte.start()
+    finally:
+        liberar.set()
+    lenta.join(5)
+    seguinte.join(5)
+
+    # O arquivo termina com a versão mais nova, não com a que terminou por último
+    with open(arquivo, encoding='utf-8') as entrada:
+        assert set(json.load(entrada)) == {'a', 'b', 'c'}
+
+
+# ==================== EXECUÇÃO EM SEGUNDO PLANO ====================
+class BackendControlado:
+    """Transmite 'Resposta: <pergunta>' em dois pedaços; bloqueia até liberar, ou falha"""
+
+    def __init__(self, falhar=False):
+        self.liberar = threading.Event()
+        self.falhar = falhar
+
+    def transmitir(self, contexto, pergunta, ferramentas=None):
+        if not self.liberar.wait(5):
+            raise TimeoutError("backend não liberado")
+        if self.falhar:
+            raise RuntimeError("falha no modelo")
+        yield 'Resposta: '
+        yield pergunta
+
+    def responder(self, contexto, pergunta, ferramentas=None):
+        return ''.join(self.transmitir(contexto, pergunta, ferramentas))
+
+
+def _coletar(executor, sessao, quantidade):
+    concluidas = []
+    limite = time.time() + 5
+    while len(concluidas) < quantidade and time.time() < limite:
+        concluidas += executor.coletar(sessao)
+        time.sleep(0.01)
+    return concluidas
+
+
+@pytest.mark.parametrize('streaming', [True, False])
+def test_executor_isola_as_filas_por_sessao(streaming):
+    cache = chat_ia.CacheRespostas(capacidade=10, ttl=None, arquivo=None)
+    executor = chat_ia.ExecutorChat(max_workers=4, cache=cache)
+    backend = BackendControlado()
+    tarefas = {sessao: chat_ia.TarefaChat(f'pergunta {sessao}', f'chave {sessao}') for sessao in ('s1', 's2')}
+    for sessao, tarefa in tarefas.items():
+        assert executor.enviar(sessao, tarefa, backend, 'contexto', streaming=streaming)
+
+    # A mesma pergunta não é enviada duas vezes enquanto está em andamento
+    repetida = chat_ia.TarefaChat('pergunta s1', 'chave s1')
+    assert not executor.enviar('s1', repetida, backend, 'contexto', streaming=streaming)
+    assert executor.em_andamento('s1') == [tarefas['s1']]
+    assert executor.coletar('s1') == []
+
+    backend.liberar.set()
+    assert _coletar(executor, 's1', 1) == [tarefas['s1']]
+    assert _coletar(executor, 's2', 1) == [tarefas['s2']]
+    assert executor.coletar('s1') == executor.coletar('s2') == []
+    assert executor.em_andamento('s1') == []
+
+    assert tarefas['s2'].texto == 'Resposta: pergunta s2'
+    assert tarefas['s2'].concluida and tarefas['s2'].erro is None
+    assert tarefas['s2'].latencia['total'] >= 0
+    assert (tarefas['s2'].latencia['primeiro_token'] is not None) == streaming
+    assert cache.obter('chave s1') == 'Resposta: pergunta s1'
+
+
+def test_executor_registra_erro_sem_guardar_no_cache():
+    cache = chat_ia.CacheRespostas(capacidade=10, ttl=None, arquivo=None)
+    executor = chat_ia.ExecutorChat(max_workers=1, cache=cache)
+    backend = BackendControlado(falhar=True)
+    backend.liberar.set()
+    tarefa = chat_ia.TarefaChat('pergunta', 'chave')
+    executor.enviar('s1', tarefa, backend, 'contexto')
+
+    assert _coletar(executor, 's1', 1) == [tarefa]
+    assert tarefa.erro == "falha no modelo"
+    assert cache.obter('chave') is None
@@ -0,0 +1,74 @@
+"""Exportação em blocos: formatos, limpeza concorrente e limite do XLSX"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import exportacao
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        'data': pd.to_datetime(['2025-01-01', '2025-01-02', '2025-01-03', None, '2025-01-05', '2025-01-06',
+                                '2025-01-07']),
+        's_nm_recurso': pd.Categorical(['Ana', 'Bruno', 'Ana', 'Carla', None, 'Bruno', 'Ana']),
+        'duracao_horas': [8.0, 9.5, np.nan, 7.25, 8.0, 10.0, 6.5],
+    })
+
+
+@pytest.mark.parametrize('formato', exportacao.formatos_disponiveis())
+def test_exportar_ida_e_volta(tmp_path, df, formato):
+    caminho = exportacao.exportar(df, ('chave',), formato, pasta=str(tmp_path), tamanho_bloco=3)
+    lido = {
+        'csv': lambda: pd.read_csv(caminho, encoding='utf-8-sig', parse_dates=['data']),
+        'csv.gz': lambda: pd.read_csv(caminho, encoding='utf-8-sig', parse_dates=['data']),
+        'parquet': lambda: pd.read_parquet(caminho),
+        'xlsx': lambda: pd.read_excel(caminho),
+    }[formato]()
+    assert len(lido) == len(df)
+    assert lido['duracao_horas'].isna().sum() == 1
+    assert lido['duracao_horas'].sum() == pytest.approx(df['duracao_horas'].sum())
+    assert lido['data'].isna().sum() == 1
+    assert [nome for nome in os.listdir(tmp_path) if nome.endswith('.tmp')] == []
+
+
+def test_limpeza_preserva_temporarios_de_outras_sessoes(tmp_path, df):
+    pasta = str(tmp_path)
+    em_escrita = os.path.join(pasta, 'exportacao_outrasessao.csv.123.456.tmp')
+    open(em_escrita, 'w').close()
+    for indice in range(exportacao.MAX_EXPORTACOES + 3):
+        exportacao.exportar(df, ('chave', indice), 'csv', pasta=pasta)
+    finais = [nome for nome in os.listdir(pasta) if nome.endswith('.csv')]
+    assert len(finais) == exportacao.MAX_EXPORTACOES
+    assert os.path.exists(em_escrita)
+
+
+def test_abrir_arquivo_removido(tmp_path, df):
+    caminho = exportacao.exportar(df, ('chave',), 'csv', pasta=str(tmp_path))
+    arquivo, tamanho = exportacao.abrir(caminho)
+    with arquivo:
+        assert tamanho == os.path.getsize(caminho)
+    os.remove(caminho)
+    assert exportacao.abrir(caminho) is None
+    assert exportacao.abrir(None) is None
+
+
+def test_conteudo_gera_de_novo_arquivo_removido(tmp_path, df):
+    caminho = exportacao.exportar(df, ('chave',), 'csv', pasta=str(tmp_path))
+    with open(caminho, 'rb') as arquivo:
+        esperado = arquivo.read()
+    assert exportacao.conteudo(df, ('chave',), 'csv', pasta=str(tmp_path)) == esperado
+
+    os.remove(caminho)  # Limpeza de outra sessão antes do clique
+    assert exportacao.conteudo(df, ('chave',), 'csv', pasta=str(tmp_path)) == esperado
+
+
+@pytest.mark.skipif(not exportacao.OPENPYXL_DISPONIVEL, reason="openpyxl não instalado")
+def test_xlsx_acima_do_limite(tmp_path, df, monkeypatch):
+    monkeypatch.setattr(exportacao, 'LIMITE_LINHAS_XLSX', 5)
+    with pytest.raises(ValueError, match="XLSX comporta até 5 linhas"):
+        exportacao.exportar(df, ('chave',), 'xlsx', pasta=str(tmp_path))
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,33 @@
+"""Ferramentas do chat sobre os dois motores de consulta"""
+
+import json
+
+from cubos import TODOS
+from ferramentas_chat import MotorConsultas
+
+
+def test_extras_por_data_vazio_tem_tipos(conjunto, chave_sem_extras):
+    extras = conjunto.cubo.extras_por_data(chave_sem_extras)
+    assert extras.empty
+    assert str(extras['data'].dtype).startswith('datetime64')
+    assert extras['horas_extras'].dtype == 'float64'
+
+
+def test_serie_diaria_sem_horas_extras(conjunto, regras, chave_sem_extras):
+    chave = chave_sem_extras
+    motor = MotorConsultas(conjunto.cubo, chave, regras['limite_diario'], regras['tolerancia_faixa'])
+    resultado = json.loads(motor.executar('serie_diaria', '{}'))
+    assert 'erro' not in resultado
+    assert resultado['dias'] == 1
+    assert resultado['linhas'][0]['horas_extras'] == 0.0
+    assert resultado['linhas'][0]['data'] == str(chave[0])
+
+
+def test_serie_diaria_com_horas_extras(conjunto, regras):
+    chave = (conjunto.data_min, conjunto.data_max, TODOS, TODOS)
+    motor = MotorConsultas(conjunto.cubo, chave, regras['limite_diario'], regras['tolerancia_faixa'])
+    resultado = json.loads(motor.executar('serie_diaria', '{}'))
+    extras = conjunto.cubo.extras_por_data(chave)
+    assert resultado['dias'] == 60
+    assert round(sum(linha['horas_extras'] for linha in resultado['linhas']), 1) == round(
+        extras['horas_extras'].sum(), 1)
@@ -0,0 +1,40 @@
+"""Redução LTTB das séries longas nos construtores de figura"""
+
+import datetime
+
+import numpy as np
+import pandas as pd
+
+import graficos
+
+
+def _datas(n):
+    inicio = datetime.date(2020, 1, 1)
+    return [inicio + datetime.timedelta(days=i) for i in range(n)]
+
+
+def test_evolucao_pessoa_com_datas_python():
+    n = graficos.ORCAMENTO_PONTOS + 200
+    analise = pd.DataFrame({'Data': _datas(n), 'Total_h': np.random.default_rng(0).uniform(4, 12, n)})
+    fig = graficos.evolucao_pessoa(analise, 8.0, 'Ana')
+    assert len(fig.data[0].x) <= graficos.ORCAMENTO_PONTOS
+    assert fig.data[0].x[0] == analise['Data'].iloc[0]
+    assert fig.data[0].x[-1] == analise['Data'].iloc[-1]
+
+
+def test_evolucao_temporal_com_datas_python():
+    n = graficos.ORCAMENTO_PONTOS + 200
+    temp = pd.DataFrame({
+        'data': _datas(n) * 2,
+        'classificacao': ['Normal'] * n + ['Extra'] * n,
+        'count': np.random.default_rng(1).integers(0, 50, 2 * n),
+    })
+    fig = graficos.evolucao_temporal(temp)
+    assert len(fig.data) == 2
+    assert all(len(traco.x) <= graficos.ORCAMENTO_PONTOS for traco in fig.data)
+
+
+def test_numerico_de_datas_e_numeros():
+    datas = np.array(_datas(3), dtype=object)
+    np.testing.assert_allclose(np.diff(graficos._numerico(datas)), 86_400e9)
+    np.testing.assert_allclose(graficos._numerico(np.array([1, 2.5], dtype=object)), [1.0, 2.5])
@@ -0,0 +1,128 @@
+"""Ingestão SQL contra uma fonte SQLite criada a partir de um snapshot sintético"""
+
+import datetime
+import glob
+import os
+
+import pandas as pd
+import pytest
+
+import carregamento
+import dados_sinteticos
+import ingestao_sql
+
+INICIO = datetime.date(2025, 1, 1)
+FIM = datetime.date(2025, 3, 31)
+
+
+def _d(texto):
+    return datetime.date.fromisoformat(texto)
+
+
+@pytest.mark.parametrize('inicio, fim, dias, esperado', [
+    ('2025-01-28', '2025-03-02', 7, [('2025-01-28', '2025-02-01'), ('2025-02-01', '2025-02-08'),
+                                     ('2025-02-08', '2025-02-15'), ('2025-02-15', '2025-02-22'),
+                                     ('2025-02-22', '2025-03-01'), ('2025-03-01', '2025-03-03')]),
+    ('2024-12-30', '2025-01-02', 7, [('2024-12-30', '2025-01-01'), ('2025-01-01', '2025-01-03')]),
+    ('2025-03-31', '2025-03-31', 7, [('2025-03-31', '2025-04-01')]),
+    ('2025-02-27', '2025-03-01', 1, [('2025-02-27', '2025-02-28'), ('2025-02-28', '2025-03-01'),
+                                     ('2025-03-01', '2025-03-02')]),
+    ('2025-03-02', '2025-03-01', 7, []),
+])
+def test_janelas_nao_atravessam_o_mes(inicio, fim, dias, esperado):
+    assert list(ingestao_sql.janelas(_d(inicio), _d(fim), dias)) == [(_d(a), _d(b)) for a, b in esperado]
+
+
+@pytest.fixture
+def fonte(pasta_trabalho):
+    """(conexão sqlite:///, apontamentos de origem com duracao_horas) de jan a mar/2025"""
+    origem = dados_sinteticos.gerar_apontamentos(funcionarios=8, dias=90, data_fim=FIM, prob_mojibake=0,
+                                                 semente=5)
+    csv = dados_sinteticos.gravar_snapshot(origem, 'origem', carimbo='20250331_000000')
+    ingestao_sql.criar_sqlite('fonte.db', csv)
+    return 'sqlite:///fonte.db', origem
+
+
+def _ler(arquivos):
+    return pd.concat([carregamento.ler_csv(arquivo) for arquivo in arquivos], ignore_index=True)
+
+
+def _conferir(lido, origem):
+    lido = lido.sort_values('s_id_apontamento', ignore_index=True)
+    origem = origem.sort_values('s_id_apontamento', ignore_index=True)
+    assert lido['s_id_apontamento'].tolist() == origem['s_id_apontamento'].tolist()
+    assert lido['duracao_horas'].to_numpy() == pytest.approx(origem['duracao_horas'].to_numpy())
+    assert lido['s_nm_recurso'].tolist() == origem['s_nm_recurso'].tolist()
+    assert pd.to_datetime(lido['d_dt_data']).tolist() == pd.to_datetime(origem['d_dt_data']).tolist()
+
+
+def test_ingerir_arquivo_unico(fonte):
+    conexao, origem = fonte
+    resumo = ingestao_sql.ingerir(INICIO, FIM, conexao, pasta='saida', particionar=False, tamanho_lote=100)
+
+    assert resumo['linhas'] == len(origem)
+    assert resumo['janelas'] == len(list(ingestao_sql.janelas(INICIO, FIM)))
+    assert len(resumo['arquivos']) == 1
+    _conferir(_ler(resumo['arquivos']), origem)
+
+
+def test_ingerir_particionado_por_mes(fonte):
+    conexao, origem = fonte
+    resumo = ingestao_sql.ingerir(INICIO, FIM, conexao, pasta='saida', particionar=True, tamanho_lote=100)
+
+    meses = ['2025-01', '2025-02', '2025-03']
+    assert [arquivo.endswith(f"_p{mes}.csv") for arquivo, mes in zip(resumo['arquivos'], meses)] == [True] * 3
+    for arquivo, mes in zip(resumo['arquivos'], meses):
+        datas = pd.to_datetime(carregamento.ler_csv(arquivo)['d_dt_data'])
+        assert datas.dt.strftime('%Y-%m').unique().tolist() == [mes]
+    _conferir(_ler(resumo['arquivos']), origem)
+
+    # Os snapshots gerados são lidos pelo carregador como qualquer outro
+    assert carregamento.carimbo_snapshot(resumo['arquivos'][0]) == carregamento.carimbo_snapshot(
+        resumo['arquivos'][-1])
+
+
+@pytest.mark.parametrize('particionar', [False, True])
+def test_falha_no_meio_nao_deixa_snapshot_parcial(fonte, monkeypatch, particionar):
+    conexao, _ = fonte
+    ler_janela = ingestao_sql.ler_janela
+
+    def _ler_janela_com_falha(cursor, inicio, fim, *args, **kwargs):
+        if inicio >= datetime.date(2025, 2, 15):
+            raise ingestao_sql.sqlite3.OperationalError("conexão perdida")
+        yield from ler_janela(cursor, inicio, fim, *args, **kwargs)
+
+    monkeypatch.setattr(ingestao_sql, 'ler_janela', _ler_janela_com_falha)
+    with pytest.raises(ingestao_sql.sqlite3.OperationalError):
+        ingestao_sql.ingerir(INICIO, FIM, conexao, pasta='saida', particionar=particionar)
+
+    restantes = sorted(os.path.basename(arquivo) for arquivo in glob.glob(os.path.join('saida', '*')))
+    if particionar:
+        # Janeiro já estava completo e publicado; fevereiro (parcial) é descartado
+        assert len(restantes) == 1 and restantes[0].endswith('_p2025-01.csv')
+    else:
+        assert restantes == []
+
+
+def test_mes_sem_linhas_remove_o_mes_da_base(fonte):
+    conexao, origem = fonte
+    resumo = ingestao_sql.ingerir(INICIO, FIM, conexao, pasta='saida', particionar=True)
+    for arquivo in resumo['arquivos']:  # Carga anterior: carimbo mais antigo que a próxima
+        os.replace(arquivo, arquivo.replace(carregamento.carimbo_snapshot(arquivo), '20250101_000000'))
+    carregamento.atualizar_base_incremental('saida')
+
+    # Fevereiro inteiro some da origem; a atualização pede só parte do mês
+    with ingestao_sql.sqlite3.connect('fonte.db') as conexao_db:
+        conexao_db.execute("DELETE FROM apontamentos WHERE d_dt_data LIKE '2025-02-%'")
+    resumo = ingestao_sql.ingerir(_d('2025-02-10'), _d('2025-02-20'), conexao, pasta='saida', particionar=True)
+
+    assert len(resumo['arquivos']) == 1 and resumo['arquivos'][0].endswith('_p2025-02.csv')
+    vazio = carregamento.ler_csv(resumo['arquivos'][0])
+    assert vazio.empty and list(vazio.columns) == ingestao_sql.COLUNAS_SNAPSHOT
+
+    resumos = carregamento.atualizar_base_incremental('saida')
+    datas = pd.to_datetime(origem['d_dt_data'])
+    assert resumos[-1]['removidos'] == int((datas.dt.month == 2).sum())
+    base = carregamento.carregar_base_agrupada()
+    assert sorted(base['data'].dt.strftime('%Y-%m').unique()) == ['2025-01', '2025-03']
+    assert base['total_apontamentos_dia'].sum() == int((datas.dt.month != 2).sum())
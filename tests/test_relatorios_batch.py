@@ -0,0 +1,42 @@
+"""Pastas dos relatórios em lote por validador"""
+
+import os
+
+import pandas as pd
+
+import carregamento
+import dados_sinteticos
+import relatorios_batch
+
+
+def test_nome_pasta_sem_colisao():
+    assert relatorios_batch._nome_pasta('Mauro Abud', ['Mauro Abud', 'Ana']) == 'mauro_abud'
+    assert relatorios_batch._nome_pasta('***') == 'sem_nome'
+
+
+def test_nome_pasta_com_colisao_ganha_hash():
+    validadores = ['José Silva', 'Jose Silva', 'Ana']
+    pastas = [relatorios_batch._nome_pasta(validador, validadores) for validador in validadores]
+    assert len(set(pastas)) == 3
+    assert pastas[0].startswith('jose_silva_') and pastas[1].startswith('jose_silva_')
+    assert pastas[2] == 'ana'
+    # Estável: não depende da ordem dos validadores
+    assert relatorios_batch._nome_pasta('José Silva', validadores[::-1]) == pastas[0]
+
+
+def test_relatorios_de_validadores_que_colidem(pasta_snapshot, tmp_path, monkeypatch):
+    monkeypatch.setattr(relatorios_batch, '_CONJUNTO', None)
+    df = carregamento.ler_csv(carregamento.localizar_snapshot_mais_recente(pasta_snapshot))
+    validadores = df['s_nm_usuario_valida'].dropna().unique()[:2]
+    df['s_nm_usuario_valida'] = df['s_nm_usuario_valida'].replace(
+        {validadores[0]: 'José Silva', validadores[1]: 'Jose Silva'})
+    dados_sinteticos.gravar_snapshot(df, pasta_snapshot, carimbo='20250331_130000')
+
+    resumos, erros = relatorios_batch.gerar_relatorios(validadores=['José Silva', 'Jose Silva'],
+                                                       pasta=str(tmp_path / 'saida'), processos=1)
+    assert erros == {}
+    pastas = {resumo['validador']: resumo['pasta'] for resumo in resumos}
+    assert len(set(pastas.values())) == 2
+    for validador, pasta in pastas.items():
+        resumo = pd.read_json(os.path.join(pasta, 'resumo.json'), typ='series')
+        assert resumo['validador'] == validador